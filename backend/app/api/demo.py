@@ -7,7 +7,9 @@ from pydantic import BaseModel
 from typing import Optional, List
 
 from ..database import get_db
+from .offload import offload
 from ..utils.demo_data import generate_demo_data
+from ..services.peak_hour_forecasting import invalidate_hourly_forecasts
 from ..models import (
     Store, SKU, InventorySnapshot, SalesDaily, 
     AnomalyEvent, TransferRecommendation
@@ -79,7 +81,8 @@ async def get_demo_preview(
 
 
 @router.post("/demo/regenerate")
-async def regenerate_demo_data(
+@offload()
+def regenerate_demo_data(
     request: DemoDataRequest,
     db: Session = Depends(get_db)
 ):
@@ -93,6 +96,9 @@ async def regenerate_demo_data(
             days_history=request.days_history
         )
         
+        # Hourly sales were replaced wholesale
+        invalidate_hourly_forecasts()
+        
         return {
             "success": True,
             "message": "Demo data regenerated successfully",
@@ -106,7 +112,8 @@ async def regenerate_demo_data(
 
 
 @router.get("/demo/stats")
-async def get_demo_stats(db: Session = Depends(get_db)):
+@offload()
+def get_demo_stats(db: Session = Depends(get_db)):
     """
     Get current database statistics
     """
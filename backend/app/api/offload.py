@@ -0,0 +1,44 @@
+"""
+Run blocking route handlers off the event loop
+"""
+import functools
+import json
+from typing import Any, Callable
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from ..database import run_in_db_pool
+
+
+def render_json(result: Any) -> Response:
+    """
+    The JSON response FastAPI would build for a handler's return value
+    Plain JSON data is dumped directly; anything else goes through jsonable_encoder
+    """
+    if isinstance(result, Response):
+        return result
+    
+    try:
+        body = json.dumps(result, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    except TypeError:
+        return JSONResponse(jsonable_encoder(result))
+    
+    return Response(body.encode("utf-8"), media_type="application/json")
+
+
+def offload(pool: str = "analytics") -> Callable:
+    """
+    Decorator turning a blocking route handler into an async one run on a DB pool
+    
+    The response is serialized on the pool too, so large payloads don't hold
+    the event loop. FastAPI still sees the handler's own signature for
+    parameters and dependencies.
+    """
+    def decorator(func: Callable) -> Callable:
+        def call(*args, **kwargs) -> Response:
+            return render_json(func(*args, **kwargs))
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await run_in_db_pool(call, *args, pool=pool, **kwargs)
+        return wrapper
+    return decorator
@@ -7,20 +7,26 @@ from typing import Optional
 from datetime import datetime
 
 from ..database import get_db
+from .offload import offload
 from ..models import Store, SKU, InventorySnapshot
+from ..services.analytics_context import AnalyticsContext
+from ..services.forecasting import forecast_all, get_latest_on_hand
 from ..services.peak_hour_forecasting import (
+    CRITICAL_CATEGORIES,
     get_peak_hour_summary,
     generate_prep_schedule,
     save_prep_recommendations,
     get_hourly_forecast_for_day,
-    predict_stockout_time
+    predict_stockout_time,
+    predict_stockout_times
 )
 
 router = APIRouter()
 
 
 @router.get("/peak-hours/{store_id}")
-async def get_peak_hours_dashboard(
+@offload()
+def get_peak_hours_dashboard(
     store_id: int,
     db: Session = Depends(get_db)
 ):
@@ -38,34 +44,40 @@ async def get_peak_hours_dashboard(
     # Generate prep schedule
     prep_schedule = generate_prep_schedule(db, store_id)
     
-    # Get critical items (proteins and popular items) - LIMIT TO 5 FOR PERFORMANCE
+    # Critical items (proteins and popular items) with a snapshot
     critical_skus = db.query(SKU).filter(
-        SKU.category.in_(["Proteins", "Salsas & Sauces"])
-    ).limit(5).all()
+        SKU.category.in_(CRITICAL_CATEGORIES)
+    ).order_by(SKU.id).all()
+    sku_ids = [sku.id for sku in critical_skus]
+    
+    # Load inventory and daily forecasts for all of them at once
+    ctx = AnalyticsContext()
+    on_hand = get_latest_on_hand(db, [store_id], sku_ids)
+    forecast_all(db, [store_id], sku_ids, ctx=ctx)
+    
+    stockout_preds = predict_stockout_times(db, store_id, {
+        sku_id: on_hand[(store_id, sku_id)]
+        for sku_id in sku_ids
+        if (store_id, sku_id) in on_hand
+    })
     
     critical_items = []
     
     for sku in critical_skus:
-        latest_snapshot = db.query(InventorySnapshot).filter(
-            InventorySnapshot.store_id == store_id,
-            InventorySnapshot.sku_id == sku.id
-        ).order_by(InventorySnapshot.ts_date.desc()).first()
+        if sku.id not in stockout_preds:
+            continue
         
-        if latest_snapshot:
-            stockout_pred = predict_stockout_time(
-                db, store_id, sku.id, latest_snapshot.on_hand
-            )
-            
-            hourly_forecast = get_hourly_forecast_for_day(db, store_id, sku.id)
-            
-            critical_items.append({
-                "sku_id": sku.id,
-                "sku_name": sku.name,
-                "category": sku.category,
-                "on_hand": latest_snapshot.on_hand,
-                "stockout_prediction": stockout_pred,
-                "hourly_forecast": hourly_forecast
-            })
+        stockout_pred = stockout_preds[sku.id]
+        hourly_forecast = get_hourly_forecast_for_day(db, store_id, sku.id, ctx=ctx)
+        
+        critical_items.append({
+            "sku_id": sku.id,
+            "sku_name": sku.name,
+            "category": sku.category,
+            "on_hand": on_hand[(store_id, sku.id)],
+            "stockout_prediction": stockout_pred,
+            "hourly_forecast": hourly_forecast
+        })
     
     return {
         "store": {
@@ -81,7 +93,8 @@ async def get_peak_hours_dashboard(
 
 
 @router.get("/prep-schedule/{store_id}")
-async def get_prep_schedule_endpoint(
+@offload()
+def get_prep_schedule_endpoint(
     store_id: int,
     prep_lead_time: int = Query(2, description="Prep lead time in hours"),
     db: Session = Depends(get_db)
@@ -110,7 +123,8 @@ async def get_prep_schedule_endpoint(
 
 
 @router.get("/sku/{store_id}/{sku_id}/hourly")
-async def get_sku_hourly_forecast(
+@offload()
+def get_sku_hourly_forecast(
     store_id: int,
     sku_id: int,
     db: Session = Depends(get_db)
@@ -6,22 +6,26 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
 from ..database import get_db
-from ..models import Store, SKU, InventorySnapshot, SalesDaily, AnomalyEvent
+from .offload import offload
+from ..models import Store, SKU, InventorySnapshot, SalesDaily
 from ..services.forecasting import (
     calculate_demand_forecast,
+    get_latest_snapshot,
     calculate_days_of_cover,
     predict_stockout_date,
     calculate_reorder_point,
     get_forecast_next_n_days
 )
 from ..services.confidence_scorer import calculate_confidence_score
-from ..services.anomaly_detector import find_anomaly_patterns
+from ..services.anomaly_detector import find_anomaly_patterns, get_recent_anomalies
+from ..services.analytics_context import AnalyticsContext
 
 router = APIRouter()
 
 
 @router.get("/sku/{store_id}/{sku_id}")
-async def get_sku_detail(
+@offload()
+def get_sku_detail(
     store_id: int,
     sku_id: int,
     days_history: int = 30,
@@ -37,21 +41,21 @@ async def get_sku_detail(
     if not store or not sku:
         raise HTTPException(status_code=404, detail="Store or SKU not found")
     
+    # Share forecasts, snapshots and anomalies across the calculations below
+    ctx = AnalyticsContext()
+    
     # Get current inventory
-    latest_snapshot = db.query(InventorySnapshot).filter(
-        InventorySnapshot.store_id == store_id,
-        InventorySnapshot.sku_id == sku_id
-    ).order_by(InventorySnapshot.ts_date.desc()).first()
+    latest_snapshot = get_latest_snapshot(db, store_id, sku_id, ctx=ctx)
     
     on_hand = latest_snapshot.on_hand if latest_snapshot else 0
     
     # Calculate metrics
-    forecast = calculate_demand_forecast(db, store_id, sku_id)
-    days_cover = calculate_days_of_cover(db, store_id, sku_id, on_hand)
-    stockout_date = predict_stockout_date(db, store_id, sku_id, on_hand)
-    confidence = calculate_confidence_score(db, store_id, sku_id)
-    reorder = calculate_reorder_point(db, store_id, sku_id)
-    next_7_days = get_forecast_next_n_days(db, store_id, sku_id, 7)
+    forecast = calculate_demand_forecast(db, store_id, sku_id, ctx=ctx)
+    days_cover = calculate_days_of_cover(db, store_id, sku_id, on_hand, ctx=ctx)
+    stockout_date = predict_stockout_date(db, store_id, sku_id, on_hand, ctx=ctx)
+    confidence = calculate_confidence_score(db, store_id, sku_id, ctx=ctx)
+    reorder = calculate_reorder_point(db, store_id, sku_id, ctx=ctx)
+    next_7_days = get_forecast_next_n_days(db, store_id, sku_id, 7, ctx=ctx)
     
     # Get historical data
     end_date = datetime.now().date()
@@ -81,12 +85,8 @@ async def get_sku_detail(
         for h in history
     ]
     
-    # Get anomalies
-    anomalies = db.query(AnomalyEvent).filter(
-        AnomalyEvent.store_id == store_id,
-        AnomalyEvent.sku_id == sku_id,
-        AnomalyEvent.ts_date >= start_date
-    ).order_by(AnomalyEvent.ts_date.desc()).all()
+    # Get anomalies (newest first)
+    anomalies = reversed(get_recent_anomalies(db, store_id, sku_id, days_history, ctx=ctx))
     
     anomaly_data = [
         {
@@ -99,7 +99,7 @@ async def get_sku_detail(
     ]
     
     # Get anomaly patterns
-    patterns = find_anomaly_patterns(db, store_id, sku_id)
+    patterns = find_anomaly_patterns(db, store_id, sku_id, ctx=ctx)
     
     # Generate recommendations
     recommendations = {
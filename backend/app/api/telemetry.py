@@ -8,7 +8,9 @@ from typing import Optional, List
 from datetime import datetime, timedelta
 
 from ..database import get_db
+from .offload import offload
 from ..models import Store, Telemetry
+from ..services.metrics import TELEMETRY_INGESTED
 
 router = APIRouter()
 
@@ -36,7 +38,8 @@ class TelemetryResponse(BaseModel):
 
 
 @router.post("/telemetry")
-async def create_telemetry(
+@offload("ingest")
+def create_telemetry(
     data: TelemetryInput,
     db: Session = Depends(get_db)
 ):
@@ -70,6 +73,7 @@ async def create_telemetry(
     db.add(telemetry)
     db.commit()
     db.refresh(telemetry)
+    TELEMETRY_INGESTED.inc()
     
     return {
         "success": True,
@@ -86,7 +90,8 @@ async def create_telemetry(
 
 
 @router.get("/telemetry/{store_id}")
-async def get_telemetry(
+@offload("ingest")
+def get_telemetry(
     store_id: int,
     sensor: Optional[str] = Query(None, description="Filter by sensor type"),
     hours: int = Query(24, description="Hours of history to retrieve"),
@@ -134,7 +139,8 @@ async def get_telemetry(
 
 
 @router.get("/telemetry/{store_id}/latest")
-async def get_latest_telemetry(
+@offload("ingest")
+def get_latest_telemetry(
     store_id: int,
     db: Session = Depends(get_db)
 ):
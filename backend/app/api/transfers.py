@@ -7,13 +7,18 @@ from pydantic import BaseModel
 from typing import Optional
 
 from ..database import get_db
+from .offload import offload
 from ..models import Transfer, Store, SKU
 from ..services.transfer_optimizer import (
-    generate_transfer_recommendations,
-    save_transfer_recommendations,
+    get_transfer_plan,
+    get_plan_cache_stats,
+    sync_transfer_recommendations,
     create_transfer_from_recommendation,
-    get_transfer_opportunities_summary
+    get_transfer_opportunities_summary,
+    TRANSFER_SOLVERS
 )
+from ..services.analytics_context import AnalyticsContext
+from ..services.anomaly_detector import mark_for_rescan
 
 router = APIRouter()
 
@@ -31,17 +36,26 @@ class TransferUpdate(BaseModel):
 
 
 @router.get("/transfers/recommendations")
-async def get_transfer_recommendations(
+@offload()
+def get_transfer_recommendations(
     min_urgency: float = 0.5,
     limit: int = 50,
+    solver: str = "greedy",
     db: Session = Depends(get_db)
 ):
     """
     Get transfer recommendations
+    solver: "greedy" (default) or "flow" (min-cost flow per SKU)
     """
-    recommendations = generate_transfer_recommendations(
+    if solver not in TRANSFER_SOLVERS:
+        raise HTTPException(status_code=400, detail=f"Invalid solver. Must be one of: {list(TRANSFER_SOLVERS)}")
+    
+    ctx = AnalyticsContext()
+    recommendations = get_transfer_plan(
         db,
-        min_urgency=min_urgency
+        min_urgency=min_urgency,
+        solver=solver,
+        ctx=ctx
     )
     
     # Limit results
@@ -59,12 +73,13 @@ async def get_transfer_recommendations(
         "recommendations": recommendations,
         "grouped_by_receiver": grouped,
         "total": len(recommendations),
-        "summary": get_transfer_opportunities_summary(db)
+        "summary": get_transfer_opportunities_summary(db, ctx=ctx, solver=solver)
     }
 
 
 @router.post("/transfers/draft")
-async def create_transfer_draft(
+@offload()
+def create_transfer_draft(
     transfer: TransferCreate,
     db: Session = Depends(get_db)
 ):
@@ -109,7 +124,8 @@ async def create_transfer_draft(
 
 
 @router.get("/transfers")
-async def get_transfers(
+@offload()
+def get_transfers(
     status: Optional[str] = None,
     store_id: Optional[int] = None,
     limit: int = 100,
@@ -157,7 +173,8 @@ async def get_transfers(
 
 
 @router.patch("/transfers/{transfer_id}")
-async def update_transfer(
+@offload()
+def update_transfer(
     transfer_id: int,
     update: TransferUpdate,
     db: Session = Depends(get_db)
@@ -182,6 +199,11 @@ async def update_transfer(
         from datetime import datetime
         transfer.received_at = datetime.utcnow()
     
+    # Status changes alter expected inventory deltas on already-scanned days
+    mark_for_rescan(db, transfer.from_store_id, transfer.created_at.date())
+    if transfer.received_at:
+        mark_for_rescan(db, transfer.to_store_id, transfer.received_at.date())
+    
     db.commit()
     db.refresh(transfer)
     
@@ -193,26 +215,42 @@ async def update_transfer(
 
 
 @router.post("/transfers/generate-recommendations")
-async def generate_and_save_recommendations(
+@offload()
+def generate_and_save_recommendations(
     target_cover_days: int = 10,
     safety_buffer_days: int = 2,
     min_urgency: float = 0.5,
+    solver: str = "greedy",
     db: Session = Depends(get_db)
 ):
     """
     Generate and save transfer recommendations
     """
-    recommendations = generate_transfer_recommendations(
+    if solver not in TRANSFER_SOLVERS:
+        raise HTTPException(status_code=400, detail=f"Invalid solver. Must be one of: {list(TRANSFER_SOLVERS)}")
+    
+    recommendations = get_transfer_plan(
         db,
         target_cover_days=target_cover_days,
         safety_buffer_days=safety_buffer_days,
-        min_urgency=min_urgency
+        min_urgency=min_urgency,
+        solver=solver
     )
     
-    saved_count = save_transfer_recommendations(db, recommendations)
+    changes = sync_transfer_recommendations(db, recommendations)
+    saved_count = changes["pending"]
     
     return {
         "generated": len(recommendations),
         "saved": saved_count,
+        "changes": changes,
         "message": f"Generated and saved {saved_count} transfer recommendations"
     }
+
+
+@router.get("/transfers/plan-cache")
+async def get_transfer_plan_cache_stats():
+    """
+    Transfer plan cache hit rate and age
+    """
+    return get_plan_cache_stats()
@@ -11,6 +11,57 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///data/inventory.db"
     
+    # SQLite write-ahead logging, so writes don't wait for long reads
+    SQLITE_WAL: bool = True
+    
+    # Seconds a SQLite write waits for another connection's write transaction
+    # before failing with "database is locked"; covers the longest single
+    # write transaction of a job (demo generation, inventory health rebuild)
+    SQLITE_BUSY_TIMEOUT: float = 30.0
+    
+    # Threads running blocking database work for async routes: analytics
+    # (dashboards, planning) and telemetry ingest each get a bounded pool.
+    # Analytics is mostly GIL-bound Python, so more threads mainly add
+    # contention (and latency for ingest)
+    DB_ANALYTICS_THREADS: int = 2
+    DB_INGEST_THREADS: int = 4
+    
+    # Per-request X-DB-Queries / X-DB-Time-ms response headers, and the
+    # threshold in ms above which a statement is logged with its parameters
+    # and calling function (0 disables); with both off no engine hooks run
+    DB_QUERY_STATS: bool = True
+    SLOW_QUERY_MS: float = 500
+    
+    # Forecasting: "history" rescans the sales window, "state" reads the
+    # incrementally maintained forecast_state table
+    FORECAST_SOURCE: str = "history"
+    
+    # Seconds a cached transfer plan may be served; in-process writes
+    # invalidate it sooner, this bounds staleness from other processes
+    TRANSFER_PLAN_CACHE_TTL: int = 300
+    
+    # Transfer distances: "table" reads the store_distances matrix, "spatial"
+    # computes them from store coordinates and only searches the nearest
+    # TRANSFER_DONOR_CANDIDATES donors within TRANSFER_DONOR_RADIUS_KM
+    TRANSFER_DISTANCE_SOURCE: str = "table"
+    TRANSFER_DONOR_RADIUS_KM: float = 300.0
+    TRANSFER_DONOR_CANDIDATES: int = 10
+    
+    # Hourly forecast cache (per process): max store/SKU profiles before LRU
+    # eviction and seconds before an entry expires. A profile takes ~3.4 KB,
+    # so a full cache is ~65 MB in every uvicorn worker; the TTL also bounds
+    # how long other workers serve profiles after a rollup invalidates one
+    HOURLY_FORECAST_CACHE_SIZE: int = 20000
+    HOURLY_FORECAST_CACHE_TTL: int = 300
+    
+    # Minutes between hourly_profile rollups run by each API process; 0
+    # disables them, so run python -m app.services.hourly_profile from cron
+    HOURLY_PROFILE_REFRESH_MINUTES: int = 15
+    
+    # Changed store/SKUs pending in the inventory_health table above which
+    # the next overview read rebuilds the whole table instead
+    INVENTORY_HEALTH_FULL_REFRESH_PAIRS: int = 5000
+    
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000"
     
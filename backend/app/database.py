@@ -1,7 +1,30 @@
 """
 Database configuration and session management
+
+The ORM is synchronous; async routes run blocking database work on the
+bounded pools below (see api.offload) so it never stalls the event loop.
+Telemetry ingest has a pool of its own, so a burst of heavy analytics
+requests cannot queue sensor writes behind it.
+
+When enabled, engine hooks count the queries and database time of each
+request (see track_queries) and log statements slower than SLOW_QUERY_MS
+with their parameters and the app function that issued them.
+
+SQLite allows one writer at a time. Writes wait SQLITE_BUSY_TIMEOUT for
+the lock, and long write jobs are serialized with each other (long_write).
 """
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -9,9 +32,89 @@ from .config import settings
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    connect_args={
+        "check_same_thread": False,
+        "timeout": settings.SQLITE_BUSY_TIMEOUT
+    } if "sqlite" in settings.DATABASE_URL else {}
 )
 
+if engine.dialect.name == "sqlite" and settings.SQLITE_WAL:
+    @event.listens_for(engine, "connect")
+    def _enable_wal(dbapi_connection, connection_record):
+        """Let long analytics reads run alongside writes"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QueryStats:
+    """Statements executed and seconds spent in the database"""
+    
+    __slots__ = ("queries", "seconds")
+    
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Stats of the request being served; copied into the DB pool threads with the context
+_query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the statements executed in this context (and work offloaded from it)"""
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _calling_function() -> str:
+    """Innermost app function (outside this module) on the current stack"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename != __file__:
+            return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+    
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        params = repr(parameters)
+        if len(params) > 500:
+            params = params[:500] + "..."
+        logger.warning(
+            "Slow query (%.1f ms) from %s: %s | params: %s",
+            elapsed * 1000, _calling_function(), " ".join(statement.split()), params
+        )
+
+
+# Only hook the engine when something reads the timings
+QUERY_HOOKS_ENABLED = bool(settings.DB_QUERY_STATS or settings.SLOW_QUERY_MS)
+if QUERY_HOOKS_ENABLED:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -32,6 +135,96 @@ def get_db():
 
 def init_db():
     """
-    Initialize database - create all tables
+    Initialize database - create all tables, then migrate tables that
+    create_all leaves as an older release created them
     """
     Base.metadata.create_all(bind=engine)
+    _migrate_anomaly_unique_key()
+    _migrate_forecast_state_recent_days()
+
+
+def _migrate_anomaly_unique_key():
+    """
+    Add the (store_id, sku_id, ts_date) unique key that anomaly scans'
+    ON CONFLICT upserts need to anomaly_events tables created without it,
+    keeping the earliest event of any duplicates
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("anomaly_events"):
+        return
+    
+    key = ["store_id", "sku_id", "ts_date"]
+    if any(c["column_names"] == key for c in inspector.get_unique_constraints("anomaly_events")):
+        return
+    if any(i["unique"] and i["column_names"] == key for i in inspector.get_indexes("anomaly_events")):
+        return
+    
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM anomaly_events WHERE id NOT IN ("
+            "SELECT MIN(id) FROM anomaly_events GROUP BY store_id, sku_id, ts_date)"
+        ))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uix_anomaly_store_sku_date "
+            "ON anomaly_events (store_id, sku_id, ts_date)"
+        ))
+
+
+def _migrate_forecast_state_recent_days():
+    """
+    Add forecast_state.recent_days to tables created without it and replay
+    the state, whose sums were decayed per sales row rather than per day
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("forecast_state"):
+        return
+    if any(c["name"] == "recent_days" for c in inspector.get_columns("forecast_state")):
+        return
+    
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE forecast_state ADD COLUMN recent_days BIGINT NOT NULL DEFAULT 0"))
+    
+    from .services.forecast_state import catch_up_forecast_state
+    
+    db = SessionLocal()
+    try:
+        catch_up_forecast_state(db, rebuild=True)
+    finally:
+        db.close()
+
+
+# Bounded pools for blocking database work behind async routes
+DB_POOLS = {
+    "analytics": ThreadPoolExecutor(settings.DB_ANALYTICS_THREADS, thread_name_prefix="db-analytics"),
+    "ingest": ThreadPoolExecutor(settings.DB_INGEST_THREADS, thread_name_prefix="db-ingest"),
+}
+
+
+async def run_in_db_pool(func: Callable, *args, pool: str = "analytics", **kwargs) -> Any:
+    """
+    Await a blocking call on one of the DB pools
+    The caller's context variables are visible inside the call
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(DB_POOLS[pool], functools.partial(context.run, func, *args, **kwargs))
+
+
+
+# Long write jobs take turns within the process instead of queueing on
+# SQLite's busy timeout, which a job waiting behind another could outlast.
+# Reentrant because jobs call each other (demo generation runs the rebuilds).
+_long_write_lock = threading.RLock()
+
+
+def long_write(func: Callable) -> Callable:
+    """
+    Decorator running a long write job under the process-wide write lock
+    Short writes (telemetry, API edits) don't take it; they wait out the
+    job's write transactions through SQLITE_BUSY_TIMEOUT instead
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _long_write_lock:
+            return func(*args, **kwargs)
+    return wrapper
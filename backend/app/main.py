@@ -1,10 +1,19 @@
 """
 FastAPI main application
 """
-from fastapi import FastAPI
+import time
+from typing import List
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .database import init_db, SessionLocal
+from .database import init_db, SessionLocal, track_queries, QUERY_HOOKS_ENABLED
+from .services.cache import get_cache_stats
+from .services.hourly_profile import start_hourly_profile_refresher, stop_hourly_profile_refresher
+from .services.inventory_health import ensure_inventory_health
+from .services.metrics import (
+    REGISTRY, HTTP_REQUESTS_IN_FLIGHT, Counter, Gauge, Metric, observe_request
+)
+from .services.transfer_optimizer import get_plan_cache_stats
 from .api import overview, sku, transfers, demo, peak_hours, telemetry
 
 # Create FastAPI app
@@ -24,8 +33,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Time-ms"],
 )
 
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Record request count, latency and DB usage per route template; with
+    DB_QUERY_STATS also report the query count and DB time in headers
+    """
+    started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    status = 500
+    
+    try:
+        if QUERY_HOOKS_ENABLED:
+            with track_queries() as stats:
+                response = await call_next(request)
+        else:
+            stats = None
+            response = await call_next(request)
+        status = response.status_code
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        
+        # Label by the matched route's template so path parameters don't split series
+        route = request.scope.get("route")
+        observe_request(
+            request.method,
+            getattr(route, "path_format", None) or "unmatched",
+            status,
+            time.perf_counter() - started,
+            stats.queries if stats is not None else None,
+            stats.seconds if stats is not None else 0.0
+        )
+    
+    if settings.DB_QUERY_STATS:
+        response.headers["X-DB-Queries"] = str(stats.queries)
+        response.headers["X-DB-Time-ms"] = f"{stats.seconds * 1000:.1f}"
+    return response
+
+
 # Include API routers
 app.include_router(overview.router, prefix="/api", tags=["overview"])
 app.include_router(sku.router, prefix="/api", tags=["sku"])
@@ -54,10 +103,22 @@ async def startup_event():
             print("✅ Demo data generated successfully")
         else:
             print(f"✅ Found existing data ({store_count} stores)")
+        
+        # Rebuild a missing or stale inventory_health table in the background
+        ensure_inventory_health(db)
     except Exception as e:
         print(f"⚠️  Error checking/generating demo data: {e}")
     finally:
         db.close()
+    
+    # Roll newly loaded hourly sales up into hourly_profile on a timer
+    start_hourly_profile_refresher()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop background jobs"""
+    stop_hourly_profile_refresher()
 
 
 @app.get("/api/health")
@@ -70,6 +131,43 @@ async def health_check():
     }
 
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """In-process cache sizes and hit/miss/eviction counters of the worker that answers"""
+    return {
+        "caches": get_cache_stats(),
+        "transfer_plan": get_plan_cache_stats()
+    }
+
+
+def collect_cache_metrics() -> List[Metric]:
+    """Hit/miss counters, sizes and hit ratios of the in-process caches"""
+    hits = Counter("cache_hits_total", "Cache lookups answered from the cache", ("cache",))
+    misses = Counter("cache_misses_total", "Cache lookups that had to compute", ("cache",))
+    entries = Gauge("cache_entries", "Entries currently cached", ("cache",))
+    hit_ratio = Gauge("cache_hit_ratio", "Hits over lookups since the process started", ("cache",))
+    
+    caches = dict(get_cache_stats())
+    caches["transfer_plan"] = get_plan_cache_stats()
+    
+    for name, stats in caches.items():
+        hits.inc(stats["hits"], cache=name)
+        misses.inc(stats["misses"], cache=name)
+        entries.set(stats["entries"], cache=name)
+        hit_ratio.set(stats["hit_rate"], cache=name)
+    
+    return [hits, misses, entries, hit_ratio]
+
+
+REGISTRY.add_collector(collect_cache_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -77,6 +175,7 @@ async def root():
         "message": "Optimus Inventory Health Dashboard API",
         "docs": "/docs",
         "health": "/api/health",
+        "metrics": "/metrics",
         "endpoints": {
             "overview": "/api/overview",
             "sku_detail": "/api/sku/{store_id}/{sku_id}",
@@ -9,11 +9,14 @@ from .receipt import ReceiptsDaily
 from .transfer import Transfer
 from .cycle_count import CycleCount
 from .supplier import Supplier, SKUSupplier
-from .anomaly import AnomalyEvent
+from .anomaly import AnomalyEvent, AnomalyScanWatermark, AnomalyRescanDate
 from .recommendation import TransferRecommendation, StoreDistance
 from .sales_hourly import SalesHourly
 from .prep_recommendation import PrepRecommendation, InventoryRealtime
 from .telemetry import Telemetry
+from .forecast_state import ForecastState
+from .hourly_profile import HourlyDemandProfile, HourlyProfileRollup
+from .inventory_health import InventoryHealthItem, InventoryHealthRefresh
 
 __all__ = [
     "Store",
@@ -26,10 +29,17 @@ __all__ = [
     "Supplier",
     "SKUSupplier",
     "AnomalyEvent",
+    "AnomalyScanWatermark",
+    "AnomalyRescanDate",
     "TransferRecommendation",
     "StoreDistance",
     "SalesHourly",
     "PrepRecommendation",
     "InventoryRealtime",
     "Telemetry",
+    "ForecastState",
+    "HourlyDemandProfile",
+    "HourlyProfileRollup",
+    "InventoryHealthItem",
+    "InventoryHealthRefresh",
 ]
@@ -1,8 +1,9 @@
 """
-Anomaly event model
+Anomaly event and anomaly scan bookkeeping models
 """
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
+from datetime import datetime
 from ..database import Base
 
 
@@ -23,5 +24,43 @@ class AnomalyEvent(Base):
     store = relationship("Store")
     sku = relationship("SKU")
     
+    # Unique constraint: one anomaly per store/sku/date
+    __table_args__ = (
+        UniqueConstraint('store_id', 'sku_id', 'ts_date', name='uix_anomaly_store_sku_date'),
+    )
+    
     def __repr__(self):
         return f"<AnomalyEvent(store={self.store_id}, sku={self.sku_id}, date={self.ts_date}, residual={self.residual}, severity='{self.severity}')>"
+
+
+class AnomalyScanWatermark(Base):
+    """Last date per store that scheduled anomaly scans no longer revisit"""
+    
+    __tablename__ = "anomaly_scan_watermarks"
+    
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    scanned_through = Column(Date, nullable=False)
+    last_receipt_id = Column(Integer, nullable=False, default=0)  # Receipts seen by the last scan
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    store = relationship("Store")
+    
+    def __repr__(self):
+        return f"<AnomalyScanWatermark(store={self.store_id}, scanned_through={self.scanned_through})>"
+
+
+class AnomalyRescanDate(Base):
+    """Store/date at or below the watermark touched by late data, pending rescan"""
+    
+    __tablename__ = "anomaly_rescan_dates"
+    
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    ts_date = Column(Date, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    store = relationship("Store")
+    
+    def __repr__(self):
+        return f"<AnomalyRescanDate(store={self.store_id}, date={self.ts_date})>"
@@ -0,0 +1,39 @@
+"""
+Forecast state model
+"""
+from sqlalchemy import Column, Integer, BigInteger, Float, Date, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from ..database import Base
+
+
+class ForecastState(Base):
+    """Running exponentially-weighted demand sums per store/SKU"""
+    
+    __tablename__ = "forecast_state"
+    
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    sku_id = Column(Integer, ForeignKey("skus.id"), primary_key=True)
+    
+    # Weekday / weekend weighted sums (weights decay once per elapsed day)
+    weekday_sum = Column(Float, nullable=False, default=0.0)
+    weekday_weight = Column(Float, nullable=False, default=0.0)
+    weekend_sum = Column(Float, nullable=False, default=0.0)
+    weekend_weight = Column(Float, nullable=False, default=0.0)
+    
+    # Weighted moments over all days, for demand variance
+    total_weight = Column(Float, nullable=False, default=0.0)
+    total_sum = Column(Float, nullable=False, default=0.0)
+    total_sq_sum = Column(Float, nullable=False, default=0.0)
+    
+    observations = Column(Integer, nullable=False, default=0)
+    recent_days = Column(BigInteger, nullable=False, default=0)  # Bit i: sales on last_date - i days
+    last_date = Column(Date, nullable=True)  # Most recent sales date folded in
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    store = relationship("Store")
+    sku = relationship("SKU")
+    
+    def __repr__(self):
+        return f"<ForecastState(store={self.store_id}, sku={self.sku_id}, last_date={self.last_date}, observations={self.observations})>"
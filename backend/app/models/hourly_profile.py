@@ -0,0 +1,44 @@
+"""
+Materialized hourly demand profile models
+"""
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from ..database import Base
+
+
+class HourlyDemandProfile(Base):
+    """Rolled-up hourly demand forecast per store/SKU/weekday/hour"""
+    
+    __tablename__ = "hourly_profile"
+    
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    sku_id = Column(Integer, ForeignKey("skus.id"), primary_key=True)
+    day_of_week = Column(Integer, primary_key=True)  # 0-6 (Monday=0)
+    hour_of_day = Column(Integer, primary_key=True)  # 0-23
+    
+    predicted_demand = Column(Float, nullable=False)  # Weighted demand incl. peak buffer
+    data_points = Column(Integer, nullable=False)
+    confidence = Column(String, nullable=False)  # low, medium, high
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    store = relationship("Store")
+    sku = relationship("SKU")
+    
+    def __repr__(self):
+        return f"<HourlyDemandProfile(store={self.store_id}, sku={self.sku_id}, day={self.day_of_week}, hour={self.hour_of_day}, demand={self.predicted_demand})>"
+
+
+class HourlyProfileRollup(Base):
+    """Single-row bookkeeping for the hourly_profile rollup job"""
+    
+    __tablename__ = "hourly_profile_rollup"
+    
+    id = Column(Integer, primary_key=True)
+    lookback_weeks = Column(Integer, nullable=False)
+    last_sales_id = Column(Integer, nullable=False, default=0)  # Highest SalesHourly id rolled up
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<HourlyProfileRollup(lookback_weeks={self.lookback_weeks}, last_sales_id={self.last_sales_id})>"
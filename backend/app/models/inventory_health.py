@@ -0,0 +1,56 @@
+"""
+Materialized inventory health models
+"""
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from ..database import Base
+
+
+class InventoryHealthItem(Base):
+    """Precomputed overview metrics for one store/SKU snapshot"""
+    
+    __tablename__ = "inventory_health"
+    
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    sku_id = Column(Integer, ForeignKey("skus.id"), primary_key=True)
+    as_of = Column(Date, nullable=False)  # Snapshot date the metrics describe
+    
+    on_hand = Column(Integer, nullable=False)
+    daily_demand = Column(Float, nullable=False)
+    days_of_cover = Column(Float, nullable=False)
+    stockout_date = Column(Date, nullable=True)  # None when demand is negligible
+    confidence_score = Column(Float, nullable=False)
+    confidence_grade = Column(String, nullable=False)
+    risk_rank = Column(Integer, nullable=False)  # 0-3, index into RISK_LEVELS
+    risk_level = Column(String, nullable=False)  # critical, high, medium, low
+    suggested_action = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    store = relationship("Store")
+    sku = relationship("SKU")
+    
+    # Keyset pagination walks (risk_rank, days_of_cover, store_id, sku_id),
+    # network-wide or within one store
+    __table_args__ = (
+        Index("ix_inventory_health_risk", "risk_rank", "days_of_cover", "store_id", "sku_id"),
+        Index("ix_inventory_health_store_risk", "store_id", "risk_rank", "days_of_cover", "sku_id"),
+    )
+    
+    def __repr__(self):
+        return f"<InventoryHealthItem(store={self.store_id}, sku={self.sku_id}, risk={self.risk_level}, cover={self.days_of_cover})>"
+
+
+class InventoryHealthRefresh(Base):
+    """Single-row bookkeeping for the inventory_health refresh job"""
+    
+    __tablename__ = "inventory_health_refresh"
+    
+    id = Column(Integer, primary_key=True)
+    as_of = Column(Date, nullable=False)  # Snapshot date of the last full refresh
+    items = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<InventoryHealthRefresh(as_of={self.as_of}, items={self.items})>"
@@ -20,7 +20,7 @@ class TransferRecommendation(Base):
     urgency_score = Column(Float, nullable=True)
     rationale = Column(Text, nullable=True)  # Plain-English explanation
     created_at = Column(DateTime, default=datetime.utcnow)
-    status = Column(String, default="pending")  # pending, accepted, rejected
+    status = Column(String, default="pending")  # pending, accepted, rejected, expired
     
     # Relationships
     from_store = relationship("Store", foreign_keys=[from_store_id])
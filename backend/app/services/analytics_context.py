@@ -0,0 +1,55 @@
+"""
+Request-scoped memoization for per store/SKU analytics lookups
+"""
+from typing import Any, Callable, Dict, Hashable
+
+
+class AnalyticsContext:
+    """
+    Memoizes forecasts, latest snapshots and anomaly lists for one request
+    
+    Create one per request and pass it as ``ctx`` to the forecasting,
+    confidence and transfer services. Repeated lookups for the same
+    store/SKU are then served from memory instead of the database.
+    """
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict[Hashable, Any]] = {}
+    
+    def get_or_compute(
+        self,
+        namespace: str,
+        key: Hashable,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """Return the memoized value for key, computing it on first use"""
+        entries = self._entries.setdefault(namespace, {})
+        
+        if key in entries:
+            self.hits += 1
+            return entries[key]
+        
+        self.misses += 1
+        value = compute()
+        entries[key] = value
+        return value
+    
+    def prime(self, namespace: str, values: Dict[Hashable, Any]) -> None:
+        """Seed entries computed in bulk without touching the counters"""
+        self._entries.setdefault(namespace, {}).update(values)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and entry counts per namespace"""
+        lookups = self.hits + self.misses
+        
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": {
+                namespace: len(entries)
+                for namespace, entries in self._entries.items()
+            }
+        }
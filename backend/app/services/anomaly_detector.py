@@ -1,13 +1,23 @@
 """
 Anomaly detection service with explainable results
 """
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, date
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, func
+from ..database import long_write
 from ..models import (
-    InventorySnapshot, SalesDaily, ReceiptsDaily, 
-    Transfer, AnomalyEvent
+    Store, InventorySnapshot, SalesDaily, ReceiptsDaily, 
+    Transfer, AnomalyEvent, AnomalyScanWatermark, AnomalyRescanDate
 )
+from .analytics_context import AnalyticsContext
+from .metrics import timed_job
+
+# Most recent days (today and yesterday) are reconciled again on every scan
+SCAN_SETTLE_DAYS = 2
 
 
 def detect_anomalies(
@@ -155,24 +165,48 @@ def generate_explanation(
     return f"Unexplained inventory change of {residual:.0f} units. Expected {expected_delta:+d}, actual {actual_delta:+d}."
 
 
+def get_recent_anomalies(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    days: int = 30,
+    ctx: Optional[AnalyticsContext] = None
+) -> List[AnomalyEvent]:
+    """
+    Get recorded anomalies for a store/SKU over the last N days (oldest first)
+    """
+    if ctx is not None:
+        return ctx.get_or_compute(
+            "anomalies",
+            (store_id, sku_id, days),
+            lambda: get_recent_anomalies(db, store_id, sku_id, days)
+        )
+    
+    start_date = datetime.now().date() - timedelta(days=days)
+    
+    return db.query(AnomalyEvent).filter(
+        AnomalyEvent.store_id == store_id,
+        AnomalyEvent.sku_id == sku_id,
+        AnomalyEvent.ts_date >= start_date
+    ).order_by(AnomalyEvent.ts_date).all()
+
+
 def find_anomaly_patterns(
     db: Session,
     store_id: int,
     sku_id: int,
-    days: int = 30
+    days: int = 30,
+    ctx: Optional[AnalyticsContext] = None
 ) -> Dict:
     """
     Find patterns in anomalies (e.g., systematic shrink)
     """
     end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=days)
     
-    anomalies = db.query(AnomalyEvent).filter(
-        AnomalyEvent.store_id == store_id,
-        AnomalyEvent.sku_id == sku_id,
-        AnomalyEvent.ts_date >= start_date,
-        AnomalyEvent.ts_date <= end_date
-    ).order_by(AnomalyEvent.ts_date).all()
+    anomalies = [
+        a for a in get_recent_anomalies(db, store_id, sku_id, days, ctx=ctx)
+        if a.ts_date <= end_date
+    ]
     
     if not anomalies:
         return {
@@ -198,59 +232,504 @@ def find_anomaly_patterns(
     }
 
 
+def reconcile_inventory(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    threshold: float = -5.0,
+    store_ids: Optional[List[int]] = None
+) -> List[Dict]:
+    """
+    Set-based version of detect_anomalies for every store/SKU and day
+    in (start_date, end_date]. Loads the window with one query per table
+    and computes actual_delta - expected_delta as store/SKU x day arrays.
+    Returns anomaly dicts (with store_id, sku_id, date) newest day first
+    """
+    num_days = (end_date - start_date).days + 1
+    if num_days < 2:
+        return []
+    
+    day_index = {start_date + timedelta(days=i): i for i in range(num_days)}
+    
+    # Snapshots (also defines the store/SKU pairs with recent activity)
+    snapshot_query = db.query(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id,
+        InventorySnapshot.ts_date,
+        InventorySnapshot.on_hand
+    ).filter(
+        InventorySnapshot.ts_date >= start_date,
+        InventorySnapshot.ts_date <= end_date
+    )
+    if store_ids is not None:
+        snapshot_query = snapshot_query.filter(InventorySnapshot.store_id.in_(store_ids))
+    snapshots = snapshot_query.all()
+    
+    pairs = sorted({(store_id, sku_id) for store_id, sku_id, _, _ in snapshots})
+    if not pairs:
+        return []
+    pair_index = {pair: i for i, pair in enumerate(pairs)}
+    
+    on_hand = np.zeros((len(pairs), num_days), dtype=np.int64)
+    has_snapshot = np.zeros(on_hand.shape, dtype=bool)
+    receipts = np.zeros(on_hand.shape, dtype=np.int64)
+    sales = np.zeros(on_hand.shape, dtype=np.int64)
+    transfers_in = np.zeros(on_hand.shape, dtype=np.int64)
+    transfers_out = np.zeros(on_hand.shape, dtype=np.int64)
+    
+    for store_id, sku_id, ts_date, qty in snapshots:
+        day = day_index.get(ts_date)
+        if day is not None:
+            on_hand[pair_index[(store_id, sku_id)], day] = qty
+            has_snapshot[pair_index[(store_id, sku_id)], day] = True
+    
+    def accumulate(target: np.ndarray, rows) -> None:
+        for store_id, sku_id, ts_date, qty in rows:
+            pair = pair_index.get((store_id, sku_id))
+            day = day_index.get(ts_date)
+            if pair is not None and day is not None:
+                target[pair, day] += qty
+    
+    receipt_query = db.query(
+        ReceiptsDaily.store_id,
+        ReceiptsDaily.sku_id,
+        ReceiptsDaily.ts_date,
+        ReceiptsDaily.qty_received
+    ).filter(
+        ReceiptsDaily.ts_date >= start_date,
+        ReceiptsDaily.ts_date <= end_date
+    )
+    if store_ids is not None:
+        receipt_query = receipt_query.filter(ReceiptsDaily.store_id.in_(store_ids))
+    accumulate(receipts, receipt_query.all())
+    
+    sales_query = db.query(
+        SalesDaily.store_id,
+        SalesDaily.sku_id,
+        SalesDaily.ts_date,
+        SalesDaily.qty_sold
+    ).filter(
+        SalesDaily.ts_date >= start_date,
+        SalesDaily.ts_date <= end_date
+    )
+    if store_ids is not None:
+        sales_query = sales_query.filter(SalesDaily.store_id.in_(store_ids))
+    accumulate(sales, sales_query.all())
+    
+    # Transfers: received ones count in at the receiver, shipped ones out at the donor
+    window_start = datetime.combine(start_date, datetime.min.time())
+    window_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    
+    transfer_query = db.query(Transfer).filter(
+        or_(
+            and_(
+                Transfer.status == 'received',
+                Transfer.received_at >= window_start,
+                Transfer.received_at < window_end
+            ),
+            and_(
+                Transfer.status.in_(['approved', 'in_transit', 'received']),
+                Transfer.created_at >= window_start,
+                Transfer.created_at < window_end
+            )
+        )
+    )
+    if store_ids is not None:
+        transfer_query = transfer_query.filter(
+            or_(Transfer.to_store_id.in_(store_ids), Transfer.from_store_id.in_(store_ids))
+        )
+    transfers = transfer_query.all()
+    
+    accumulate(transfers_in, [
+        (t.to_store_id, t.sku_id, t.received_at.date(), t.qty)
+        for t in transfers
+        if t.status == 'received' and t.received_at is not None
+    ])
+    accumulate(transfers_out, [
+        (t.from_store_id, t.sku_id, t.created_at.date(), t.qty)
+        for t in transfers
+        if t.created_at is not None
+    ])
+    
+    # Day 0 only serves as "yesterday" for day 1
+    actual_delta = on_hand[:, 1:] - on_hand[:, :-1]
+    expected_delta = (receipts - sales + transfers_in - transfers_out)[:, 1:]
+    residual = actual_delta - expected_delta
+    
+    is_anomaly = has_snapshot[:, 1:] & has_snapshot[:, :-1] & (residual < threshold)
+    
+    detected = []
+    
+    # Newest day first within each pair, matching the per-pair scan order
+    for pair, day in sorted(zip(*np.nonzero(is_anomaly)), key=lambda x: (x[0], -x[1])):
+        store_id, sku_id = pairs[pair]
+        check_date = start_date + timedelta(days=int(day) + 1)
+        col = int(day) + 1
+        
+        pair_residual = int(residual[pair, day])
+        pair_expected = int(expected_delta[pair, day])
+        pair_actual = int(actual_delta[pair, day])
+        receipts_qty = int(receipts[pair, col])
+        sales_qty = int(sales[pair, col])
+        transfers_in_qty = int(transfers_in[pair, col])
+        transfers_out_qty = int(transfers_out[pair, col])
+        
+        detected.append({
+            "store_id": store_id,
+            "sku_id": sku_id,
+            "date": check_date.isoformat(),
+            "is_anomaly": True,
+            "residual": pair_residual,
+            "severity": classify_severity(pair_residual),
+            "explanation": generate_explanation(
+                pair_residual, receipts_qty, sales_qty,
+                transfers_in_qty, transfers_out_qty,
+                pair_expected, pair_actual
+            ),
+            "expected_delta": pair_expected,
+            "actual_delta": pair_actual,
+            "receipts": receipts_qty,
+            "sales": sales_qty,
+            "transfers_in": transfers_in_qty,
+            "transfers_out": transfers_out_qty
+        })
+    
+    return detected
+
+
+def mark_for_rescan(
+    db: Session,
+    store_id: int,
+    ts_date: date
+) -> bool:
+    """
+    Service hook for late data (e.g. a transfer status change) on a date the
+    store's scan watermark has already passed. Queues the date for the next
+    scheduled scan; does not commit. Returns True if the date was queued
+    """
+    watermark = db.get(AnomalyScanWatermark, store_id)
+    
+    if watermark is None or ts_date > watermark.scanned_through:
+        return False  # Next scan covers it anyway
+    
+    if db.get(AnomalyRescanDate, (store_id, ts_date)) is None:
+        db.add(AnomalyRescanDate(store_id=store_id, ts_date=ts_date))
+    
+    return True
+
+
+def _pending_rescan_dates(
+    db: Session,
+    watermarks: Dict[int, AnomalyScanWatermark]
+) -> Dict[date, List[int]]:
+    """
+    Dates behind each store's watermark touched by late data:
+    queued rescan dates plus receipts inserted since the last scan
+    """
+    pending = defaultdict(set)
+    
+    for store_id, ts_date in db.query(AnomalyRescanDate.store_id, AnomalyRescanDate.ts_date).all():
+        pending[ts_date].add(store_id)
+    
+    if watermarks:
+        min_receipt_id = min(w.last_receipt_id for w in watermarks.values())
+        late_receipts = db.query(
+            ReceiptsDaily.store_id,
+            ReceiptsDaily.ts_date,
+            func.max(ReceiptsDaily.id)
+        ).filter(
+            ReceiptsDaily.id > min_receipt_id
+        ).group_by(
+            ReceiptsDaily.store_id, ReceiptsDaily.ts_date
+        ).all()
+        
+        for store_id, ts_date, max_id in late_receipts:
+            watermark = watermarks.get(store_id)
+            if watermark and max_id > watermark.last_receipt_id and ts_date <= watermark.scanned_through:
+                pending[ts_date].add(store_id)
+    
+    return {ts_date: sorted(store_ids) for ts_date, store_ids in pending.items()}
+
+
+def bulk_insert_anomaly_events(
+    db: Session,
+    anomalies: List[Dict],
+    update_existing: bool = False
+) -> List[Dict]:
+    """
+    Write anomaly dicts to anomaly_events in one INSERT ... ON CONFLICT batch
+    Conflicts on (store_id, sku_id, date) are skipped, or with update_existing
+    refreshed when the residual changed. Returns the anomalies actually
+    written (new rows, plus changed rows when updating); does not commit
+    """
+    if not anomalies:
+        return []
+    
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    rows = [
+        {
+            "store_id": a["store_id"],
+            "sku_id": a["sku_id"],
+            "ts_date": date.fromisoformat(a["date"]),
+            "residual": a["residual"],
+            "severity": a["severity"],
+            "explanation_hint": a["explanation"]
+        }
+        for a in anomalies
+    ]
+    
+    stmt = insert(AnomalyEvent)
+    conflict_target = ["store_id", "sku_id", "ts_date"]
+    
+    if update_existing:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_target,
+            set_={
+                "residual": stmt.excluded.residual,
+                "severity": stmt.excluded.severity,
+                "explanation_hint": stmt.excluded.explanation_hint
+            },
+            where=AnomalyEvent.residual != stmt.excluded.residual
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_target)
+    
+    written = db.execute(
+        stmt.returning(AnomalyEvent.store_id, AnomalyEvent.sku_id, AnomalyEvent.ts_date),
+        rows
+    ).all()
+    
+    written_keys = {(store_id, sku_id, ts_date.isoformat()) for store_id, sku_id, ts_date in written}
+    
+    return [
+        a for a in anomalies
+        if (a["store_id"], a["sku_id"], a["date"]) in written_keys
+    ]
+
+
+# A reconcile task: (start_date, end_date, store_ids)
+ReconcileTask = Tuple[date, date, List[int]]
+
+
+def clear_reconciled_events(
+    db: Session,
+    tasks: List[ReconcileTask],
+    anomalies: List[Dict]
+) -> int:
+    """
+    Delete events that a rescan no longer flags
+    Only days the tasks reconciled count: days in (start_date, end_date]
+    for their stores where the pair has a snapshot on the day and the day
+    before. Returns the number of events deleted; does not commit
+    """
+    flagged = {(a["store_id"], a["sku_id"], date.fromisoformat(a["date"])) for a in anomalies}
+    
+    candidates = {}
+    for start_date, end_date, store_ids in tasks:
+        if not store_ids:
+            continue
+        events = db.query(AnomalyEvent).filter(
+            AnomalyEvent.store_id.in_(store_ids),
+            AnomalyEvent.ts_date > start_date,
+            AnomalyEvent.ts_date <= end_date
+        ).all()
+        candidates.update(
+            (event.id, event) for event in events
+            if (event.store_id, event.sku_id, event.ts_date) not in flagged
+        )
+    
+    if not candidates:
+        return 0
+    
+    # Days without both snapshots were never checked, so they can't have cleared
+    events = list(candidates.values())
+    snapshots = set(db.query(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id,
+        InventorySnapshot.ts_date
+    ).filter(
+        InventorySnapshot.store_id.in_({event.store_id for event in events}),
+        InventorySnapshot.sku_id.in_({event.sku_id for event in events}),
+        InventorySnapshot.ts_date >= min(event.ts_date for event in events) - timedelta(days=1),
+        InventorySnapshot.ts_date <= max(event.ts_date for event in events)
+    ).all())
+    
+    cleared = 0
+    for event in events:
+        if (
+            (event.store_id, event.sku_id, event.ts_date) in snapshots
+            and (event.store_id, event.sku_id, event.ts_date - timedelta(days=1)) in snapshots
+        ):
+            # ORM deletes, so inventory_health sees which pairs changed
+            db.delete(event)
+            cleared += 1
+    
+    return cleared
+
+
+def _init_scan_worker() -> None:
+    """Give each pool process its own connections instead of the parent's pool"""
+    from ..database import engine
+    engine.dispose(close=False)
+
+
+def _reconcile_shard(tasks: List[ReconcileTask], threshold: float) -> List[Dict]:
+    """Run reconcile tasks for one store shard in a pool process"""
+    from ..database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        anomalies = []
+        for start_date, end_date, store_ids in tasks:
+            anomalies.extend(reconcile_inventory(db, start_date, end_date, threshold, store_ids))
+        return anomalies
+    finally:
+        db.close()
+
+
+def run_reconcile_tasks(
+    db: Session,
+    tasks: List[ReconcileTask],
+    threshold: float = -5.0,
+    workers: int = 1
+) -> List[Dict]:
+    """
+    Run reconcile tasks in-process, or split by store across a process pool
+    Each shard gets every task restricted to its own stores; results are
+    merged in (store, SKU, newest date first) order either way
+    """
+    if workers <= 1:
+        anomalies = []
+        for start_date, end_date, store_ids in tasks:
+            anomalies.extend(reconcile_inventory(db, start_date, end_date, threshold, store_ids))
+    else:
+        all_store_ids = sorted({store_id for _, _, store_ids in tasks for store_id in store_ids})
+        shards = [set(all_store_ids[i::workers]) for i in range(workers)]
+        
+        shard_tasks = [
+            [
+                (start_date, end_date, [s for s in store_ids if s in shard])
+                for start_date, end_date, store_ids in tasks
+                if any(s in shard for s in store_ids)
+            ]
+            for shard in shards
+            if shard
+        ]
+        
+        anomalies = []
+        with ProcessPoolExecutor(max_workers=len(shard_tasks), initializer=_init_scan_worker) as pool:
+            for shard_anomalies in pool.map(_reconcile_shard, shard_tasks, [threshold] * len(shard_tasks)):
+                anomalies.extend(shard_anomalies)
+    
+    anomalies.sort(key=lambda a: (a["store_id"], a["sku_id"], -date.fromisoformat(a["date"]).toordinal()))
+    
+    return anomalies
+
+
+@long_write
+@timed_job("anomaly_scan")
 def scan_for_anomalies(
     db: Session,
     days_back: int = 7,
-    threshold: float = -5.0
+    threshold: float = -5.0,
+    full_rescan: bool = False,
+    workers: int = 1
 ) -> List[Dict]:
     """
     Scan all store/SKU combinations for anomalies in recent days
+    Incremental by default: each store is reconciled only after its scan
+    watermark, plus older dates touched by late receipts or transfer changes.
+    full_rescan=True reconciles the whole days_back window again.
+    workers > 1 reconciles store shards in parallel processes; results are
+    still written in one transaction. Reconciled days replace the events on
+    file; returns the anomalies that are new or whose residual changed
     """
     end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=days_back)
+    window_start = end_date - timedelta(days=days_back)
+    scan_started_at = datetime.utcnow()
     
-    # Get all unique store/SKU combinations with recent activity
-    recent_snapshots = db.query(
-        InventorySnapshot.store_id,
-        InventorySnapshot.sku_id
-    ).filter(
-        InventorySnapshot.ts_date >= start_date
-    ).distinct().all()
-    
-    detected_anomalies = []
-    
-    for store_id, sku_id in recent_snapshots:
-        for day_offset in range(days_back):
-            check_date = end_date - timedelta(days=day_offset)
-            
-            anomaly = detect_anomalies(db, store_id, sku_id, check_date, threshold)
-            
-            if anomaly:
-                # Check if already recorded
-                existing = db.query(AnomalyEvent).filter(
-                    AnomalyEvent.store_id == store_id,
-                    AnomalyEvent.sku_id == sku_id,
-                    AnomalyEvent.ts_date == check_date
-                ).first()
-                
-                if not existing:
-                    # Record new anomaly
-                    new_anomaly = AnomalyEvent(
-                        store_id=store_id,
-                        sku_id=sku_id,
-                        ts_date=check_date,
-                        residual=anomaly["residual"],
-                        severity=anomaly["severity"],
-                        explanation_hint=anomaly["explanation"]
-                    )
-                    db.add(new_anomaly)
-                    detected_anomalies.append({
-                        "store_id": store_id,
-                        "sku_id": sku_id,
-                        "date": check_date.isoformat(),
-                        **anomaly
-                    })
+    # Receipts up to this id are accounted for once the scan completes
+    max_receipt_id = db.query(func.max(ReceiptsDaily.id)).scalar() or 0
+    
+    store_ids = [store_id for (store_id,) in db.query(Store.id).all()]
+    watermarks = {w.store_id: w for w in db.query(AnomalyScanWatermark).all()}
+    
+    # Group stores by the first date they still need reconciled
+    stores_by_start = defaultdict(list)
+    for store_id in store_ids:
+        watermark = watermarks.get(store_id)
+        if full_rescan or watermark is None:
+            start_date = window_start
+        else:
+            start_date = max(window_start, watermark.scanned_through)
+        stores_by_start[start_date].append(store_id)
+    
+    tasks: List[ReconcileTask] = []
+    checked_from = {}
+    
+    for start_date, start_store_ids in stores_by_start.items():
+        tasks.append((start_date, end_date, start_store_ids))
+        checked_from.update({store_id: start_date for store_id in start_store_ids})
+    
+    # Revisit older dates touched by late data
+    for check_date, late_store_ids in sorted(_pending_rescan_dates(db, watermarks).items()):
+        late_store_ids = [
+            store_id for store_id in late_store_ids
+            if check_date <= checked_from.get(store_id, end_date)
+        ]
+        if late_store_ids:
+            tasks.append((check_date - timedelta(days=1), check_date, late_store_ids))
+    
+    anomalies = run_reconcile_tasks(db, tasks, threshold, workers)
+    
+    db.query(AnomalyRescanDate).filter(
+        AnomalyRescanDate.created_at <= scan_started_at
+    ).delete()
+    
+    # Rescanned days replace what is on file: record new anomalies, refresh
+    # changed residuals and drop events whose day now reconciles
+    detected_anomalies = bulk_insert_anomaly_events(db, anomalies, update_existing=True)
+    clear_reconciled_events(db, tasks, anomalies)
+    
+    # Advance watermarks, leaving the settle window open for the next run
+    scanned_through = end_date - timedelta(days=SCAN_SETTLE_DAYS)
+    for store_id in store_ids:
+        watermark = watermarks.get(store_id)
+        if watermark is None:
+            db.add(AnomalyScanWatermark(
+                store_id=store_id,
+                scanned_through=scanned_through,
+                last_receipt_id=max_receipt_id
+            ))
+        else:
+            watermark.scanned_through = max(watermark.scanned_through, scanned_through)
+            watermark.last_receipt_id = max_receipt_id
     
     db.commit()
     
     return detected_anomalies
+
+
+if __name__ == "__main__":
+    import argparse
+    from ..database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Scan inventory for anomalies")
+    parser.add_argument("--days-back", type=int, default=7, help="scan window in days")
+    parser.add_argument("--full", action="store_true", help="ignore watermarks and rescan the whole window")
+    parser.add_argument("--workers", type=int, default=1, help="parallel store shards")
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        detected = scan_for_anomalies(
+            db, days_back=args.days_back, full_rescan=args.full, workers=args.workers
+        )
+        print(f"✅ Recorded {len(detected)} new or changed anomalies")
+    finally:
+        db.close()
@@ -0,0 +1,151 @@
+"""
+Bounded in-process cache with LRU eviction, TTL expiry and hit/miss stats
+
+Caches are per process on purpose. They hold numpy-backed objects that a
+shared store (e.g. Redis) would have to serialize on every hit, and the
+database already holds the shared, materialized copy (e.g. hourly_profile),
+so a miss costs one indexed query rather than a rebuild. What that costs
+with N uvicorn workers:
+  - memory: up to N x max_entries values, one copy per worker
+  - hit rate: each worker warms its own copy, so a value is computed up to
+    N times and stats (/api/cache/stats) describe only the answering worker
+  - staleness: invalidate() only clears the calling worker's copy; other
+    workers keep serving their entries until the TTL expires them
+Keep the TTL at the staleness the data can tolerate, and use a shared
+backend instead if cross-worker invalidation has to be immediate.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Named caches, so their stats can be reported together
+_registry: Dict[str, "BoundedCache"] = {}
+
+
+class BoundedCache:
+    """
+    LRU + TTL cache holding at most ``max_entries`` values
+    
+    Entries live in namespaces (e.g. one per service function) so a whole
+    namespace can be invalidated at once. Expired entries are dropped on
+    access; when the cache is full the least recently used entry is evicted,
+    so memory stays bounded however long the process runs. Each process
+    (e.g. each uvicorn worker) holds its own copy; see the module docstring.
+    """
+    
+    def __init__(self, name: str, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        
+        # (namespace, key) -> (expires_at, value), least recently used first
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._namespace_sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _drop(self, entry_key: Tuple[str, Hashable]) -> None:
+        """Remove one entry (lock held)"""
+        del self._entries[entry_key]
+        namespace = entry_key[0]
+        self._namespace_sizes[namespace] -= 1
+        if not self._namespace_sizes[namespace]:
+            del self._namespace_sizes[namespace]
+    
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        """Cached value, or default when missing or expired"""
+        entry_key = (namespace, key)
+        
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(entry_key)
+                self.expirations += 1
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, namespace: str, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries if full"""
+        entry_key = (namespace, key)
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        
+        with self._lock:
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+            else:
+                self._namespace_sizes[namespace] = self._namespace_sizes.get(namespace, 0) + 1
+            
+            self._entries[entry_key] = (expires_at, value)
+            
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(namespace, key, missing)
+        
+        if value is missing:
+            value = compute()
+            self.set(namespace, key, value)
+        
+        return value
+    
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """Drop every entry of a namespace (or the whole cache); returns entries dropped"""
+        with self._lock:
+            if namespace is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._namespace_sizes.clear()
+                return dropped
+            
+            stale = [entry_key for entry_key in self._entries if entry_key[0] == namespace]
+            for entry_key in stale:
+                self._drop(entry_key)
+            return len(stale)
+    
+    def stats(self) -> Dict:
+        """Size, hit/miss/eviction counters and entries per namespace"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "namespaces": dict(self._namespace_sizes)
+            }
+
+
+def get_cache(name: str, max_entries: int = 10000, ttl_seconds: float = 300) -> BoundedCache:
+    """Named cache, created with these limits on first use"""
+    cache = _registry.get(name)
+    if cache is None:
+        cache = _registry[name] = BoundedCache(name, max_entries, ttl_seconds)
+    return cache
+
+
+def get_cache_stats() -> Dict[str, Dict]:
+    """Stats for every named cache"""
+    return {name: cache.stats() for name, cache in _registry.items()}
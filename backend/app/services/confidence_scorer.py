@@ -1,61 +1,47 @@
 """
 Inventory accuracy confidence scoring service
 """
-from datetime import datetime, timedelta
-from typing import Dict
+import heapq
+from datetime import datetime, timedelta, date
+from typing import Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from ..models import AnomalyEvent, CycleCount, SKU
-from .anomaly_detector import find_anomaly_patterns
+from sqlalchemy import func, case
+from ..models import AnomalyEvent, CycleCount, SKU, Store
+from .analytics_context import AnalyticsContext
+from .anomaly_detector import find_anomaly_patterns, get_recent_anomalies
 
 
-def calculate_confidence_score(
-    db: Session,
-    store_id: int,
-    sku_id: int
+def _score_from_factors(
+    anomaly_count: int,
+    total_residual: float,
+    last_count_date: Optional[date],
+    is_perishable: bool,
+    has_pattern: bool,
+    negative_ratio: float
 ) -> Dict:
     """
-    Calculate inventory accuracy confidence score (0-100)
-    Starts at 100, deducts points for various risk factors
+    Apply the confidence deductions to pre-computed risk factors
+    Shared by the per-item and bulk scorers so both grade identically
     """
     score = 100.0
     deductions = []
     
-    # Get SKU info
-    sku = db.query(SKU).filter(SKU.id == sku_id).first()
-    if not sku:
-        return {"score": 0, "grade": "F", "deductions": ["SKU not found"]}
-    
     # 1. Anomaly frequency penalty (max -30 points)
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=30)
-    
-    anomalies = db.query(AnomalyEvent).filter(
-        AnomalyEvent.store_id == store_id,
-        AnomalyEvent.sku_id == sku_id,
-        AnomalyEvent.ts_date >= start_date
-    ).all()
-    
-    anomaly_count = len(anomalies)
     if anomaly_count > 0:
         anomaly_penalty = min(anomaly_count * 5, 30)
         score -= anomaly_penalty
         deductions.append(f"Anomaly frequency: -{anomaly_penalty} ({anomaly_count} events in 30 days)")
     
     # 2. Anomaly magnitude penalty (max -20 points)
-    if anomalies:
-        total_residual = sum(abs(a.residual) for a in anomalies)
+    if anomaly_count > 0:
         magnitude_penalty = min(total_residual * 0.5, 20)
         score -= magnitude_penalty
         deductions.append(f"Anomaly magnitude: -{magnitude_penalty:.0f} ({total_residual:.0f} units lost)")
     
     # 3. Days since last cycle count penalty (max -20 points)
-    last_count = db.query(CycleCount).filter(
-        CycleCount.store_id == store_id,
-        CycleCount.sku_id == sku_id
-    ).order_by(CycleCount.ts_date.desc()).first()
-    
-    if last_count:
-        days_since_count = (datetime.now().date() - last_count.ts_date).days
+    days_since_count = None
+    if last_count_date:
+        days_since_count = (datetime.now().date() - last_count_date).days
         count_penalty = min(days_since_count * 0.3, 20)
         score -= count_penalty
         deductions.append(f"Days since count: -{count_penalty:.0f} ({days_since_count} days)")
@@ -64,16 +50,15 @@ def calculate_confidence_score(
         deductions.append("Never counted: -30")
     
     # 4. Perishable item penalty (if no recent count)
-    if sku.is_perishable:
-        if not last_count or (datetime.now().date() - last_count.ts_date).days > 7:
+    if is_perishable:
+        if not last_count_date or days_since_count > 7:
             score -= 10
             deductions.append("Perishable without recent count: -10")
     
     # 5. Systematic shrink pattern penalty (max -15 points)
-    pattern = find_anomaly_patterns(db, store_id, sku_id, days=30)
-    if pattern["has_pattern"]:
+    if has_pattern:
         score -= 15
-        deductions.append(f"Systematic shrink pattern: -15 ({pattern['negative_ratio']*100:.0f}% negative)")
+        deductions.append(f"Systematic shrink pattern: -15 ({negative_ratio*100:.0f}% negative)")
     
     # Ensure score is between 0 and 100
     final_score = max(0, min(100, score))
@@ -95,9 +80,125 @@ def calculate_confidence_score(
         "grade": grade,
         "deductions": deductions,
         "anomaly_count": anomaly_count,
-        "days_since_count": days_since_count if last_count else None,
-        "has_systematic_pattern": pattern["has_pattern"]
+        "days_since_count": days_since_count,
+        "has_systematic_pattern": has_pattern
+    }
+
+
+def calculate_confidence_score(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    ctx: Optional[AnalyticsContext] = None
+) -> Dict:
+    """
+    Calculate inventory accuracy confidence score (0-100)
+    Starts at 100, deducts points for various risk factors
+    """
+    # Anomaly frequency, magnitude and pattern checks share one anomaly list
+    if ctx is None:
+        ctx = AnalyticsContext()
+    
+    # Get SKU info
+    sku = db.query(SKU).filter(SKU.id == sku_id).first()
+    if not sku:
+        return {"score": 0, "grade": "F", "deductions": ["SKU not found"]}
+    
+    anomalies = get_recent_anomalies(db, store_id, sku_id, days=30, ctx=ctx)
+    
+    last_count = db.query(CycleCount).filter(
+        CycleCount.store_id == store_id,
+        CycleCount.sku_id == sku_id
+    ).order_by(CycleCount.ts_date.desc()).first()
+    
+    pattern = find_anomaly_patterns(db, store_id, sku_id, days=30, ctx=ctx)
+    
+    return _score_from_factors(
+        anomaly_count=len(anomalies),
+        total_residual=sum(abs(a.residual) for a in anomalies),
+        last_count_date=last_count.ts_date if last_count else None,
+        is_perishable=sku.is_perishable,
+        has_pattern=pattern["has_pattern"],
+        negative_ratio=pattern.get("negative_ratio", 0)
+    )
+
+
+def score_confidence_bulk(
+    db: Session,
+    store_id: Optional[int] = None
+) -> Dict[Tuple[int, int], Dict]:
+    """
+    Confidence score for every store/SKU pair (one store or the whole network)
+    Uses grouped aggregates per pair instead of per-item queries;
+    returns the same dicts as calculate_confidence_score keyed by (store_id, sku_id)
+    """
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=30)
+    
+    # Anomaly count and magnitude cover ts_date >= start_date; the pattern
+    # check (find_anomaly_patterns) additionally stops at today
+    in_pattern_window = AnomalyEvent.ts_date <= end_date
+    anomaly_query = db.query(
+        AnomalyEvent.store_id,
+        AnomalyEvent.sku_id,
+        func.count(AnomalyEvent.id),
+        func.sum(func.abs(AnomalyEvent.residual)),
+        func.sum(case((in_pattern_window, 1), else_=0)),
+        func.sum(case((in_pattern_window & (AnomalyEvent.residual < 0), 1), else_=0))
+    ).filter(
+        AnomalyEvent.ts_date >= start_date
+    )
+    
+    count_query = db.query(
+        CycleCount.store_id,
+        CycleCount.sku_id,
+        func.max(CycleCount.ts_date)
+    )
+    
+    store_query = db.query(Store.id)
+    
+    if store_id is not None:
+        anomaly_query = anomaly_query.filter(AnomalyEvent.store_id == store_id)
+        count_query = count_query.filter(CycleCount.store_id == store_id)
+        store_query = store_query.filter(Store.id == store_id)
+    
+    anomaly_stats = {
+        (row_store, row_sku): (count, total_residual or 0.0, pattern_count or 0, negative_count or 0)
+        for row_store, row_sku, count, total_residual, pattern_count, negative_count in anomaly_query.group_by(
+            AnomalyEvent.store_id, AnomalyEvent.sku_id
+        ).all()
     }
+    
+    last_counts = {
+        (row_store, row_sku): last_date
+        for row_store, row_sku, last_date in count_query.group_by(
+            CycleCount.store_id, CycleCount.sku_id
+        ).all()
+    }
+    
+    skus = db.query(SKU.id, SKU.is_perishable).all()
+    
+    scores = {}
+    
+    for (pair_store_id,) in store_query.all():
+        for sku_id, is_perishable in skus:
+            count, total_residual, pattern_count, negative_count = anomaly_stats.get(
+                (pair_store_id, sku_id), (0, 0.0, 0, 0)
+            )
+            
+            # Pattern detected if 60%+ of anomalies are negative
+            has_pattern = pattern_count > 0 and negative_count >= pattern_count * 0.6
+            
+            scores[(pair_store_id, sku_id)] = _score_from_factors(
+                anomaly_count=count,
+                total_residual=total_residual,
+                last_count_date=last_counts.get((pair_store_id, sku_id)),
+                is_perishable=is_perishable,
+                has_pattern=has_pattern,
+                negative_ratio=round(negative_count / pattern_count, 2) if pattern_count else 0
+            )
+    
+    return scores
 
 
 def get_low_confidence_items(
@@ -106,35 +207,38 @@ def get_low_confidence_items(
     limit: int = 50
 ) -> list:
     """
-    Get store/SKU combinations with low confidence scores
+    Get the lowest-confidence store/SKU combinations across the network
+    Scores every stocked item in bulk and keeps the worst `limit` in a bounded heap
     """
-    # Get all recent inventory items
+    from ..models import InventorySnapshot
+    
+    # Items stocked as of yesterday's snapshot
     recent_date = datetime.now().date() - timedelta(days=1)
     
-    from ..models import InventorySnapshot
     recent_items = db.query(
         InventorySnapshot.store_id,
         InventorySnapshot.sku_id
     ).filter(
         InventorySnapshot.ts_date == recent_date
-    ).limit(limit * 2).all()  # Get more than needed, filter by score
-    
-    low_confidence_items = []
+    ).all()
     
-    for store_id, sku_id in recent_items:
-        confidence = calculate_confidence_score(db, store_id, sku_id)
-        
-        if confidence["score"] < threshold:
-            low_confidence_items.append({
-                "store_id": store_id,
-                "sku_id": sku_id,
-                "confidence": confidence
-            })
+    scores = score_confidence_bulk(db)
     
-    # Sort by score (lowest first)
-    low_confidence_items.sort(key=lambda x: x["confidence"]["score"])
+    candidates = (
+        (scores[(store_id, sku_id)]["score"], store_id, sku_id)
+        for store_id, sku_id in recent_items
+        if (store_id, sku_id) in scores and scores[(store_id, sku_id)]["score"] < threshold
+    )
     
-    return low_confidence_items[:limit]
+    # Lowest score first; ties broken by store then SKU for a stable order
+    return [
+        {
+            "store_id": store_id,
+            "sku_id": sku_id,
+            "confidence": scores[(store_id, sku_id)]
+        }
+        for _, store_id, sku_id in heapq.nsmallest(limit, candidates)
+    ]
 
 
 def recommend_cycle_count_priority(
@@ -165,10 +269,12 @@ def recommend_cycle_count_priority(
         InventorySnapshot.ts_date == recent_date
     ).all()
     
+    scores = score_confidence_bulk(db, store_id=store_id)
+    
     recommendations = []
     
     for sku_id, on_hand, name, category, price, is_perishable in items:
-        confidence = calculate_confidence_score(db, store_id, sku_id)
+        confidence = scores[(store_id, sku_id)]
         
         # Calculate priority score
         # Lower confidence = higher priority
@@ -0,0 +1,68 @@
+"""
+Process-wide data version for caches built from inventory, sales, transfers
+and inventory accuracy (anomalies, cycle counts)
+
+Any committed ORM change to a tracked model bumps the version, so cached
+results stamped with an older version can be discarded. Writes made by other
+processes are not seen; caches keep a TTL as a backstop for those.
+"""
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..models import (
+    InventorySnapshot, SalesDaily, Transfer, Store, SKU, StoreDistance,
+    AnomalyEvent, CycleCount
+)
+
+TRACKED_MODELS = (
+    InventorySnapshot, SalesDaily, Transfer, Store, SKU, StoreDistance,
+    AnomalyEvent, CycleCount
+)
+
+_data_version = 0
+
+
+def get_data_version() -> int:
+    """Current data version"""
+    return _data_version
+
+
+def bump_data_version() -> int:
+    """Invalidate everything cached against the current version"""
+    global _data_version
+    _data_version += 1
+    return _data_version
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_changes(session, flush_context):
+    """Note unit-of-work changes to tracked models"""
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, TRACKED_MODELS):
+            session.info["data_changed"] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state):
+    """Note bulk INSERT/UPDATE/DELETE statements against tracked models"""
+    if orm_execute_state.is_select:
+        return
+    
+    for mapper in orm_execute_state.all_mappers:
+        if issubclass(mapper.class_, TRACKED_MODELS):
+            orm_execute_state.session.info["data_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    """Bump once the changes are visible to other sessions"""
+    if session.info.pop("data_changed", False):
+        bump_data_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    """Rolled-back changes never became visible"""
+    session.info.pop("data_changed", None)
@@ -0,0 +1,372 @@
+"""
+Incrementally maintained EWMA demand state (forecast_state table)
+
+Each store/SKU keeps running exponentially-weighted sums, so folding in a
+new day of sales is O(1) and reading a forecast is one primary-key lookup.
+The newest sales day has weight 1 and weights decay by DECAY per elapsed
+calendar day (days without a sales row age the history too), over the
+full history rather than a fixed 28-day window. calculate_weighted_average
+decays per sales row within its window instead, so the two paths agree
+closely for SKUs that sell daily and drift apart for sparse sellers.
+
+A bitmap of the last RECENT_DAYS sales days gives the exact number of
+sales rows inside the forecast window, which drives the confidence grade.
+
+Catch up after bulk loads with:
+    python -m app.services.forecast_state [--rebuild]
+"""
+from datetime import datetime, timedelta, date
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from ..database import long_write
+from ..models import SalesDaily, ForecastState, Store, SKU
+from .metrics import timed_job
+
+DECAY = 0.95
+
+# Days covered by ForecastState.recent_days (bit i: sales on last_date - i);
+# 63 bits keep it a non-negative signed 64-bit integer
+RECENT_DAYS = 63
+RECENT_DAYS_MASK = (1 << RECENT_DAYS) - 1
+
+
+def _new_state(store_id: int, sku_id: int) -> ForecastState:
+    """Empty state row (column defaults only apply on flush)"""
+    return ForecastState(
+        store_id=store_id,
+        sku_id=sku_id,
+        weekday_sum=0.0,
+        weekday_weight=0.0,
+        weekend_sum=0.0,
+        weekend_weight=0.0,
+        total_weight=0.0,
+        total_sum=0.0,
+        total_sq_sum=0.0,
+        observations=0,
+        recent_days=0,
+        last_date=None
+    )
+
+
+def _reset_state(state: ForecastState) -> None:
+    """Zero the running sums before a replay"""
+    state.weekday_sum = state.weekday_weight = 0.0
+    state.weekend_sum = state.weekend_weight = 0.0
+    state.total_weight = state.total_sum = state.total_sq_sum = 0.0
+    state.observations = 0
+    state.recent_days = 0
+    state.last_date = None
+
+
+def fold_sale(
+    state: ForecastState,
+    ts_date: date,
+    qty_sold: float,
+    decay: float = DECAY
+) -> None:
+    """
+    Fold one day of sales into the running sums
+    Days must arrive in date order; older days need a replay
+    """
+    elapsed = (ts_date - state.last_date).days if state.last_date is not None else 0
+    
+    # Age everything folded so far by the days since the last sales day
+    factor = decay ** elapsed
+    state.weekday_sum *= factor
+    state.weekday_weight *= factor
+    state.weekend_sum *= factor
+    state.weekend_weight *= factor
+    state.total_weight *= factor
+    state.total_sum *= factor
+    state.total_sq_sum *= factor
+    
+    if ts_date.weekday() >= 5:
+        state.weekend_sum += qty_sold
+        state.weekend_weight += 1
+    else:
+        state.weekday_sum += qty_sold
+        state.weekday_weight += 1
+    
+    state.total_weight += 1
+    state.total_sum += qty_sold
+    state.total_sq_sum += qty_sold ** 2
+    
+    state.observations += 1
+    state.recent_days = ((state.recent_days << elapsed) | 1) & RECENT_DAYS_MASK
+    state.last_date = ts_date
+
+
+def days_in_window(state: ForecastState, window_start: date) -> int:
+    """
+    Sales days from window_start through last_date, read from recent_days
+    Exact for windows of up to RECENT_DAYS days; longer ones are capped
+    """
+    span = (state.last_date - window_start).days + 1
+    if span <= 0:
+        return 0
+    
+    return (state.recent_days & ((1 << min(span, RECENT_DAYS)) - 1)).bit_count()
+
+
+def rebuild_forecast_state(
+    db: Session,
+    store_id: int,
+    sku_id: int
+) -> ForecastState:
+    """
+    Replay the full sales history of one store/SKU into its state row
+    """
+    state = db.get(ForecastState, (store_id, sku_id))
+    if state is None:
+        state = _new_state(store_id, sku_id)
+        db.add(state)
+    else:
+        _reset_state(state)
+    
+    sales = db.query(SalesDaily.ts_date, SalesDaily.qty_sold).filter(
+        SalesDaily.store_id == store_id,
+        SalesDaily.sku_id == sku_id
+    ).order_by(SalesDaily.ts_date).all()
+    
+    for ts_date, qty_sold in sales:
+        fold_sale(state, ts_date, qty_sold)
+    
+    return state
+
+
+def update_forecast_state(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    ts_date: date,
+    qty_sold: int
+) -> ForecastState:
+    """
+    Service hook for a newly landed SalesDaily row (does not commit)
+    In-order days are folded in O(1); late or corrected days trigger a replay
+    """
+    state = db.get(ForecastState, (store_id, sku_id))
+    
+    if state is not None and state.last_date is not None and ts_date <= state.last_date:
+        # The replay reads the sales table, so make the new row visible first
+        db.flush()
+        return rebuild_forecast_state(db, store_id, sku_id)
+    
+    if state is None:
+        state = _new_state(store_id, sku_id)
+        db.add(state)
+    
+    fold_sale(state, ts_date, qty_sold)
+    
+    return state
+
+
+def record_daily_sales(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    ts_date: date,
+    qty_sold: int
+) -> ForecastState:
+    """
+    Insert or correct a SalesDaily row and keep forecast_state in step
+    """
+    existing = db.query(SalesDaily).filter(
+        SalesDaily.store_id == store_id,
+        SalesDaily.sku_id == sku_id,
+        SalesDaily.ts_date == ts_date
+    ).first()
+    
+    if existing:
+        existing.qty_sold = qty_sold
+        db.flush()
+        state = rebuild_forecast_state(db, store_id, sku_id)
+    else:
+        db.add(SalesDaily(
+            store_id=store_id,
+            sku_id=sku_id,
+            ts_date=ts_date,
+            qty_sold=qty_sold
+        ))
+        state = update_forecast_state(db, store_id, sku_id, ts_date, qty_sold)
+    
+    db.commit()
+    
+    return state
+
+
+@long_write
+@timed_job("forecast_state_catch_up")
+def catch_up_forecast_state(
+    db: Session,
+    rebuild: bool = False
+) -> Dict:
+    """
+    Fold every SalesDaily row newer than its pair's last_date into the state table
+    Costs O(new rows); rebuild=True discards the table and replays all history
+    """
+    if rebuild:
+        db.query(ForecastState).delete()
+        db.flush()
+    
+    states = {
+        (state.store_id, state.sku_id): state
+        for state in db.query(ForecastState).all()
+    }
+    
+    new_sales = db.query(
+        SalesDaily.store_id,
+        SalesDaily.sku_id,
+        SalesDaily.ts_date,
+        SalesDaily.qty_sold
+    ).outerjoin(
+        ForecastState,
+        and_(
+            ForecastState.store_id == SalesDaily.store_id,
+            ForecastState.sku_id == SalesDaily.sku_id
+        )
+    ).filter(
+        or_(
+            ForecastState.last_date.is_(None),
+            SalesDaily.ts_date > ForecastState.last_date
+        )
+    ).order_by(
+        SalesDaily.store_id,
+        SalesDaily.sku_id,
+        SalesDaily.ts_date
+    ).all()
+    
+    created = 0
+    
+    for store_id, sku_id, ts_date, qty_sold in new_sales:
+        state = states.get((store_id, sku_id))
+        if state is None:
+            state = _new_state(store_id, sku_id)
+            db.add(state)
+            states[(store_id, sku_id)] = state
+            created += 1
+        
+        fold_sale(state, ts_date, qty_sold)
+    
+    db.commit()
+    
+    return {
+        "rows_applied": len(new_sales),
+        "states_created": created,
+        "states_total": len(states)
+    }
+
+
+def forecast_from_state(
+    state: Optional[ForecastState],
+    window_days: int = 28
+) -> Dict:
+    """
+    Build a calculate_demand_forecast-shaped dict from a state row
+    Pairs with no sales inside the window forecast zero, like the windowed path
+    """
+    window_start = datetime.now().date() - timedelta(days=window_days)
+    
+    if state is None or state.last_date is None or state.last_date < window_start:
+        return {
+            "daily_demand": 0.0,
+            "demand_std": 0.0,
+            "weekday_avg": 0.0,
+            "weekend_avg": 0.0,
+            "confidence": "low",
+            "data_points": 0
+        }
+    
+    weekday_avg = state.weekday_sum / state.weekday_weight if state.weekday_weight > 0 else 0.0
+    weekend_avg = state.weekend_sum / state.weekend_weight if state.weekend_weight > 0 else 0.0
+    
+    # Overall average (weighted by frequency: 5 weekdays, 2 weekend days)
+    if weekday_avg > 0 or weekend_avg > 0:
+        daily_demand = (weekday_avg * 5 + weekend_avg * 2) / 7
+    else:
+        daily_demand = 0.0
+    
+    if state.observations > 1 and state.total_weight > 0:
+        mean = state.total_sum / state.total_weight
+        variance = max(state.total_sq_sum / state.total_weight - mean ** 2, 0.0)
+        demand_std = variance ** 0.5
+    else:
+        demand_std = 0.0
+    
+    data_points = days_in_window(state, window_start)
+    confidence = "high" if data_points >= window_days * 0.8 else \
+                 "medium" if data_points >= window_days * 0.5 else "low"
+    
+    return {
+        "daily_demand": round(daily_demand, 2),
+        "demand_std": round(demand_std, 2),
+        "weekday_avg": round(weekday_avg, 2),
+        "weekend_avg": round(weekend_avg, 2),
+        "confidence": confidence,
+        "data_points": data_points
+    }
+
+
+def get_forecast_from_state(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    window_days: int = 28
+) -> Optional[Dict]:
+    """
+    Read a forecast with a single primary-key lookup
+    Returns None when the pair has no state row yet
+    """
+    state = db.get(ForecastState, (store_id, sku_id))
+    if state is None:
+        return None
+    
+    return forecast_from_state(state, window_days)
+
+
+def forecast_all_from_state(
+    db: Session,
+    store_ids: Optional[List[int]] = None,
+    sku_ids: Optional[List[int]] = None,
+    window_days: int = 28
+) -> Dict[Tuple[int, int], Dict]:
+    """
+    Read forecasts for many store/SKU pairs from the state table in one query
+    """
+    query = db.query(ForecastState)
+    if store_ids is not None:
+        query = query.filter(ForecastState.store_id.in_(store_ids))
+    if sku_ids is not None:
+        query = query.filter(ForecastState.sku_id.in_(sku_ids))
+    
+    states = {(s.store_id, s.sku_id): s for s in query.all()}
+    
+    if store_ids is None:
+        store_ids = [store_id for (store_id,) in db.query(Store.id).all()]
+    if sku_ids is None:
+        sku_ids = [sku_id for (sku_id,) in db.query(SKU.id).all()]
+    
+    return {
+        (store_id, sku_id): forecast_from_state(states.get((store_id, sku_id)), window_days)
+        for store_id in store_ids
+        for sku_id in sku_ids
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from ..database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Catch up the forecast_state table with new sales")
+    parser.add_argument("--rebuild", action="store_true", help="discard existing state and replay all history")
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        stats = catch_up_forecast_state(db, rebuild=args.rebuild)
+        print(f"✅ Applied {stats['rows_applied']} sales rows "
+              f"({stats['states_created']} new pairs, {stats['states_total']} total)")
+    finally:
+        db.close()
@@ -2,10 +2,14 @@
 Demand forecasting service with weekday/weekend patterns
 """
 from datetime import datetime, timedelta, date
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..models import SalesDaily, InventorySnapshot
+from sqlalchemy import and_, func
+from ..config import settings
+from ..models import SalesDaily, InventorySnapshot, Store, SKU
+from .analytics_context import AnalyticsContext
+from .forecast_state import get_forecast_from_state, forecast_all_from_state
 
 
 def calculate_weighted_average(values: List[float], decay: float = 0.95) -> float:
@@ -56,12 +60,25 @@ def calculate_demand_forecast(
     db: Session,
     store_id: int,
     sku_id: int,
-    window_days: int = 28
+    window_days: int = 28,
+    ctx: Optional[AnalyticsContext] = None
 ) -> Dict:
     """
     Calculate demand forecast using weighted moving average
     Accounts for weekday vs weekend patterns
     """
+    if ctx is not None:
+        return ctx.get_or_compute(
+            "forecast",
+            (store_id, sku_id, window_days),
+            lambda: calculate_demand_forecast(db, store_id, sku_id, window_days)
+        )
+    
+    if settings.FORECAST_SOURCE == "state":
+        forecast = get_forecast_from_state(db, store_id, sku_id, window_days)
+        if forecast is not None:
+            return forecast
+    
     # Get historical sales
     sales_history = get_sales_history(db, store_id, sku_id, window_days)
     
@@ -112,45 +129,265 @@ def calculate_demand_forecast(
     }
 
 
+def _weighted_average_matrix(
+    values: np.ndarray,
+    mask: np.ndarray,
+    decay: float = 0.95
+) -> np.ndarray:
+    """
+    Vectorized calculate_weighted_average over the last axis
+    Only entries where mask is True take part; the most recent one gets weight 1
+    """
+    # Number of included entries strictly after each position
+    later = np.flip(np.cumsum(np.flip(mask, -1), -1), -1) - mask
+    weights = np.where(mask, decay ** later, 0.0)
+    
+    weight_sum = weights.sum(axis=-1)
+    weighted_sum = (weights * values).sum(axis=-1)
+    
+    return np.divide(
+        weighted_sum, weight_sum,
+        out=np.zeros_like(weighted_sum), where=weight_sum > 0
+    )
+
+
+def forecast_all(
+    db: Session,
+    store_ids: Optional[List[int]] = None,
+    sku_ids: Optional[List[int]] = None,
+    window_days: int = 28,
+    ctx: Optional[AnalyticsContext] = None
+) -> Dict[Tuple[int, int], Dict]:
+    """
+    Calculate demand forecasts for every store/SKU pair in one pass
+    Loads the whole sales window with a single grouped query and computes
+    the same fields as calculate_demand_forecast on a store x SKU x day array.
+    Returns forecasts keyed by (store_id, sku_id)
+    """
+    if ctx is not None:
+        def compute() -> Dict[Tuple[int, int], Dict]:
+            forecasts = forecast_all(db, store_ids, sku_ids, window_days)
+            # Per-pair lookups later in the request are served from the bulk result
+            ctx.prime("forecast", {
+                (store_id, sku_id, window_days): forecast
+                for (store_id, sku_id), forecast in forecasts.items()
+            })
+            return forecasts
+        
+        key = (
+            tuple(sorted(store_ids)) if store_ids is not None else None,
+            tuple(sorted(sku_ids)) if sku_ids is not None else None,
+            window_days
+        )
+        return ctx.get_or_compute("forecast_all", key, compute)
+    
+    if settings.FORECAST_SOURCE == "state":
+        return forecast_all_from_state(db, store_ids, sku_ids, window_days)
+    
+    filter_stores = store_ids is not None
+    filter_skus = sku_ids is not None
+    
+    if store_ids is None:
+        store_ids = [store_id for (store_id,) in db.query(Store.id).all()]
+    if sku_ids is None:
+        sku_ids = [sku_id for (sku_id,) in db.query(SKU.id).all()]
+    
+    store_axis = np.array(sorted(set(store_ids)), dtype=np.int64)
+    sku_axis = np.array(sorted(set(sku_ids)), dtype=np.int64)
+    
+    # Same window as get_sales_history (both ends inclusive)
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=window_days)
+    num_days = window_days + 1
+    
+    qty = np.zeros((len(store_axis), len(sku_axis), num_days))
+    present = np.zeros(qty.shape, dtype=bool)
+    
+    if len(store_axis) and len(sku_axis):
+        query = db.query(
+            SalesDaily.store_id,
+            SalesDaily.sku_id,
+            SalesDaily.ts_date,
+            func.sum(SalesDaily.qty_sold)
+        ).filter(
+            SalesDaily.ts_date >= start_date,
+            SalesDaily.ts_date <= end_date
+        )
+        if filter_stores:
+            query = query.filter(SalesDaily.store_id.in_(store_axis.tolist()))
+        if filter_skus:
+            query = query.filter(SalesDaily.sku_id.in_(sku_axis.tolist()))
+        
+        rows = query.group_by(
+            SalesDaily.store_id, SalesDaily.sku_id, SalesDaily.ts_date
+        ).all()
+        
+        if rows:
+            row_stores, row_skus, row_dates, row_qty = zip(*rows)
+            row_stores = np.array(row_stores, dtype=np.int64)
+            row_skus = np.array(row_skus, dtype=np.int64)
+            day_index = {start_date + timedelta(days=i): i for i in range(num_days)}
+            row_days = np.array([day_index[d] for d in row_dates], dtype=np.int64)
+            
+            # Map ids onto array positions, dropping rows outside the requested axes
+            store_pos = np.minimum(np.searchsorted(store_axis, row_stores), len(store_axis) - 1)
+            sku_pos = np.minimum(np.searchsorted(sku_axis, row_skus), len(sku_axis) - 1)
+            keep = (store_axis[store_pos] == row_stores) & (sku_axis[sku_pos] == row_skus)
+            
+            qty[store_pos[keep], sku_pos[keep], row_days[keep]] = np.array(row_qty, dtype=float)[keep]
+            present[store_pos[keep], sku_pos[keep], row_days[keep]] = True
+    
+    is_weekend = np.array(
+        [(start_date + timedelta(days=i)).weekday() >= 5 for i in range(num_days)]
+    )
+    
+    # Weighted averages for weekday vs weekend
+    weekday_avg = _weighted_average_matrix(qty, present & ~is_weekend)
+    weekend_avg = _weighted_average_matrix(qty, present & is_weekend)
+    
+    daily_demand = np.where(
+        (weekday_avg > 0) | (weekend_avg > 0),
+        (weekday_avg * 5 + weekend_avg * 2) / 7,
+        0.0
+    )
+    
+    # Population standard deviation over all recorded days
+    data_points = present.sum(axis=-1)
+    safe_points = np.maximum(data_points, 1)
+    mean = qty.sum(axis=-1) / safe_points
+    variance = (np.where(present, qty - mean[..., None], 0.0) ** 2).sum(axis=-1) / safe_points
+    demand_std = np.where(data_points > 1, np.sqrt(variance), 0.0)
+    
+    forecasts = {}
+    
+    for i, store_id in enumerate(store_axis.tolist()):
+        for sku_id, demand, std, wd_avg, we_avg, points in zip(
+            sku_axis.tolist(),
+            daily_demand[i].tolist(),
+            demand_std[i].tolist(),
+            weekday_avg[i].tolist(),
+            weekend_avg[i].tolist(),
+            data_points[i].tolist()
+        ):
+            confidence = "high" if points >= window_days * 0.8 else \
+                         "medium" if points >= window_days * 0.5 else "low"
+            
+            forecasts[(store_id, sku_id)] = {
+                "daily_demand": round(demand, 2),
+                "demand_std": round(std, 2),
+                "weekday_avg": round(wd_avg, 2),
+                "weekend_avg": round(we_avg, 2),
+                "confidence": confidence,
+                "data_points": points
+            }
+    
+    return forecasts
+
+
+def days_of_cover_from_demand(on_hand: int, daily_demand: float) -> float:
+    """
+    Days of cover for a known on-hand quantity and daily demand
+    """
+    # Avoid division by zero
+    if daily_demand < 0.1:
+        return 999.0  # Effectively infinite if no demand
+    
+    return round(on_hand / daily_demand, 2)
+
+
+def get_latest_snapshot(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    ctx: Optional[AnalyticsContext] = None
+) -> Optional[InventorySnapshot]:
+    """Get the most recent inventory snapshot for a store/SKU"""
+    if ctx is not None:
+        return ctx.get_or_compute(
+            "latest_snapshot",
+            (store_id, sku_id),
+            lambda: get_latest_snapshot(db, store_id, sku_id)
+        )
+    
+    return db.query(InventorySnapshot).filter(
+        InventorySnapshot.store_id == store_id,
+        InventorySnapshot.sku_id == sku_id
+    ).order_by(InventorySnapshot.ts_date.desc()).first()
+
+
+def get_latest_on_hand(
+    db: Session,
+    store_ids: List[int],
+    sku_ids: List[int]
+) -> Dict[Tuple[int, int], int]:
+    """
+    On hand from the most recent snapshot of many store/SKUs in one query
+    Pairs without any snapshot are missing from the result
+    """
+    latest = db.query(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id,
+        func.max(InventorySnapshot.ts_date).label("ts_date")
+    ).filter(
+        InventorySnapshot.store_id.in_(store_ids),
+        InventorySnapshot.sku_id.in_(sku_ids)
+    ).group_by(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id
+    ).subquery()
+    
+    rows = db.query(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id,
+        InventorySnapshot.on_hand
+    ).join(
+        latest,
+        and_(
+            InventorySnapshot.store_id == latest.c.store_id,
+            InventorySnapshot.sku_id == latest.c.sku_id,
+            InventorySnapshot.ts_date == latest.c.ts_date
+        )
+    ).all()
+    
+    on_hand = {}
+    for store_id, sku_id, qty in rows:
+        on_hand.setdefault((store_id, sku_id), qty)
+    
+    return on_hand
+
+
 def calculate_days_of_cover(
     db: Session,
     store_id: int,
     sku_id: int,
-    on_hand: Optional[int] = None
+    on_hand: Optional[int] = None,
+    ctx: Optional[AnalyticsContext] = None
 ) -> float:
     """
     Calculate days of cover (inventory / daily demand)
     """
     # Get current inventory if not provided
     if on_hand is None:
-        latest_snapshot = db.query(InventorySnapshot).filter(
-            InventorySnapshot.store_id == store_id,
-            InventorySnapshot.sku_id == sku_id
-        ).order_by(InventorySnapshot.ts_date.desc()).first()
-        
+        latest_snapshot = get_latest_snapshot(db, store_id, sku_id, ctx=ctx)
         on_hand = latest_snapshot.on_hand if latest_snapshot else 0
     
     # Get demand forecast
-    forecast = calculate_demand_forecast(db, store_id, sku_id)
-    daily_demand = forecast["daily_demand"]
+    forecast = calculate_demand_forecast(db, store_id, sku_id, ctx=ctx)
     
-    # Avoid division by zero
-    if daily_demand < 0.1:
-        return 999.0  # Effectively infinite if no demand
-    
-    return round(on_hand / daily_demand, 2)
+    return days_of_cover_from_demand(on_hand, forecast["daily_demand"])
 
 
 def predict_stockout_date(
     db: Session,
     store_id: int,
     sku_id: int,
-    on_hand: Optional[int] = None
+    on_hand: Optional[int] = None,
+    ctx: Optional[AnalyticsContext] = None
 ) -> Optional[date]:
     """
     Predict when SKU will stock out based on current inventory and demand
     """
-    days_cover = calculate_days_of_cover(db, store_id, sku_id, on_hand)
+    days_cover = calculate_days_of_cover(db, store_id, sku_id, on_hand, ctx=ctx)
     
     if days_cover >= 999:
         return None  # No stockout expected
@@ -164,12 +401,13 @@ def calculate_reorder_point(
     store_id: int,
     sku_id: int,
     lead_time_days: int = 3,
-    safety_stock_days: int = 2
+    safety_stock_days: int = 2,
+    ctx: Optional[AnalyticsContext] = None
 ) -> Dict:
     """
     Calculate reorder point and recommended order quantity
     """
-    forecast = calculate_demand_forecast(db, store_id, sku_id)
+    forecast = calculate_demand_forecast(db, store_id, sku_id, ctx=ctx)
     daily_demand = forecast["daily_demand"]
     demand_std = forecast["demand_std"]
     
@@ -193,12 +431,13 @@ def get_forecast_next_n_days(
     db: Session,
     store_id: int,
     sku_id: int,
-    days: int = 7
+    days: int = 7,
+    ctx: Optional[AnalyticsContext] = None
 ) -> List[Dict]:
     """
     Get demand forecast for next N days
     """
-    forecast = calculate_demand_forecast(db, store_id, sku_id)
+    forecast = calculate_demand_forecast(db, store_id, sku_id, ctx=ctx)
     weekday_avg = forecast["weekday_avg"]
     weekend_avg = forecast["weekend_avg"]
     
@@ -0,0 +1,179 @@
+"""
+Rollup job for the materialized hourly_profile table
+
+Peak-hour forecasts read one row per weekday/hour from hourly_profile, so
+their cost does not depend on how much SalesHourly history exists. The job
+rebuilds the profile of every store/SKU that received SalesHourly rows
+since the last run (tracked by row id, so late and backfilled hours are
+picked up too).
+
+Nothing in the API writes hourly sales, so the API process rolls them up
+on a timer (HOURLY_PROFILE_REFRESH_MINUTES, started at startup); a run
+that finds no new rows writes nothing. With the timer disabled, schedule
+the job after each hourly sales load instead, e.g. from cron:
+    python -m app.services.hourly_profile [--rebuild]
+Until a rollup picks them up, new sales are missing from hourly forecasts.
+"""
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert
+from ..config import settings
+from ..database import SessionLocal, long_write
+from ..models import SalesHourly, HourlyDemandProfile, HourlyProfileRollup
+from .metrics import timed_job
+from .peak_hour_forecasting import build_hourly_profiles, invalidate_hourly_forecasts
+
+# SKUs rebuilt per raw-sales query
+ROLLUP_BATCH_SKUS = 500
+
+_refresher_thread: Optional[threading.Thread] = None
+_refresher_stop = threading.Event()
+
+logger = logging.getLogger(__name__)
+
+
+@long_write
+@timed_job("hourly_profile_refresh")
+def refresh_hourly_profiles(
+    db: Session,
+    rebuild: bool = False,
+    lookback_weeks: int = 8
+) -> Dict:
+    """
+    Roll new SalesHourly rows up into hourly_profile
+    Changed store/SKUs are rebuilt in full; rebuild=True (or a new lookback)
+    recomputes every pair. Deleted sales rows are only noticed by a rebuild.
+    """
+    rollup = db.get(HourlyProfileRollup, 1)
+    max_sales_id = db.query(func.max(SalesHourly.id)).scalar() or 0
+    
+    # Ids going backwards means the sales table was cleared and reloaded
+    if rollup is None or rollup.lookback_weeks != lookback_weeks or max_sales_id < rollup.last_sales_id:
+        rebuild = True
+    
+    pairs_query = db.query(SalesHourly.store_id, SalesHourly.sku_id).distinct()
+    if rebuild:
+        db.execute(delete(HourlyDemandProfile))
+    else:
+        pairs_query = pairs_query.filter(
+            SalesHourly.id > rollup.last_sales_id,
+            SalesHourly.id <= max_sales_id
+        )
+    
+    skus_by_store = defaultdict(list)
+    for store_id, sku_id in pairs_query.all():
+        skus_by_store[store_id].append(sku_id)
+    
+    # Nothing new: keep the cached forecasts
+    if not rebuild and not skus_by_store:
+        return {"pairs_refreshed": 0, "rows_written": 0, "last_sales_id": max_sales_id, "rebuilt": False}
+    
+    rows_written = 0
+    
+    for store_id, sku_ids in skus_by_store.items():
+        for start in range(0, len(sku_ids), ROLLUP_BATCH_SKUS):
+            batch = sku_ids[start:start + ROLLUP_BATCH_SKUS]
+            profiles = build_hourly_profiles(db, store_id, batch, lookback_weeks)
+            
+            rows = []
+            for sku_id, profile in profiles.items():
+                for day, hour in zip(*np.nonzero(profile.data_points)):
+                    forecast = profile.forecast(int(hour), int(day))
+                    rows.append({
+                        "store_id": store_id,
+                        "sku_id": sku_id,
+                        "day_of_week": int(day),
+                        "hour_of_day": int(hour),
+                        "predicted_demand": float(profile.predicted[day, hour]),
+                        "data_points": forecast["data_points"],
+                        "confidence": forecast["confidence"]
+                    })
+            
+            if not rebuild:
+                db.execute(delete(HourlyDemandProfile).where(
+                    HourlyDemandProfile.store_id == store_id,
+                    HourlyDemandProfile.sku_id.in_(batch)
+                ))
+            if rows:
+                db.execute(insert(HourlyDemandProfile), rows)
+            rows_written += len(rows)
+    
+    if rollup is None:
+        rollup = HourlyProfileRollup(id=1, lookback_weeks=lookback_weeks)
+        db.add(rollup)
+    rollup.lookback_weeks = lookback_weeks
+    rollup.last_sales_id = max_sales_id
+    
+    db.commit()
+    invalidate_hourly_forecasts()
+    
+    return {
+        "pairs_refreshed": sum(len(sku_ids) for sku_ids in skus_by_store.values()),
+        "rows_written": rows_written,
+        "last_sales_id": max_sales_id,
+        "rebuilt": rebuild
+    }
+
+
+
+def _refresh_loop(interval_seconds: float) -> None:
+    """Refresher thread: roll up new hourly sales until stopped"""
+    while not _refresher_stop.is_set():
+        db = SessionLocal()
+        try:
+            refresh_hourly_profiles(db)
+        except Exception:
+            logger.exception("Hourly profile refresh failed")
+            db.rollback()
+        finally:
+            db.close()
+        _refresher_stop.wait(interval_seconds)
+
+
+def start_hourly_profile_refresher(interval_minutes: Optional[float] = None) -> bool:
+    """
+    Roll up new hourly sales now and then every interval_minutes in a daemon thread
+    Returns False when the refresher is disabled or already running
+    """
+    global _refresher_thread
+    if interval_minutes is None:
+        interval_minutes = settings.HOURLY_PROFILE_REFRESH_MINUTES
+    if interval_minutes <= 0 or (_refresher_thread is not None and _refresher_thread.is_alive()):
+        return False
+    
+    _refresher_stop.clear()
+    _refresher_thread = threading.Thread(
+        target=_refresh_loop, args=(interval_minutes * 60,), name="hourly-profile-refresh", daemon=True
+    )
+    _refresher_thread.start()
+    return True
+
+
+def stop_hourly_profile_refresher() -> None:
+    """Stop the refresher thread after its current run"""
+    _refresher_stop.set()
+    if _refresher_thread is not None:
+        _refresher_thread.join()
+
+
+if __name__ == "__main__":
+    import argparse
+    from ..database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Roll new hourly sales up into the hourly_profile table")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every store/SKU profile")
+    parser.add_argument("--lookback-weeks", type=int, default=8, help="sales rows per weekday/hour")
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        stats = refresh_hourly_profiles(db, rebuild=args.rebuild, lookback_weeks=args.lookback_weeks)
+        print(f"✅ Refreshed {stats['pairs_refreshed']} store/SKU profiles "
+              f"({stats['rows_written']} rows, through sales id {stats['last_sales_id']})")
+    finally:
+        db.close()
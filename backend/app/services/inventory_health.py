@@ -0,0 +1,509 @@
+"""
+Inventory health pipeline behind the overview dashboard
+
+One snapshot query, a bulk demand forecast and bulk confidence scores feed
+array-level risk classification. The results are materialized in the
+inventory_health table, which the overview reads one keyset page at a time.
+
+The table is rebuilt by the batch job, and in a background thread at
+startup and on the first read of a new snapshot date; reads keep serving
+the previous table until the rebuild commits. In between, store/SKUs whose
+snapshots, sales, cycle counts or anomalies are committed in this process
+are recomputed before the next read. Rebuild after loading data from
+another process with:
+    python -m app.services.inventory_health
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, date
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import delete, event, insert, select, tuple_
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import SessionLocal, long_write
+from ..models import (
+    Store, SKU, InventorySnapshot, SalesDaily, CycleCount, AnomalyEvent,
+    InventoryHealthItem, InventoryHealthRefresh
+)
+from .analytics_context import AnalyticsContext
+from .confidence_scorer import score_confidence_bulk
+from .forecasting import forecast_all
+from .metrics import timed_job
+
+# Ordered most urgent first; risk_rank indexes into this
+RISK_LEVELS = ("critical", "high", "medium", "low")
+
+SUGGESTED_ACTIONS = (
+    "Transfer or reorder immediately",
+    "Schedule cycle count",
+    "Monitor closely",
+    "No action needed"
+)
+
+# Per store/SKU inputs; committed changes queue the pair for a refresh
+HEALTH_INPUT_MODELS = (InventorySnapshot, SalesDaily, CycleCount, AnomalyEvent)
+
+# SKUs recomputed per incremental refresh batch
+REFRESH_BATCH_SKUS = 500
+
+_pending_pairs: Set[Tuple[int, int]] = set()
+_pending_full = False
+_pending_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_rebuild_thread: Optional[threading.Thread] = None
+
+logger = logging.getLogger(__name__)
+
+
+def days_of_cover_matrix(on_hand: np.ndarray, daily_demand: np.ndarray) -> np.ndarray:
+    """days_of_cover_from_demand over arrays"""
+    cover = np.divide(on_hand, daily_demand, out=np.zeros(len(on_hand)), where=daily_demand >= 0.1)
+    return np.where(daily_demand < 0.1, 999.0, np.round(cover, 2))
+
+
+def classify_risk(days_of_cover: np.ndarray) -> np.ndarray:
+    """Risk rank (index into RISK_LEVELS) from days of cover"""
+    return np.select([days_of_cover < 3, days_of_cover < 7, days_of_cover < 14], [0, 1, 2], default=3)
+
+
+def suggest_actions(days_of_cover: np.ndarray, confidence_score: np.ndarray) -> np.ndarray:
+    """Suggested action (index into SUGGESTED_ACTIONS) per item"""
+    return np.select(
+        [days_of_cover < 7, confidence_score < 70, days_of_cover < 14],
+        [0, 1, 2],
+        default=3
+    )
+
+
+class InventoryHealth:
+    """
+    Health metrics for every store/SKU snapshot on one date
+    
+    Columns are parallel read-only arrays in (store_id, sku_id) order;
+    store and SKU names are joined in when the table is read.
+    """
+    
+    def __init__(
+        self,
+        as_of: date,
+        store_ids: np.ndarray,
+        sku_ids: np.ndarray,
+        on_hand: np.ndarray,
+        daily_demand: np.ndarray,
+        confidence_score: np.ndarray,
+        confidence_grade: np.ndarray
+    ):
+        self.as_of = as_of
+        self.store_ids = store_ids
+        self.sku_ids = sku_ids
+        self.on_hand = on_hand
+        self.daily_demand = daily_demand
+        self.confidence_score = confidence_score
+        self.confidence_grade = confidence_grade
+        
+        self.days_of_cover = days_of_cover_matrix(on_hand, daily_demand)
+        self.risk_rank = classify_risk(self.days_of_cover)
+        self.action = suggest_actions(self.days_of_cover, confidence_score)
+        
+        for array in (
+            store_ids, sku_ids, on_hand, daily_demand, confidence_score,
+            confidence_grade, self.days_of_cover, self.risk_rank, self.action
+        ):
+            array.flags.writeable = False
+    
+    def __len__(self) -> int:
+        return len(self.store_ids)
+    
+    def rows(self, today: Optional[date] = None) -> List[Dict]:
+        """inventory_health table rows; stockout dates count from today"""
+        if today is None:
+            today = datetime.now().date()
+        
+        days_of_cover = self.days_of_cover.tolist()
+        risk_rank = self.risk_rank.tolist()
+        action = self.action.tolist()
+        
+        return [
+            {
+                "store_id": store_id,
+                "sku_id": sku_id,
+                "as_of": self.as_of,
+                "on_hand": on_hand,
+                "daily_demand": daily_demand,
+                "days_of_cover": days_of_cover[k],
+                "stockout_date": None if days_of_cover[k] >= 999 else today + timedelta(days=int(days_of_cover[k])),
+                "confidence_score": confidence_score,
+                "confidence_grade": str(self.confidence_grade[k]),
+                "risk_rank": risk_rank[k],
+                "risk_level": RISK_LEVELS[risk_rank[k]],
+                "suggested_action": SUGGESTED_ACTIONS[action[k]]
+            }
+            for k, (store_id, sku_id, on_hand, daily_demand, confidence_score) in enumerate(zip(
+                self.store_ids.tolist(),
+                self.sku_ids.tolist(),
+                self.on_hand.tolist(),
+                self.daily_demand.tolist(),
+                self.confidence_score.tolist()
+            ))
+        ]
+
+
+def compute_inventory_health(
+    db: Session,
+    store_id: Optional[int] = None,
+    as_of: Optional[date] = None,
+    sku_ids: Optional[List[int]] = None,
+    ctx: Optional[AnalyticsContext] = None
+) -> InventoryHealth:
+    """
+    Health of every snapshot on as_of (default: yesterday), one store or the network,
+    optionally limited to some SKUs
+    One snapshot query, one bulk forecast and one bulk confidence pass
+    """
+    if as_of is None:
+        as_of = datetime.now().date() - timedelta(days=1)
+    
+    known_stores = set(db.scalars(select(Store.id)))
+    known_skus = set(db.scalars(select(SKU.id)))
+    
+    query = select(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id,
+        InventorySnapshot.on_hand
+    ).where(
+        InventorySnapshot.ts_date == as_of
+    ).order_by(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id
+    )
+    if store_id is not None:
+        query = query.where(InventorySnapshot.store_id == store_id)
+    if sku_ids is not None:
+        query = query.where(InventorySnapshot.sku_id.in_(sku_ids))
+    
+    # Keep the rows an inner join with stores and SKUs would
+    rows = [
+        row for row in db.execute(query).all()
+        if row[0] in known_stores and row[1] in known_skus
+    ]
+    store_ids, row_sku_ids, on_hand = np.array(rows, dtype=np.int64).reshape(-1, 3).T
+    
+    forecasts = forecast_all(db, [store_id] if store_id is not None else None, sku_ids, ctx=ctx)
+    scores = score_confidence_bulk(db, store_id)
+    
+    pairs = list(zip(store_ids.tolist(), row_sku_ids.tolist()))
+    daily_demand = np.array([forecasts[pair]["daily_demand"] for pair in pairs], dtype=float)
+    confidence_score = np.array([scores[pair]["score"] for pair in pairs], dtype=float)
+    confidence_grade = np.array([scores[pair]["grade"] for pair in pairs], dtype=object)
+    
+    return InventoryHealth(
+        as_of=as_of,
+        store_ids=store_ids,
+        sku_ids=row_sku_ids,
+        on_hand=on_hand,
+        daily_demand=daily_demand,
+        confidence_score=confidence_score,
+        confidence_grade=confidence_grade
+    )
+
+
+@timed_job("inventory_health_refresh")
+def refresh_inventory_health(
+    db: Session,
+    pairs: Optional[Iterable[Tuple[int, int]]] = None,
+    as_of: Optional[date] = None
+) -> Dict:
+    """
+    Recompute inventory_health rows for as_of (default: yesterday)
+    pairs=None rebuilds the whole table; otherwise only those store/SKUs
+    are recomputed (pairs without a snapshot on as_of are removed)
+    """
+    if as_of is None:
+        as_of = datetime.now().date() - timedelta(days=1)
+    today = datetime.now().date()
+    
+    items_written = 0
+    
+    if pairs is None:
+        items_written = pairs_refreshed = _rebuild_all(db, as_of, today)
+    else:
+        skus_by_store = defaultdict(set)
+        for store_id, sku_id in pairs:
+            skus_by_store[store_id].add(sku_id)
+        
+        for store_id, sku_ids in skus_by_store.items():
+            sku_ids = sorted(sku_ids)
+            for start in range(0, len(sku_ids), REFRESH_BATCH_SKUS):
+                batch = sku_ids[start:start + REFRESH_BATCH_SKUS]
+                health = compute_inventory_health(db, store_id, as_of, sku_ids=batch)
+                
+                db.execute(delete(InventoryHealthItem).where(
+                    InventoryHealthItem.store_id == store_id,
+                    InventoryHealthItem.sku_id.in_(batch)
+                ))
+                rows = health.rows(today)
+                if rows:
+                    db.execute(insert(InventoryHealthItem), rows)
+                items_written += len(rows)
+        
+        pairs_refreshed = sum(len(sku_ids) for sku_ids in skus_by_store.values())
+    
+    db.commit()
+    
+    return {
+        "as_of": as_of.isoformat(),
+        "full_refresh": pairs is None,
+        "pairs_refreshed": pairs_refreshed,
+        "items_written": items_written
+    }
+
+
+@long_write
+def _rebuild_all(db: Session, as_of: date, today: date) -> int:
+    """Replace the whole table in one transaction"""
+    # Everything queued so far is covered by the rebuild
+    _take_pending()
+    health = compute_inventory_health(db, as_of=as_of)
+    db.execute(delete(InventoryHealthItem))
+    rows = health.rows(today)
+    if rows:
+        db.execute(insert(InventoryHealthItem), rows)
+    
+    state = db.get(InventoryHealthRefresh, 1)
+    if state is None:
+        state = InventoryHealthRefresh(id=1)
+        db.add(state)
+    state.as_of = as_of
+    state.items = len(rows)
+    db.commit()
+    
+    return len(rows)
+
+
+def _take_pending() -> Tuple[Set[Tuple[int, int]], bool]:
+    """Claim the store/SKUs changed since the last refresh"""
+    global _pending_pairs, _pending_full
+    with _pending_lock:
+        pairs, full = _pending_pairs, _pending_full
+        _pending_pairs, _pending_full = set(), False
+    return pairs, full
+
+
+def _requeue_pending(pairs: Set[Tuple[int, int]], full: bool) -> None:
+    """Hand claimed changes back after a failed refresh"""
+    global _pending_full
+    with _pending_lock:
+        _pending_pairs.update(pairs)
+        _pending_full = _pending_full or full
+
+
+def _run_rebuild() -> None:
+    """Background rebuild thread; a failed rebuild is retried on the next read"""
+    db = SessionLocal()
+    try:
+        refresh_inventory_health(db)
+    except Exception:
+        logger.exception("Inventory health rebuild failed")
+        db.rollback()
+        _requeue_pending(set(), True)
+    finally:
+        db.close()
+
+
+def rebuild_in_progress() -> bool:
+    """Whether a background rebuild is running"""
+    return _rebuild_thread is not None and _rebuild_thread.is_alive()
+
+
+def start_inventory_health_rebuild() -> bool:
+    """
+    Rebuild the whole table in a background thread
+    Returns False when a rebuild is already running
+    """
+    global _rebuild_thread
+    with _pending_lock:
+        if rebuild_in_progress():
+            return False
+        _rebuild_thread = threading.Thread(target=_run_rebuild, name="inventory-health-rebuild", daemon=True)
+        _rebuild_thread.start()
+    return True
+
+
+def ensure_inventory_health(db: Session) -> Optional[Dict]:
+    """
+    Bring inventory_health up to date before it is read
+    A new snapshot date or a bulk change starts a background rebuild, and
+    the previous table is served until it commits; otherwise only the
+    store/SKUs committed since the last refresh are recomputed here.
+    Returns the refresh stats, or None when nothing was recomputed.
+    """
+    as_of = datetime.now().date() - timedelta(days=1)
+    
+    with _refresh_lock:
+        # Changes made while a rebuild runs wait for it to finish
+        if rebuild_in_progress():
+            return None
+        
+        pairs, full = _take_pending()
+        try:
+            state = db.get(InventoryHealthRefresh, 1)
+            if (
+                full or state is None or state.as_of != as_of
+                or len(pairs) > settings.INVENTORY_HEALTH_FULL_REFRESH_PAIRS
+            ):
+                # The rebuild claims the queued changes itself
+                _requeue_pending(pairs, full)
+                start_inventory_health_rebuild()
+                return None
+            if pairs:
+                return refresh_inventory_health(db, pairs, as_of=as_of)
+            return None
+        except Exception:
+            db.rollback()
+            _requeue_pending(pairs, full)
+            raise
+
+
+def _encode_cursor(item: InventoryHealthItem) -> str:
+    """Opaque keyset cursor positioned after an item"""
+    return f"{item.risk_rank}:{item.days_of_cover!r}:{item.store_id}:{item.sku_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, float, int, int]:
+    """Sort key a cursor points after; ValueError if malformed"""
+    parts = cursor.split(":")
+    if len(parts) != 4:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return int(parts[0]), float(parts[1]), int(parts[2]), int(parts[3])
+
+
+def query_inventory_health(
+    db: Session,
+    store_id: Optional[int] = None,
+    risk_only: bool = False,
+    min_confidence: float = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of overview items, most at risk first (critical, then fewest days of cover)
+    Pages are keyset-paginated on (risk_rank, days_of_cover, store_id, sku_id):
+    pass the returned cursor to get the next page, None means no more items
+    """
+    sort_key = (
+        InventoryHealthItem.risk_rank,
+        InventoryHealthItem.days_of_cover,
+        InventoryHealthItem.store_id,
+        InventoryHealthItem.sku_id
+    )
+    
+    query = select(
+        InventoryHealthItem, Store.name, SKU.name, SKU.category
+    ).join(
+        Store, InventoryHealthItem.store_id == Store.id
+    ).join(
+        SKU, InventoryHealthItem.sku_id == SKU.id
+    ).order_by(*sort_key).limit(limit + 1)
+    
+    if store_id is not None:
+        query = query.where(InventoryHealthItem.store_id == store_id)
+    if risk_only:
+        query = query.where(InventoryHealthItem.risk_rank <= 1)
+    if min_confidence:
+        query = query.where(InventoryHealthItem.confidence_score >= min_confidence)
+    if cursor:
+        query = query.where(tuple_(*sort_key) > tuple_(*_decode_cursor(cursor)))
+    
+    rows = db.execute(query).all()
+    next_cursor = _encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    
+    items = [
+        {
+            "store_id": item.store_id,
+            "store_name": store_name,
+            "sku_id": item.sku_id,
+            "sku_name": sku_name,
+            "category": category,
+            "on_hand": item.on_hand,
+            "daily_demand": item.daily_demand,
+            "days_of_cover": item.days_of_cover,
+            "stockout_date": item.stockout_date.isoformat() if item.stockout_date else None,
+            "confidence_score": item.confidence_score,
+            "confidence_grade": item.confidence_grade,
+            "risk_level": item.risk_level,
+            "suggested_action": item.suggested_action
+        }
+        for item, store_name, sku_name, category in rows[:limit]
+    ]
+    
+    return items, next_cursor
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_pairs(session, flush_context):
+    """Note store/SKUs whose inputs changed in the unit of work"""
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, HEALTH_INPUT_MODELS):
+            session.info.setdefault("health_pairs", set()).add((instance.store_id, instance.sku_id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_pairs(orm_execute_state):
+    """
+    Note store/SKUs touched by bulk statements against health inputs
+    Statements whose parameters don't name the pairs (e.g. a filtered
+    DELETE) mark the whole table for a rebuild
+    """
+    if orm_execute_state.is_select:
+        return
+    if not any(issubclass(mapper.class_, HEALTH_INPUT_MODELS) for mapper in orm_execute_state.all_mappers):
+        return
+    
+    info = orm_execute_state.session.info
+    params = orm_execute_state.parameters
+    rows = params if isinstance(params, (list, tuple)) else [params or {}]
+    
+    if all("store_id" in row and "sku_id" in row for row in rows):
+        info.setdefault("health_pairs", set()).update((row["store_id"], row["sku_id"]) for row in rows)
+    else:
+        info["health_full"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_committed_pairs(session):
+    """Queue changed store/SKUs for the next refresh once they are visible"""
+    global _pending_full
+    pairs = session.info.pop("health_pairs", None)
+    full = session.info.pop("health_full", False)
+    
+    if pairs or full:
+        with _pending_lock:
+            if pairs:
+                _pending_pairs.update(pairs)
+            _pending_full = _pending_full or full
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_pairs(session):
+    """Rolled-back changes never became visible"""
+    session.info.pop("health_pairs", None)
+    session.info.pop("health_full", None)
+
+
+if __name__ == "__main__":
+    import argparse
+    from ..database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Rebuild the inventory_health table from yesterday's snapshots")
+    parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        stats = refresh_inventory_health(db)
+        print(f"✅ Refreshed inventory health for {stats['items_written']} items (as of {stats['as_of']})")
+    finally:
+        db.close()
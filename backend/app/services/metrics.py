@@ -0,0 +1,252 @@
+"""
+In-process metrics in the Prometheus text exposition format
+
+Counters, gauges and histograms live in one registry that GET /metrics
+renders; collectors add values read at scrape time (e.g. cache stats).
+Each process (e.g. each uvicorn worker) keeps its own, like the caches.
+"""
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Request latency buckets in seconds, fine-grained around dashboard SLOs
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+# Background jobs run from seconds to many minutes
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric family with fixed label names"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+    
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+    
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+    
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        # First bucket whose upper bound holds the value; +Inf past the last
+        index = bisect.bisect_left(self.buckets, value)
+        
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+    
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                labels = self._labels(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Metric families plus scrape-time collectors, rendered together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+    
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """Function returning freshly filled metrics on every scrape"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text format (version 0.0.4)"""
+        metrics = list(self._metrics.values())
+        for collector in self._collectors:
+            metrics.extend(collector())
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests served", ("method", "route", "status")
+))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+DB_QUERIES = REGISTRY.register(Counter(
+    "db_queries_total", "SQL statements executed while serving requests", ("route",)
+))
+DB_QUERY_SECONDS = REGISTRY.register(Counter(
+    "db_query_seconds_total", "Time spent in SQL statements while serving requests", ("route",)
+))
+TELEMETRY_INGESTED = REGISTRY.register(Counter(
+    "telemetry_readings_ingested_total", "Sensor readings stored by the telemetry API"
+))
+JOB_DURATION = REGISTRY.register(Histogram(
+    "job_duration_seconds", "Background job run time", ("job",), buckets=JOB_BUCKETS
+))
+JOB_RUNS = REGISTRY.register(Counter(
+    "job_runs_total", "Background job runs", ("job", "status")
+))
+JOB_LAST_SUCCESS = REGISTRY.register(Gauge(
+    "job_last_success_timestamp_seconds", "Unix time the job last completed", ("job",)
+))
+
+# Unlabelled series are exported from the first scrape
+HTTP_REQUESTS_IN_FLIGHT.set(0)
+TELEMETRY_INGESTED.inc(0)
+
+
+def observe_request(
+    method: str,
+    route: str,
+    status: int,
+    seconds: float,
+    queries: Optional[int] = None,
+    query_seconds: float = 0.0
+) -> None:
+    """Record one served request (queries=None when DB hooks are off)"""
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+    HTTP_REQUEST_DURATION.observe(seconds, method=method, route=route)
+    
+    if queries is not None:
+        DB_QUERIES.inc(queries, route=route)
+        DB_QUERY_SECONDS.inc(query_seconds, route=route)
+
+
+def timed_job(job: str) -> Callable:
+    """Decorator recording a job's duration, outcome and last success time"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                JOB_RUNS.inc(job=job, status="error")
+                JOB_DURATION.observe(time.perf_counter() - started, job=job)
+                raise
+            
+            JOB_RUNS.inc(job=job, status="success")
+            JOB_DURATION.observe(time.perf_counter() - started, job=job)
+            JOB_LAST_SUCCESS.set(time.time(), job=job)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,248 @@
+"""
+Immutable in-memory view of the store network for transfer planning
+"""
+from datetime import datetime, timedelta, date
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models import Store, SKU, InventorySnapshot, StoreDistance
+from .analytics_context import AnalyticsContext
+from .forecasting import forecast_all
+from .spatial_index import StoreSpatialIndex, haversine_km
+
+# Distance assumed for store pairs with no recorded distance or coordinates
+UNKNOWN_DISTANCE_KM = 1000.0
+
+# Index reused across snapshots until store coordinates change
+_spatial_index_cache: Dict[bytes, StoreSpatialIndex] = {}
+
+
+class NetworkSnapshot:
+    """
+    On-hand, demand and distance data for every store and SKU
+    
+    Rows of the store x SKU matrices follow ``store_ids`` and columns follow
+    ``sku_ids`` (both in id order). All arrays are read-only.
+    
+    With the "table" distance source, the store x store distance matrices are
+    indexed [from_store, to_store] and hold NaN where no distance is recorded.
+    With the "spatial" source they are None: distances are computed from
+    store coordinates on demand and donor search is limited to the nearest
+    stores within donor_radius_km.
+    """
+    
+    def __init__(
+        self,
+        as_of: date,
+        store_ids: np.ndarray,
+        store_names: List[str],
+        sku_ids: np.ndarray,
+        sku_names: List[str],
+        on_hand: np.ndarray,
+        has_snapshot: np.ndarray,
+        daily_demand: np.ndarray,
+        latitude: np.ndarray,
+        longitude: np.ndarray,
+        distance_km: Optional[np.ndarray] = None,
+        transfer_cost: Optional[np.ndarray] = None,
+        spatial_index: Optional[StoreSpatialIndex] = None,
+        donor_radius_km: float = 300.0,
+        donor_candidates: int = 10
+    ):
+        self.as_of = as_of
+        self.store_ids = store_ids
+        self.store_names = store_names
+        self.sku_ids = sku_ids
+        self.sku_names = sku_names
+        self.on_hand = on_hand
+        self.has_snapshot = has_snapshot
+        self.daily_demand = daily_demand
+        self.latitude = latitude
+        self.longitude = longitude
+        self.distance_km = distance_km
+        self.transfer_cost = transfer_cost
+        self.spatial_index = spatial_index
+        self.donor_radius_km = donor_radius_km
+        self.donor_candidates = donor_candidates
+        
+        # Radius queries per receiver, shared by every SKU of a plan
+        self._nearby: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        
+        for array in (
+            store_ids, sku_ids, on_hand, has_snapshot, daily_demand,
+            latitude, longitude, distance_km, transfer_cost
+        ):
+            if array is not None:
+                array.flags.writeable = False
+    
+    @property
+    def shape(self) -> tuple:
+        """(number of stores, number of SKUs)"""
+        return self.on_hand.shape
+    
+    def donor_search(self, receiver: int) -> Tuple[np.ndarray, np.ndarray, Optional[int]]:
+        """
+        Candidate donor stores for a receiver
+        Returns (store indices, distances in km, max donors to consider)
+        """
+        if self.spatial_index is None:
+            distances = self.distance_km[:, receiver]
+            distances = np.where(np.isnan(distances), UNKNOWN_DISTANCE_KM, distances)
+            return np.arange(len(self.store_ids)), distances, None
+        
+        if receiver not in self._nearby:
+            self._nearby[receiver] = self.spatial_index.query_radius(
+                self.latitude[receiver], self.longitude[receiver], self.donor_radius_km
+            )
+        
+        stores, distances = self._nearby[receiver]
+        return stores, distances, self.donor_candidates
+    
+    def lane_distances(self, donors: np.ndarray, receivers: np.ndarray) -> np.ndarray:
+        """Donor x receiver distance matrix in km, unknown lanes at UNKNOWN_DISTANCE_KM"""
+        if self.spatial_index is None:
+            distances = self.distance_km[np.ix_(donors, receivers)]
+        else:
+            distances = haversine_km(
+                self.latitude[donors][:, None], self.longitude[donors][:, None],
+                self.latitude[receivers][None, :], self.longitude[receivers][None, :]
+            )
+        
+        return np.where(np.isnan(distances), UNKNOWN_DISTANCE_KM, distances)
+    
+    def lane(self, donor: int, receiver: int) -> Tuple[Optional[float], Optional[float]]:
+        """(distance_km, transfer_cost) of one lane for reporting, None when unknown"""
+        if self.spatial_index is None:
+            distance = self.distance_km[donor, receiver]
+            cost = self.transfer_cost[donor, receiver]
+        else:
+            distance = haversine_km(
+                self.latitude[donor], self.longitude[donor],
+                self.latitude[receiver], self.longitude[receiver]
+            )
+            cost = np.nan
+        
+        return (
+            None if np.isnan(distance) else float(distance),
+            None if np.isnan(cost) else float(cost)
+        )
+
+
+def get_spatial_index(latitude: np.ndarray, longitude: np.ndarray) -> StoreSpatialIndex:
+    """Spatial index for these store coordinates, rebuilt only when they change"""
+    key = np.stack([latitude, longitude]).tobytes()
+    
+    index = _spatial_index_cache.get(key)
+    if index is None:
+        _spatial_index_cache.clear()
+        index = StoreSpatialIndex(latitude, longitude)
+        _spatial_index_cache[key] = index
+    
+    return index
+
+
+def load_network_snapshot(
+    db: Session,
+    as_of: Optional[date] = None,
+    ctx: Optional[AnalyticsContext] = None,
+    distance_source: Optional[str] = None
+) -> NetworkSnapshot:
+    """
+    Load the network snapshot with one query per table
+    on_hand comes from the snapshots dated as_of (default: yesterday);
+    distance_source overrides settings.TRANSFER_DISTANCE_SOURCE
+    """
+    if as_of is None:
+        as_of = datetime.now().date() - timedelta(days=1)
+    if distance_source is None:
+        distance_source = settings.TRANSFER_DISTANCE_SOURCE
+    
+    stores = db.query(Store.id, Store.name, Store.latitude, Store.longitude).order_by(Store.id).all()
+    skus = db.query(SKU.id, SKU.name).order_by(SKU.id).all()
+    
+    store_ids = np.array([store.id for store in stores], dtype=np.int64)
+    sku_ids = np.array([sku_id for sku_id, _ in skus], dtype=np.int64)
+    store_names = [store.name for store in stores]
+    sku_names = [name for _, name in skus]
+    store_pos = {store.id: i for i, store in enumerate(stores)}
+    sku_pos = {sku_id: j for j, (sku_id, _) in enumerate(skus)}
+    
+    latitude = np.array([np.nan if s.latitude is None else s.latitude for s in stores], dtype=float)
+    longitude = np.array([np.nan if s.longitude is None else s.longitude for s in stores], dtype=float)
+    
+    shape = (len(stores), len(skus))
+    on_hand = np.zeros(shape)
+    has_snapshot = np.zeros(shape, dtype=bool)
+    
+    snapshot_rows = db.query(
+        InventorySnapshot.store_id,
+        InventorySnapshot.sku_id,
+        InventorySnapshot.on_hand
+    ).filter(
+        InventorySnapshot.ts_date == as_of
+    ).all()
+    
+    for store_id, sku_id, qty in snapshot_rows:
+        i, j = store_pos.get(store_id), sku_pos.get(sku_id)
+        if i is None or j is None or has_snapshot[i, j]:
+            continue
+        on_hand[i, j] = qty
+        has_snapshot[i, j] = True
+    
+    daily_demand = np.zeros(shape)
+    forecasts = forecast_all(db, ctx=ctx)
+    for (store_id, sku_id), forecast in forecasts.items():
+        i, j = store_pos.get(store_id), sku_pos.get(sku_id)
+        if i is not None and j is not None:
+            daily_demand[i, j] = forecast["daily_demand"]
+    
+    if distance_source == "spatial":
+        # No O(n^2) distance table: nearby donors come from the coordinate index
+        return NetworkSnapshot(
+            as_of=as_of,
+            store_ids=store_ids,
+            store_names=store_names,
+            sku_ids=sku_ids,
+            sku_names=sku_names,
+            on_hand=on_hand,
+            has_snapshot=has_snapshot,
+            daily_demand=daily_demand,
+            latitude=latitude,
+            longitude=longitude,
+            spatial_index=get_spatial_index(latitude, longitude),
+            donor_radius_km=settings.TRANSFER_DONOR_RADIUS_KM,
+            donor_candidates=settings.TRANSFER_DONOR_CANDIDATES
+        )
+    
+    distance_km = np.full((len(stores), len(stores)), np.nan)
+    transfer_cost = np.full((len(stores), len(stores)), np.nan)
+    
+    distance_rows = db.query(
+        StoreDistance.from_store_id,
+        StoreDistance.to_store_id,
+        StoreDistance.distance_km,
+        StoreDistance.transfer_cost
+    ).all()
+    
+    for from_store_id, to_store_id, km, cost in distance_rows:
+        i, j = store_pos.get(from_store_id), store_pos.get(to_store_id)
+        if i is None or j is None:
+            continue
+        distance_km[i, j] = np.nan if km is None else km
+        transfer_cost[i, j] = np.nan if cost is None else cost
+    
+    return NetworkSnapshot(
+        as_of=as_of,
+        store_ids=store_ids,
+        store_names=store_names,
+        sku_ids=sku_ids,
+        sku_names=sku_names,
+        on_hand=on_hand,
+        has_snapshot=has_snapshot,
+        daily_demand=daily_demand,
+        latitude=latitude,
+        longitude=longitude,
+        distance_km=distance_km,
+        transfer_cost=transfer_cost
+    )
@@ -2,12 +2,19 @@
 Peak hour demand forecasting service for restaurant operations
 """
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..models import SalesHourly, InventorySnapshot, SKU, PrepRecommendation
+from sqlalchemy import func, or_, select
+from ..config import settings
+from ..models import (
+    SalesHourly, Store, SKU, PrepRecommendation,
+    HourlyDemandProfile, HourlyProfileRollup
+)
 from functools import lru_cache
-from .forecasting import calculate_demand_forecast
+from .analytics_context import AnalyticsContext
+from .cache import get_cache
+from .forecasting import calculate_demand_forecast, get_latest_on_hand
 
 
 # Peak hour definitions for Chipotle
@@ -15,6 +22,10 @@ LUNCH_HOURS = [11, 12, 13]  # 11am-2pm
 DINNER_HOURS = [17, 18, 19]  # 5pm-8pm
 PEAK_HOURS = LUNCH_HOURS + DINNER_HOURS
 
+# SKU categories covered by the prep planner and by the peak-hour risk views
+PREP_CATEGORIES = ["Proteins", "Salsas & Sauces", "Produce"]
+CRITICAL_CATEGORIES = ["Proteins", "Salsas & Sauces"]
+
 # Default hourly distribution (Chipotle-style) when no SalesHourly data - used for fallback
 # Multipliers sum to ~17 so daily_demand / 17 gives base; then scale by multiplier
 HOURLY_DISTRIBUTION = {
@@ -24,9 +35,12 @@ HOURLY_DISTRIBUTION = {
 }
 HOURLY_DISTRIBUTION_SUM = sum(HOURLY_DISTRIBUTION.values())
 
-# Simple in-memory cache for hourly forecasts (TTL: 5 minutes)
-_forecast_cache = {}
-_cache_ttl = 300  # 5 minutes
+# Bounded per-process cache of hourly profiles (LRU eviction + TTL)
+_forecast_cache = get_cache(
+    "hourly_forecast",
+    max_entries=settings.HOURLY_FORECAST_CACHE_SIZE,
+    ttl_seconds=settings.HOURLY_FORECAST_CACHE_TTL
+)
 
 
 def is_peak_hour(hour: int) -> bool:
@@ -43,6 +57,282 @@ def get_peak_period_name(hour: int) -> Optional[str]:
     return None
 
 
+class HourlyProfile:
+    """
+    Hourly demand forecast for one store/SKU over a whole week
+    
+    Arrays are indexed [day_of_week, hour_of_day] (7 x 24). predicted holds
+    the weighted demand with the peak-hour buffer applied (unrounded);
+    data_points is the number of sales rows behind each cell.
+    """
+    
+    def __init__(self, predicted: np.ndarray, data_points: np.ndarray):
+        self.predicted = predicted
+        self.data_points = data_points
+        
+        predicted.flags.writeable = False
+        data_points.flags.writeable = False
+    
+    def forecast(self, hour: int, day_of_week: int) -> Dict:
+        """Forecast for one hour, shaped like calculate_hourly_demand_forecast"""
+        data_points = int(self.data_points[day_of_week, hour])
+        
+        return {
+            "predicted_demand": round(float(self.predicted[day_of_week, hour]), 1),
+            "confidence": "high" if data_points >= 6 else
+                          "medium" if data_points >= 3 else "low",
+            "is_peak_hour": is_peak_hour(hour),
+            "peak_period": get_peak_period_name(hour),
+            "data_points": data_points
+        }
+
+
+def _weighted_cells(
+    cells: np.ndarray,
+    ranks: np.ndarray,
+    qty: np.ndarray,
+    num_cells: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted demand and row count per cell
+    ranks are 0 for the most recent row of a cell; a cell of n rows weights
+    its rank-k row by 0.95 ** (n - 1 - k), as the per-hour queries did
+    """
+    counts = np.bincount(cells, minlength=num_cells)
+    weights = 0.95 ** (counts[cells] - 1 - ranks)
+    
+    weighted = np.bincount(cells, weights=weights * qty, minlength=num_cells)
+    total_weight = np.bincount(cells, weights=weights, minlength=num_cells)
+    
+    demand = np.divide(weighted, total_weight, out=np.zeros(num_cells), where=total_weight > 0)
+    return demand, counts
+
+
+def build_hourly_profiles(
+    db: Session,
+    store_id: int,
+    sku_ids: List[int],
+    lookback_weeks: int = 8
+) -> Dict[int, HourlyProfile]:
+    """
+    Build the 7 x 24 hourly forecasts of a store's SKUs from raw sales with one query
+    Each cell uses the last N sales rows for that hour and weekday, falling
+    back to the last N rows for that hour on any day
+    """
+    by_day_rank = func.row_number().over(
+        partition_by=(SalesHourly.sku_id, SalesHourly.hour_of_day, SalesHourly.day_of_week),
+        order_by=SalesHourly.ts_datetime.desc()
+    )
+    by_hour_rank = func.row_number().over(
+        partition_by=(SalesHourly.sku_id, SalesHourly.hour_of_day),
+        order_by=SalesHourly.ts_datetime.desc()
+    )
+    
+    ranked = select(
+        SalesHourly.sku_id,
+        SalesHourly.hour_of_day,
+        SalesHourly.day_of_week,
+        SalesHourly.qty_sold,
+        by_day_rank.label("day_rank"),
+        by_hour_rank.label("hour_rank")
+    ).where(
+        SalesHourly.store_id == store_id,
+        SalesHourly.sku_id.in_(sku_ids)
+    ).subquery()
+    
+    rows = db.execute(
+        select(ranked).where(
+            or_(ranked.c.day_rank <= lookback_weeks, ranked.c.hour_rank <= lookback_weeks)
+        )
+    ).all()
+    
+    profile_ids = np.unique(np.asarray(sku_ids, dtype=np.int64))
+    num_skus = len(profile_ids)
+    
+    data = np.array(rows, dtype=np.int64).reshape(-1, 6)
+    sku, hour, day, qty, day_rank, hour_rank = data.T
+    position = np.searchsorted(profile_ids, sku)
+    
+    in_day = day_rank <= lookback_weeks
+    day_demand, day_points = _weighted_cells(
+        (position[in_day] * 7 + day[in_day]) * 24 + hour[in_day],
+        day_rank[in_day] - 1,
+        qty[in_day],
+        num_skus * 7 * 24
+    )
+    
+    in_hour = hour_rank <= lookback_weeks
+    hour_demand, hour_points = _weighted_cells(
+        position[in_hour] * 24 + hour[in_hour],
+        hour_rank[in_hour] - 1,
+        qty[in_hour],
+        num_skus * 24
+    )
+    
+    day_demand = day_demand.reshape(num_skus, 7, 24)
+    day_points = day_points.reshape(num_skus, 7, 24)
+    hour_demand = hour_demand.reshape(num_skus, 1, 24)
+    hour_points = hour_points.reshape(num_skus, 1, 24)
+    
+    # Fallback to any data for this hour
+    has_day = day_points > 0
+    predicted = np.where(has_day, day_demand, hour_demand)
+    data_points = np.where(has_day, day_points, hour_points)
+    
+    # Peak hour adjustment: 15% buffer
+    peak = np.zeros(24, dtype=bool)
+    peak[PEAK_HOURS] = True
+    predicted = np.where(peak & (predicted > 0), predicted * 1.15, predicted)
+    
+    return {
+        int(sku_id): HourlyProfile(predicted[k], data_points[k])
+        for k, sku_id in enumerate(profile_ids)
+    }
+
+
+def build_hourly_profile(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    lookback_weeks: int = 8
+) -> HourlyProfile:
+    """Build one store/SKU's hourly profile from raw sales"""
+    return build_hourly_profiles(db, store_id, [sku_id], lookback_weeks)[sku_id]
+
+
+def load_hourly_profiles(
+    db: Session,
+    store_id: int,
+    sku_ids: List[int],
+    lookback_weeks: int = 8
+) -> Optional[Dict[int, HourlyProfile]]:
+    """
+    Read a store's hourly profiles from the materialized hourly_profile table
+    Returns None when the table has not been rolled up for this lookback
+    """
+    rollup = db.get(HourlyProfileRollup, 1)
+    if rollup is None or rollup.lookback_weeks != lookback_weeks:
+        return None
+    
+    rows = db.execute(
+        select(
+            HourlyDemandProfile.sku_id,
+            HourlyDemandProfile.day_of_week,
+            HourlyDemandProfile.hour_of_day,
+            HourlyDemandProfile.predicted_demand,
+            HourlyDemandProfile.data_points
+        ).where(
+            HourlyDemandProfile.store_id == store_id,
+            HourlyDemandProfile.sku_id.in_(sku_ids)
+        )
+    ).all()
+    
+    profile_ids = np.unique(np.asarray(sku_ids, dtype=np.int64))
+    predicted = np.zeros((len(profile_ids), 7, 24))
+    data_points = np.zeros((len(profile_ids), 7, 24), dtype=np.int64)
+    
+    if rows:
+        sku, day, hour, demand, points = zip(*rows)
+        position = np.searchsorted(profile_ids, sku)
+        predicted[position, day, hour] = demand
+        data_points[position, day, hour] = points
+    
+    return {
+        int(sku_id): HourlyProfile(predicted[k], data_points[k])
+        for k, sku_id in enumerate(profile_ids)
+    }
+
+
+def get_hourly_profile(
+    db: Session,
+    store_id: int,
+    sku_id: int,
+    lookback_weeks: int = 8
+) -> HourlyProfile:
+    """
+    Cached hourly profile of a store/SKU
+    Read from the hourly_profile table, or built from raw sales until it is rolled up
+    """
+    return get_hourly_profiles(db, store_id, [sku_id], lookback_weeks)[sku_id]
+
+
+def get_hourly_profiles(
+    db: Session,
+    store_id: int,
+    sku_ids: List[int],
+    lookback_weeks: int = 8
+) -> Dict[int, HourlyProfile]:
+    """
+    Cached hourly profiles of many SKUs at one store
+    Profiles missing from the cache are loaded together with one query
+    """
+    profiles = {}
+    missing = []
+    
+    for sku_id in set(sku_ids):
+        profile = _forecast_cache.get("hourly_profile", (store_id, sku_id, lookback_weeks))
+        if profile is None:
+            missing.append(sku_id)
+        else:
+            profiles[sku_id] = profile
+    
+    if missing:
+        loaded = load_hourly_profiles(db, store_id, missing, lookback_weeks)
+        if loaded is None:
+            loaded = build_hourly_profiles(db, store_id, missing, lookback_weeks)
+        
+        for sku_id, profile in loaded.items():
+            _forecast_cache.set("hourly_profile", (store_id, sku_id, lookback_weeks), profile)
+        profiles.update(loaded)
+    
+    return profiles
+
+
+def predict_stockouts(
+    on_hand: np.ndarray,
+    demand: np.ndarray,
+    start_hour: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Intraday stockout prediction for many SKUs at once
+    on_hand: (N,) units; demand: (N, 24 - start_hour) forecast for each
+    hour from start_hour. Returns (N,) arrays: will_stockout, stockout_hour
+    (-1 when none), deficit at the stockout, is_peak and remaining_at_close
+    """
+    on_hand = np.asarray(on_hand, dtype=float)
+    # Explicit width: with no SKUs there is nothing to infer it from
+    demand = np.asarray(demand, dtype=float).reshape(len(on_hand), 24 - start_hour)
+    rows = np.arange(len(on_hand))
+    
+    # Demand forecasts carry one decimal: work in exact tenths of a unit
+    start = np.rint(on_hand * 10).astype(np.int64)
+    remaining = start[:, None] - np.cumsum(np.rint(demand * 10).astype(np.int64), axis=1)
+    
+    if demand.shape[1] == 0:
+        return {
+            "will_stockout": np.zeros(len(rows), dtype=bool),
+            "stockout_hour": np.full(len(rows), -1),
+            "deficit": np.zeros(len(rows)),
+            "is_peak": np.zeros(len(rows), dtype=bool),
+            "remaining_at_close": start / 10
+        }
+    
+    out = remaining <= 0
+    will_stockout = out.any(axis=1)
+    first = out.argmax(axis=1)
+    
+    peak = np.zeros(24, dtype=bool)
+    peak[PEAK_HOURS] = True
+    
+    return {
+        "will_stockout": will_stockout,
+        "stockout_hour": np.where(will_stockout, start_hour + first, -1),
+        "deficit": np.where(will_stockout, -remaining[rows, first], 0) / 10,
+        "is_peak": will_stockout & peak[start_hour + first],
+        "remaining_at_close": remaining[:, -1] / 10
+    }
+
+
 def calculate_hourly_demand_forecast(
     db: Session,
     store_id: int,
@@ -54,72 +344,71 @@ def calculate_hourly_demand_forecast(
     """
     Predict demand for specific hour based on historical patterns
     Uses last N weeks of data for the same hour/day combination
-    WITH CACHING for performance
+    Served from the store/SKU's hourly profile (hourly_profile table)
     """
-    # Check cache
-    cache_key = f"{store_id}_{sku_id}_{target_hour}_{target_day_of_week}"
-    if cache_key in _forecast_cache:
-        cached_data, cached_time = _forecast_cache[cache_key]
-        if (datetime.now() - cached_time).total_seconds() < _cache_ttl:
-            return cached_data
-    
-    # Get historical sales for this hour/day combination
-    historical_sales = db.query(SalesHourly).filter(
-        SalesHourly.store_id == store_id,
-        SalesHourly.sku_id == sku_id,
-        SalesHourly.hour_of_day == target_hour,
-        SalesHourly.day_of_week == target_day_of_week
-    ).order_by(SalesHourly.ts_datetime.desc()).limit(lookback_weeks).all()
-    
-    if not historical_sales:
-        # Fallback to any data for this hour
-        historical_sales = db.query(SalesHourly).filter(
-            SalesHourly.store_id == store_id,
-            SalesHourly.sku_id == sku_id,
-            SalesHourly.hour_of_day == target_hour
-        ).order_by(SalesHourly.ts_datetime.desc()).limit(lookback_weeks).all()
-    
-    if not historical_sales:
-        result = {
-            "predicted_demand": 0.0,
-            "confidence": "low",
-            "is_peak_hour": is_peak_hour(target_hour),
-            "peak_period": get_peak_period_name(target_hour),
-            "data_points": 0
-        }
-        _forecast_cache[cache_key] = (result, datetime.now())
-        return result
-    
-    # Weighted average (recent weeks weighted higher)
-    weights = [0.95 ** i for i in range(len(historical_sales))]
-    weights.reverse()  # Most recent gets highest weight
-    
-    weighted_demand = sum(s.qty_sold * w for s, w in zip(historical_sales, weights))
-    total_weight = sum(weights)
-    
-    predicted = weighted_demand / total_weight if total_weight > 0 else 0.0
+    profile = get_hourly_profile(db, store_id, sku_id, lookback_weeks)
+    return profile.forecast(target_hour, target_day_of_week)
+
+
+def invalidate_hourly_forecasts() -> int:
+    """
+    Drop cached hourly forecasts after SalesHourly changes
+    Only this process's cache; other workers catch up within the cache TTL
+    """
+    return _forecast_cache.invalidate("hourly_profile")
+
+
+def predict_stockout_times(
+    db: Session,
+    store_id: int,
+    on_hand: Dict[int, float],
+    start_hour: Optional[int] = None
+) -> Dict[int, Dict]:
+    """
+    Predict the stockout hour of many SKUs at one store
+    on_hand maps sku_id to current units; returns predict_stockout_time dicts by sku_id
+    """
+    current_time = datetime.now()
+    current_hour = start_hour if start_hour is not None else current_time.hour
+    current_day = current_time.weekday()
     
-    # Peak hour adjustment
-    is_peak = is_peak_hour(target_hour)
-    if is_peak and predicted > 0:
-        predicted *= 1.15  # 15% buffer for peak hours
+    sku_ids = list(on_hand)
+    profiles = get_hourly_profiles(db, store_id, sku_ids)
+    demand = np.array(
+        [profiles[sku_id].predicted[current_day, current_hour:] for sku_id in sku_ids]
+    ).reshape(len(sku_ids), 24 - current_hour)
     
-    # Confidence based on data availability
-    confidence = "high" if len(historical_sales) >= 6 else \
-                 "medium" if len(historical_sales) >= 3 else "low"
+    result = predict_stockouts([on_hand[sku_id] for sku_id in sku_ids], demand, current_hour)
     
-    result = {
-        "predicted_demand": round(predicted, 1),
-        "confidence": confidence,
-        "is_peak_hour": is_peak,
-        "peak_period": get_peak_period_name(target_hour),
-        "data_points": len(historical_sales)
-    }
+    predictions = {}
     
-    # Cache result
-    _forecast_cache[cache_key] = (result, datetime.now())
+    for k, sku_id in enumerate(sku_ids):
+        if not result["will_stockout"][k]:
+            predictions[sku_id] = {
+                "will_stockout": False,
+                "safe_until": "end_of_day",
+                "remaining_at_close": float(result["remaining_at_close"][k])
+            }
+            continue
+        
+        hour = int(result["stockout_hour"][k])
+        is_peak = bool(result["is_peak"][k])
+        stockout_time = current_time.replace(hour=hour, minute=30, second=0, microsecond=0)
+        hours_until = hour - current_hour
+        
+        predictions[sku_id] = {
+            "will_stockout": True,
+            "stockout_time": stockout_time.isoformat(),
+            "stockout_hour": hour,
+            "hours_until_stockout": hours_until,
+            "minutes_until_stockout": hours_until * 60,
+            "is_during_peak": is_peak,
+            "peak_period": get_peak_period_name(hour),
+            "severity": "critical" if is_peak else "high",
+            "deficit": float(result["deficit"][k])
+        }
     
-    return result
+    return predictions
 
 
 def predict_stockout_time(
@@ -132,41 +421,104 @@ def predict_stockout_time(
     """
     Predict exact hour when SKU will run out during the day
     """
+    return predict_stockout_times(db, store_id, {sku_id: current_on_hand}, start_hour)[sku_id]
+
+
+def plan_prep_schedules(
+    db: Session,
+    store_ids: Optional[List[int]] = None,
+    prep_lead_time_hours: int = 2,
+    target_date: Optional[datetime] = None
+) -> Dict[int, List[Dict]]:
+    """
+    Generate prep schedules for many stores (default: all) in one batch
+    Covers every SKU in PREP_CATEGORIES; stockouts come from cumulative
+    hourly demand against the latest on hand, for all SKUs of a store at once.
+    Returns schedules keyed by store_id, soonest prep first
+    """
     current_time = datetime.now()
-    current_hour = start_hour if start_hour is not None else current_time.hour
+    if target_date is None:
+        target_date = current_time
+    
+    if store_ids is None:
+        store_ids = [store_id for (store_id,) in db.query(Store.id).order_by(Store.id).all()]
+    
+    skus = db.query(SKU).filter(
+        SKU.category.in_(PREP_CATEGORIES)
+    ).order_by(SKU.id).all()
+    
+    on_hand = get_latest_on_hand(db, store_ids, [sku.id for sku in skus])
+    current_hour = current_time.hour
     current_day = current_time.weekday()
     
-    remaining = current_on_hand
+    schedules = {}
     
-    for hour in range(current_hour, 24):
-        forecast = calculate_hourly_demand_forecast(
-            db, store_id, sku_id, hour, current_day
-        )
+    for store_id in store_ids:
+        recommendations = []
         
-        demand = forecast["predicted_demand"]
-        remaining -= demand
+        # Skip SKUs with plenty of inventory
+        current_inv = np.array([on_hand.get((store_id, sku.id), 0) for sku in skus], dtype=np.int64)
+        candidates = [k for k in range(len(skus)) if current_inv[k] <= 100]
         
-        if remaining <= 0:
-            stockout_time = current_time.replace(hour=hour, minute=30, second=0, microsecond=0)
-            hours_until = hour - current_hour
+        profiles = get_hourly_profiles(db, store_id, [skus[k].id for k in candidates])
+        demand = np.array(
+            [profiles[skus[k].id].predicted[current_day, current_hour:] for k in candidates]
+        ).reshape(len(candidates), 24 - current_hour)
+        
+        stockouts = predict_stockouts(current_inv[candidates], demand, current_hour)
+        
+        for k, stocks_out, stockout_hour, is_peak_stockout in zip(
+            candidates, stockouts["will_stockout"], stockouts["stockout_hour"], stockouts["is_peak"]
+        ):
+            if not stocks_out:
+                continue
             
-            return {
-                "will_stockout": True,
-                "stockout_time": stockout_time.isoformat(),
-                "stockout_hour": hour,
-                "hours_until_stockout": hours_until,
-                "minutes_until_stockout": hours_until * 60,
-                "is_during_peak": forecast["is_peak_hour"],
-                "peak_period": forecast["peak_period"],
-                "severity": "critical" if forecast["is_peak_hour"] else "high",
-                "deficit": abs(remaining)
-            }
+            sku = skus[k]
+            profile = profiles[sku.id]
+            stockout_hour = int(stockout_hour)
+            is_peak_stockout = bool(is_peak_stockout)
+            stockout_time = current_time.replace(hour=stockout_hour, minute=30, second=0, microsecond=0)
+            prep_time = stockout_time - timedelta(hours=prep_lead_time_hours)
+            
+            # Only recommend if prep time is in the future
+            if prep_time <= target_date:
+                continue
+            
+            # Calculate how much to prep (cover the 2 hours from the stockout)
+            total_demand = sum(
+                profile.forecast(hour, target_date.weekday())["predicted_demand"]
+                for hour in range(stockout_hour, min(stockout_hour + 2, 24))
+            )
+            qty_to_prep = int(total_demand * 1.1)  # 10% buffer
+            
+            # Determine priority
+            if is_peak_stockout:
+                priority = "critical"
+                reason = f"Will run out at {stockout_time.strftime('%I:%M %p')} during {get_peak_period_name(stockout_hour)} rush. Prep immediately!"
+            else:
+                priority = "high"
+                reason = f"Will run out at {stockout_time.strftime('%I:%M %p')}. Prep by {prep_time.strftime('%I:%M %p')}."
+            
+            recommendations.append({
+                "sku_id": sku.id,
+                "sku_name": sku.name,
+                "category": sku.category,
+                "prep_time": prep_time.isoformat(),
+                "prep_time_display": prep_time.strftime("%I:%M %p"),
+                "qty_to_prep": qty_to_prep,
+                "reason": reason,
+                "priority": priority,
+                "current_on_hand": int(current_inv[k]),
+                "stockout_time": stockout_time.strftime("%I:%M %p"),
+                "is_peak_stockout": is_peak_stockout,
+                "hours_until_prep": (prep_time - target_date).total_seconds() / 3600
+            })
+        
+        # Sort by prep time (soonest first)
+        recommendations.sort(key=lambda x: x["prep_time"])
+        schedules[store_id] = recommendations
     
-    return {
-        "will_stockout": False,
-        "safe_until": "end_of_day",
-        "remaining_at_close": remaining
-    }
+    return schedules
 
 
 def generate_prep_schedule(
@@ -178,87 +530,16 @@ def generate_prep_schedule(
     """
     Generate prep schedule for the day based on hourly forecasts
     Focuses on critical items that might run out during peak hours
-    OPTIMIZED: Limits queries and uses caching
     """
-    if target_date is None:
-        target_date = datetime.now()
-    
-    recommendations = []
-    
-    # Focus on high-demand perishable items - LIMIT TO 5 FOR PERFORMANCE
-    critical_skus = db.query(SKU).filter(
-        SKU.category.in_(["Proteins", "Salsas & Sauces", "Produce"])
-    ).limit(5).all()  # Reduced from 10 to 5 for speed
-    
-    for sku in critical_skus:
-        # Get current inventory
-        latest_snapshot = db.query(InventorySnapshot).filter(
-            InventorySnapshot.store_id == store_id,
-            InventorySnapshot.sku_id == sku.id
-        ).order_by(InventorySnapshot.ts_date.desc()).first()
-        
-        current_inv = latest_snapshot.on_hand if latest_snapshot else 0
-        
-        # Skip if plenty of inventory (optimization)
-        if current_inv > 100:
-            continue
-        
-        # Predict stockout time
-        stockout_pred = predict_stockout_time(
-            db, store_id, sku.id, current_inv
-        )
-        
-        if stockout_pred["will_stockout"]:
-            stockout_hour = stockout_pred["stockout_hour"]
-            stockout_time = datetime.fromisoformat(stockout_pred["stockout_time"])
-            prep_time = stockout_time - timedelta(hours=prep_lead_time_hours)
-            
-            # Only recommend if prep time is in the future
-            if prep_time > target_date:
-                # Calculate how much to prep (cover next 4 hours) - REDUCED TO 2 HOURS FOR SPEED
-                total_demand = 0
-                for hour in range(stockout_hour, min(stockout_hour + 2, 24)):  # Changed from 4 to 2
-                    forecast = calculate_hourly_demand_forecast(
-                        db, store_id, sku.id, hour, target_date.weekday()
-                    )
-                    total_demand += forecast["predicted_demand"]
-                
-                qty_to_prep = int(total_demand * 1.1)  # 10% buffer
-                
-                # Determine priority
-                if stockout_pred["is_during_peak"]:
-                    priority = "critical"
-                    reason = f"Will run out at {stockout_time.strftime('%I:%M %p')} during {stockout_pred['peak_period']} rush. Prep immediately!"
-                else:
-                    priority = "high"
-                    reason = f"Will run out at {stockout_time.strftime('%I:%M %p')}. Prep by {prep_time.strftime('%I:%M %p')}."
-                
-                recommendations.append({
-                    "sku_id": sku.id,
-                    "sku_name": sku.name,
-                    "category": sku.category,
-                    "prep_time": prep_time.isoformat(),
-                    "prep_time_display": prep_time.strftime("%I:%M %p"),
-                    "qty_to_prep": qty_to_prep,
-                    "reason": reason,
-                    "priority": priority,
-                    "current_on_hand": current_inv,
-                    "stockout_time": stockout_time.strftime("%I:%M %p"),
-                    "is_peak_stockout": stockout_pred["is_during_peak"],
-                    "hours_until_prep": (prep_time - target_date).total_seconds() / 3600
-                })
-    
-    # Sort by prep time (soonest first)
-    recommendations.sort(key=lambda x: x["prep_time"])
-    
-    return recommendations
+    return plan_prep_schedules(db, [store_id], prep_lead_time_hours, target_date)[store_id]
 
 
 def get_hourly_forecast_for_day(
     db: Session,
     store_id: int,
     sku_id: int,
-    target_date: Optional[datetime] = None
+    target_date: Optional[datetime] = None,
+    ctx: Optional[AnalyticsContext] = None
 ) -> List[Dict]:
     """
     Get hourly demand forecast for entire day.
@@ -268,13 +549,12 @@ def get_hourly_forecast_for_day(
         target_date = datetime.now()
     
     day_of_week = target_date.weekday()
+    profile = get_hourly_profile(db, store_id, sku_id)
     forecasts = []
     
     # Operating hours: 6am - 10pm
     for hour in range(6, 23):
-        forecast = calculate_hourly_demand_forecast(
-            db, store_id, sku_id, hour, day_of_week
-        )
+        forecast = profile.forecast(hour, day_of_week)
         
         forecasts.append({
             "hour": hour,
@@ -288,7 +568,7 @@ def get_hourly_forecast_for_day(
     # Fallback: if no hourly history (all zeros), distribute daily demand across hours
     total_predicted = sum(f["predicted_demand"] for f in forecasts)
     if total_predicted < 0.1:
-        daily_forecast = calculate_demand_forecast(db, store_id, sku_id)
+        daily_forecast = calculate_demand_forecast(db, store_id, sku_id, ctx=ctx)
         daily_demand = daily_forecast.get("daily_demand") or 0.0
         if daily_demand > 0:
             for f in forecasts:
@@ -333,31 +613,35 @@ def get_peak_hour_summary(
         next_peak_hour = 11
         hours_until = 24 - current_hour + 11  # Tomorrow
     
-    # Get critical items (proteins and guac) - LIMIT FOR PERFORMANCE
+    # Critical items (proteins and salsas) with a snapshot, all at once
     critical_skus = db.query(SKU).filter(
-        SKU.category.in_(["Proteins", "Salsas & Sauces"])
-    ).limit(5).all()  # Only check top 5 items
+        SKU.category.in_(CRITICAL_CATEGORIES)
+    ).order_by(SKU.id).all()
+    
+    on_hand = get_latest_on_hand(db, [store_id], [sku.id for sku in critical_skus])
+    stocked = [sku for sku in critical_skus if (store_id, sku.id) in on_hand]
+    
+    profiles = get_hourly_profiles(db, store_id, [sku.id for sku in stocked])
+    demand = np.array(
+        [profiles[sku.id].predicted[current_time.weekday(), current_hour:] for sku in stocked]
+    ).reshape(len(stocked), 24 - current_hour)
+    
+    stockouts = predict_stockouts(
+        [on_hand[(store_id, sku.id)] for sku in stocked], demand, current_hour
+    )
     
     at_risk_items = []
     
-    for sku in critical_skus:
-        latest_snapshot = db.query(InventorySnapshot).filter(
-            InventorySnapshot.store_id == store_id,
-            InventorySnapshot.sku_id == sku.id
-        ).order_by(InventorySnapshot.ts_date.desc()).first()
-        
-        if latest_snapshot:
-            stockout_pred = predict_stockout_time(
-                db, store_id, sku.id, latest_snapshot.on_hand
-            )
-            
-            if stockout_pred["will_stockout"] and stockout_pred["is_during_peak"]:
-                at_risk_items.append({
-                    "sku_name": sku.name,
-                    "stockout_time": stockout_pred["stockout_time"],
-                    "hours_until": stockout_pred["hours_until_stockout"],
-                    "peak_period": stockout_pred["peak_period"]
-                })
+    # Items that run out during a peak period
+    for k in np.flatnonzero(stockouts["is_peak"]):
+        stockout_hour = int(stockouts["stockout_hour"][k])
+        stockout_time = current_time.replace(hour=stockout_hour, minute=30, second=0, microsecond=0)
+        at_risk_items.append({
+            "sku_name": stocked[k].name,
+            "stockout_time": stockout_time.isoformat(),
+            "hours_until": stockout_hour - current_hour,
+            "peak_period": get_peak_period_name(stockout_hour)
+        })
     
     return {
         "current_time": current_time.isoformat(),
@@ -409,3 +693,25 @@ def save_prep_recommendations(
     db.commit()
     
     return saved_count
+
+
+if __name__ == "__main__":
+    import argparse
+    from ..database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Plan prep schedules for every store")
+    parser.add_argument("--lead-time", type=int, default=2, help="prep lead time in hours")
+    parser.add_argument("--save", action="store_true", help="save the schedules as pending prep recommendations")
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        schedules = plan_prep_schedules(db, prep_lead_time_hours=args.lead_time)
+        for store_id, schedule in schedules.items():
+            if args.save:
+                save_prep_recommendations(db, store_id, schedule)
+            critical = sum(1 for rec in schedule if rec["priority"] == "critical")
+            print(f"✅ Store {store_id}: {len(schedule)} prep tasks ({critical} critical)")
+    finally:
+        db.close()
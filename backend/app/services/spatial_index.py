@@ -0,0 +1,108 @@
+"""
+Spatial index over store coordinates for nearby-donor search
+"""
+from collections import defaultdict
+from typing import Dict, Tuple
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Same radius as utils.demo_data.calculate_distance
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+
+def haversine_km(
+    lat1: np.ndarray,
+    lon1: np.ndarray,
+    lat2: np.ndarray,
+    lon2: np.ndarray
+) -> np.ndarray:
+    """Great-circle distance in km, broadcast over numpy arrays"""
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    delta_lat = np.radians(np.asarray(lat2) - lat1)
+    delta_lon = np.radians(np.asarray(lon2) - lon1)
+    
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return EARTH_RADIUS_KM * c
+
+
+class StoreSpatialIndex:
+    """
+    Uniform latitude/longitude grid over store positions
+    
+    Stores are bucketed into cells of roughly ``cell_km`` on a side, so a
+    radius query only measures stores in the cells the circle can touch.
+    Positions are array indices into the latitude/longitude arrays; stores
+    without coordinates are never returned.
+    """
+    
+    def __init__(self, latitude: np.ndarray, longitude: np.ndarray, cell_km: float = 50.0):
+        self.latitude = np.asarray(latitude, dtype=float)
+        self.longitude = np.asarray(longitude, dtype=float)
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.lon_cells = int(math.ceil(360 / self.cell_deg))
+        
+        located = np.flatnonzero(~np.isnan(self.latitude) & ~np.isnan(self.longitude))
+        
+        buckets = defaultdict(list)
+        for i in located:
+            buckets[self._cell(self.latitude[i], self.longitude[i])].append(i)
+        
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {
+            cell: np.array(members, dtype=np.int64)
+            for cell, members in buckets.items()
+        }
+        self.size = len(located)
+    
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        """Grid cell of a coordinate (longitude wraps at the antimeridian)"""
+        return (
+            int(math.floor(lat / self.cell_deg)),
+            int(math.floor((lon + 180) / self.cell_deg)) % self.lon_cells
+        )
+    
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stores within radius_km of a point, nearest first
+        Returns (store positions, distances in km)
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        if self.size == 0 or math.isnan(lat) or math.isnan(lon):
+            return empty
+        
+        row, col = self._cell(lat, lon)
+        lat_reach = int(math.ceil(radius_km / self.cell_km))
+        
+        # Longitude cells shrink towards the poles; size the search for the
+        # widest latitude the circle reaches
+        widest_lat = min(abs(lat) + radius_km / KM_PER_DEGREE, 90.0)
+        lon_cell_km = self.cell_km * math.cos(math.radians(widest_lat))
+        lon_reach = int(math.ceil(radius_km / lon_cell_km)) if lon_cell_km > 0 else self.lon_cells
+        
+        if 2 * lon_reach + 1 >= self.lon_cells:
+            cols = range(self.lon_cells)
+        else:
+            cols = [(col + offset) % self.lon_cells for offset in range(-lon_reach, lon_reach + 1)]
+        
+        members = [
+            self._cells[(r, c)]
+            for r in range(row - lat_reach, row + lat_reach + 1)
+            for c in cols
+            if (r, c) in self._cells
+        ]
+        if not members:
+            return empty
+        
+        candidates = np.concatenate(members)
+        distances = haversine_km(lat, lon, self.latitude[candidates], self.longitude[candidates])
+        
+        within = distances <= radius_km
+        candidates = candidates[within]
+        distances = distances[within]
+        
+        # Nearest first, ties by store position so results are deterministic
+        order = np.lexsort((candidates, distances))
+        return candidates[order], distances[order]
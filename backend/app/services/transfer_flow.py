@@ -0,0 +1,110 @@
+"""
+Min-cost-flow solver for per-SKU transfer planning
+
+Each SKU is a transportation problem: donors supply surplus units, receivers
+take up to their capacity and every shipped unit costs the lane's per-unit
+cost. Solved by successive shortest paths, with Bellman-Ford relaxation run
+as dense donor x receiver array operations.
+"""
+import numpy as np
+
+
+def solve_transportation(
+    supply: np.ndarray,
+    capacity: np.ndarray,
+    value: np.ndarray,
+    cost: np.ndarray
+) -> np.ndarray:
+    """
+    Maximise sum(value[r] * units into r) - sum(cost[d, r] * units d -> r)
+    
+    supply: (D,) whole units each donor can give
+    capacity: (R,) whole units each receiver can take
+    value: (R,) benefit per unit delivered to each receiver
+    cost: (D, R) finite cost per unit shipped from donor d to receiver r
+    Returns the (D, R) integer flow matrix
+    """
+    num_donors, num_receivers = cost.shape
+    flow = np.zeros((num_donors, num_receivers), dtype=np.int64)
+    shipped = np.zeros(num_donors, dtype=np.int64)
+    received = np.zeros(num_receivers, dtype=np.int64)
+    receiver_index = np.arange(num_receivers)
+    
+    # Tolerance for comparing path costs of float edge weights
+    eps = 1e-9 * (1.0 + float(np.abs(value).max(initial=0.0)) + float(np.abs(cost).max(initial=0.0)))
+    
+    while True:
+        open_donors = shipped < supply
+        open_receivers = received < capacity
+        if not open_donors.any() or not open_receivers.any():
+            break
+        
+        # Shortest paths from the source: donors with spare supply start at 0,
+        # others are reached backwards along receiver -> donor residual edges
+        dist_donor = np.where(open_donors, 0.0, np.inf)
+        pred_donor = np.full(num_donors, -1)
+        dist_receiver = np.full(num_receivers, np.inf)
+        pred_receiver = np.full(num_receivers, -1)
+        
+        # Residual receiver -> donor edges exist only where flow is positive
+        flow_donors, flow_receivers = np.nonzero(flow)
+        flow_cost = cost[flow_donors, flow_receivers]
+        
+        # Only donors whose label changed can improve a receiver in the next round
+        changed = np.flatnonzero(open_donors)
+        
+        # Labels only change on strict improvement, so predecessors form a tree
+        for _ in range(num_donors + num_receivers + 1):
+            via_donor = dist_donor[changed, None] + cost[changed]
+            best_row = via_donor.argmin(axis=0)
+            best = via_donor[best_row, receiver_index]
+            best_donor = changed[best_row]
+            
+            improved_receivers = best < dist_receiver - eps
+            dist_receiver = np.where(improved_receivers, best, dist_receiver)
+            pred_receiver = np.where(improved_receivers, best_donor, pred_receiver)
+            
+            via_receiver = dist_receiver[flow_receivers] - flow_cost
+            best = np.full(num_donors, np.inf)
+            np.minimum.at(best, flow_donors, via_receiver)
+            
+            improved_donors = best < dist_donor - eps
+            if not improved_donors.any():
+                break
+            
+            # Predecessor of each improved donor: the edge that achieved its minimum
+            achieving = improved_donors[flow_donors] & (via_receiver == best[flow_donors])
+            pred_donor[flow_donors[achieving]] = flow_receivers[achieving]
+            dist_donor = np.where(improved_donors, best, dist_donor)
+            changed = np.flatnonzero(improved_donors)
+        
+        # Most profitable receiver to extend a path to; stop when nothing gains
+        gain = np.where(open_receivers, dist_receiver - value, np.inf)
+        target = int(gain.argmin())
+        if not gain[target] < -eps:
+            break
+        
+        # Walk the path back to the source, collecting the bottleneck
+        forward = []
+        backward = []
+        bottleneck = int(capacity[target] - received[target])
+        r = target
+        while True:
+            d = int(pred_receiver[r])
+            forward.append((d, r))
+            if pred_donor[d] < 0:
+                bottleneck = min(bottleneck, int(supply[d] - shipped[d]))
+                break
+            r = int(pred_donor[d])
+            backward.append((d, r))
+            bottleneck = min(bottleneck, int(flow[d, r]))
+        
+        for d, r in forward:
+            flow[d, r] += bottleneck
+        for d, r in backward:
+            flow[d, r] -= bottleneck
+        
+        shipped[forward[-1][0]] += bottleneck
+        received[target] += bottleneck
+    
+    return flow
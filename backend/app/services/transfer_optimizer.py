@@ -1,14 +1,29 @@
 """
 Cross-store transfer recommendation engine with distance optimization
 """
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from ..models import (
-    Store, SKU, InventorySnapshot, StoreDistance,
-    TransferRecommendation
-)
-from .forecasting import calculate_demand_forecast, calculate_days_of_cover
+from ..config import settings
+from ..models import TransferRecommendation
+from .analytics_context import AnalyticsContext
+from .data_version import get_data_version
+from .forecasting import days_of_cover_from_demand
+from .metrics import timed_job
+from .network_snapshot import NetworkSnapshot, load_network_snapshot
+from .transfer_flow import solve_transportation
+
+TRANSFER_SOLVERS = ("greedy", "flow")
+
+# Computed plans keyed on their parameters: key -> (data version, computed at, plan).
+# Handlers on the DB pool threads and /metrics share it, so every access holds the lock
+_plan_cache: Dict[Tuple, Tuple[int, datetime, List[Dict]]] = {}
+_plan_cache_stats = {"hits": 0, "misses": 0}
+_plan_cache_lock = threading.Lock()
 
 
 def calculate_urgency(days_of_cover: float, daily_demand: float) -> float:
@@ -29,200 +44,296 @@ def calculate_urgency(days_of_cover: float, daily_demand: float) -> float:
 
 
 def find_best_donor(
-    db: Session,
-    receiver_store_id: int,
-    donors: List[Dict],
-    sku_id: int
-) -> Optional[Dict]:
+    candidates: np.ndarray,
+    distances: np.ndarray,
+    surplus: np.ndarray,
+    max_candidates: Optional[int] = None
+) -> Optional[int]:
     """
     Find best donor store based on surplus and distance
-    Score = surplus / (1 + distance_penalty)
+    Score = surplus / (1 + distance_penalty), scored for all candidates at once
+    candidates are store indices with their distances to the receiver; with
+    max_candidates only the first that many stores with surplus are scored
+    Returns the donor's store index, or None if no candidate has surplus
     """
-    if not donors:
+    has_surplus = surplus[candidates] > 0
+    if not has_surplus.any():
         return None
     
-    scored_donors = []
+    candidates = candidates[has_surplus][:max_candidates]
+    distances = distances[has_surplus][:max_candidates]
+    
+    # Closer stores get higher scores
+    distance_penalty = distances / 100  # Normalize distance
+    scores = surplus[candidates] / (1 + distance_penalty)
     
-    for donor in donors:
-        if donor['surplus'] <= 0:
+    # Highest scoring donor (first candidate wins ties)
+    return int(candidates[np.argmax(scores)])
+
+
+def _match_greedy(
+    snapshot: NetworkSnapshot,
+    receivers: List[Dict],
+    surplus: np.ndarray
+) -> List[Tuple[Dict, int, int]]:
+    """
+    Serve receivers in urgency order, each from its best-scoring donor
+    Returns (receiver, donor store index, qty) shipments
+    """
+    surplus = surplus.copy()
+    shipments = []
+    
+    for receiver in receivers:
+        # Find best donor
+        candidates, distances, max_candidates = snapshot.donor_search(receiver['store_index'])
+        d = find_best_donor(candidates, distances, surplus, max_candidates)
+        
+        if d is None:
             continue
         
-        # Get distance between stores
-        distance_record = db.query(StoreDistance).filter(
-            StoreDistance.from_store_id == donor['store_id'],
-            StoreDistance.to_store_id == receiver_store_id
-        ).first()
+        # Calculate transfer quantity
+        transfer_qty = min(
+            receiver['need'],
+            float(surplus[d]),
+            receiver['daily_demand'] * 7  # Max 1 week supply
+        )
+        
+        transfer_qty = int(transfer_qty)
         
-        distance = distance_record.distance_km if distance_record else 1000.0
+        if transfer_qty < 1:
+            continue
         
-        # Score = surplus / (1 + distance_penalty)
-        # Closer stores get higher scores
-        distance_penalty = distance / 100  # Normalize distance
-        score = donor['surplus'] / (1 + distance_penalty)
+        shipments.append((receiver, d, transfer_qty))
         
-        scored_donors.append({
-            **donor,
-            'distance': distance,
-            'score': score
-        })
+        # Update donor surplus
+        surplus[d] -= transfer_qty
     
-    if not scored_donors:
-        return None
+    return shipments
+
+
+def _match_min_cost_flow(
+    snapshot: NetworkSnapshot,
+    receivers: List[Dict],
+    surplus: np.ndarray
+) -> List[Tuple[Dict, int, int]]:
+    """
+    Assign all donors and receivers of one SKU jointly as a transportation problem
+    Returns (receiver, donor store index, qty) shipments in receiver urgency order
+    """
+    donors = np.flatnonzero(surplus >= 1)
+    if not len(donors):
+        return []
+    
+    receiver_stores = np.array([receiver['store_index'] for receiver in receivers])
+    
+    # Whole units only, with the greedy matcher's cap of 1 week supply per receiver
+    supply = np.floor(surplus[donors]).astype(np.int64)
+    capacity = np.array([
+        int(min(receiver['need'], receiver['daily_demand'] * 7))
+        for receiver in receivers
+    ], dtype=np.int64)
+    
+    # Per-unit cost is the lane distance (1000km when unknown, as in find_best_donor)
+    cost = snapshot.lane_distances(donors, receiver_stores)
+    
+    # Scale urgency so one urgency step outweighs any path cost: scarce supply
+    # goes to the most urgent receivers and distance only decides routing
+    scale = 10 * (len(donors) + len(receivers)) * (float(cost.max()) + 1)
+    value = np.array([receiver['urgency'] for receiver in receivers]) * scale
+    
+    flow = solve_transportation(supply, capacity, value, cost)
+    
+    shipments = []
+    for k, receiver in enumerate(receivers):
+        for m in np.flatnonzero(flow[:, k]):
+            shipments.append((receiver, int(donors[m]), int(flow[m, k])))
     
-    # Return highest scoring donor
-    return max(scored_donors, key=lambda x: x['score'])
+    return shipments
 
 
-def generate_transfer_recommendations(
-    db: Session,
-    target_cover_days: int = 10,
-    safety_buffer_days: int = 2,
-    min_urgency: float = 0.5
+def _plan_sku_columns(
+    snapshot: NetworkSnapshot,
+    sku_columns: np.ndarray,
+    need: np.ndarray,
+    surplus: np.ndarray,
+    min_urgency: float,
+    solver: str
 ) -> List[Dict]:
     """
-    Generate transfer recommendations to prevent stockouts
-    Prioritizes nearby stores and high-urgency receivers
+    Plan transfers for the given snapshot SKU columns
+    need and surplus hold only those columns, in the same order
     """
     recommendations = []
     
-    # Get all stores
-    stores = db.query(Store).all()
-    
-    # Get all SKUs
-    skus = db.query(SKU).all()
-    
-    # Get latest inventory date
-    latest_date = datetime.now().date() - timedelta(days=1)
+    on_hand = snapshot.on_hand
+    daily_demand = snapshot.daily_demand
     
-    # Process each SKU
-    for sku in skus:
+    for k, j in enumerate(sku_columns):
         receivers = []
-        donors = []
         
-        # Analyze each store for this SKU
-        for store in stores:
-            # Get current inventory
-            snapshot = db.query(InventorySnapshot).filter(
-                InventorySnapshot.store_id == store.id,
-                InventorySnapshot.sku_id == sku.id,
-                InventorySnapshot.ts_date == latest_date
-            ).first()
+        for i in np.flatnonzero(need[:, k] > 0):
+            days_of_cover = days_of_cover_from_demand(float(on_hand[i, j]), float(daily_demand[i, j]))
+            urgency = calculate_urgency(days_of_cover, float(daily_demand[i, j]))
             
-            if not snapshot:
-                continue
-            
-            on_hand = snapshot.on_hand
-            
-            # Get demand forecast
-            forecast = calculate_demand_forecast(db, store.id, sku.id)
-            daily_demand = forecast["daily_demand"]
-            
-            if daily_demand < 0.1:
-                continue  # Skip items with no demand
-            
-            # Calculate target and buffer
-            target_on_hand = daily_demand * target_cover_days
-            buffer_on_hand = daily_demand * safety_buffer_days
-            
-            # Calculate need and surplus
-            need = max(0, target_on_hand - on_hand)
-            surplus = max(0, on_hand - (target_on_hand + buffer_on_hand))
-            
-            days_of_cover = calculate_days_of_cover(db, store.id, sku.id, on_hand)
-            
-            if need > 0:
-                urgency = calculate_urgency(days_of_cover, daily_demand)
-                
-                if urgency >= min_urgency:
-                    receivers.append({
-                        'store_id': store.id,
-                        'store_name': store.name,
-                        'need': need,
-                        'urgency': urgency,
-                        'days_of_cover': days_of_cover,
-                        'on_hand': on_hand,
-                        'daily_demand': daily_demand
-                    })
-            
-            if surplus > 0:
-                donors.append({
-                    'store_id': store.id,
-                    'store_name': store.name,
-                    'surplus': surplus,
+            if urgency >= min_urgency:
+                receivers.append({
+                    'store_index': int(i),
+                    'need': float(need[i, k]),
+                    'urgency': urgency,
                     'days_of_cover': days_of_cover,
-                    'on_hand': on_hand,
-                    'daily_demand': daily_demand
+                    'daily_demand': float(daily_demand[i, j])
                 })
         
+        if not receivers:
+            continue
+        
         # Sort receivers by urgency (highest first)
         receivers.sort(key=lambda x: x['urgency'], reverse=True)
         
         # Match receivers with donors
-        for receiver in receivers:
-            if receiver['need'] <= 0:
-                continue
+        if solver == "flow":
+            shipments = _match_min_cost_flow(snapshot, receivers, surplus[:, k])
+        else:
+            shipments = _match_greedy(snapshot, receivers, surplus[:, k])
+        
+        # Stock for this SKU as shipments are applied in order
+        # (a store is never both donor and receiver of the same SKU)
+        stock = on_hand[:, j].copy()
+        
+        for receiver, d, transfer_qty in shipments:
+            r = receiver['store_index']
+            donor_demand = float(daily_demand[d, j])
+            
+            # Calculate days of cover after transfer
+            receiver_days_after = (float(stock[r]) + transfer_qty) / receiver['daily_demand']
+            donor_days_after = (float(stock[d]) - transfer_qty) / donor_demand
+            donor_days_before = days_of_cover_from_demand(float(on_hand[d, j]), donor_demand)
             
-            # Find best donor
-            best_donor = find_best_donor(
-                db,
-                receiver['store_id'],
-                donors,
-                sku.id
+            receiver_name = snapshot.store_names[r]
+            donor_name = snapshot.store_names[d]
+            
+            # Generate rationale
+            rationale = (
+                f"Receiver ({receiver_name}) will stock out in {receiver['days_of_cover']:.1f} days. "
+                f"Donor ({donor_name}) has {donor_days_before:.1f} days excess. "
+                f"Transfer {transfer_qty} units prevents stockout. "
+                f"After transfer: receiver {receiver_days_after:.1f} days, donor {donor_days_after:.1f} days."
             )
             
-            if best_donor:
-                # Calculate transfer quantity
-                transfer_qty = min(
-                    receiver['need'],
-                    best_donor['surplus'],
-                    receiver['daily_demand'] * 7  # Max 1 week supply
-                )
-                
-                transfer_qty = int(transfer_qty)
-                
-                if transfer_qty < 1:
-                    continue
-                
-                # Calculate days of cover after transfer
-                receiver_days_after = (receiver['on_hand'] + transfer_qty) / receiver['daily_demand']
-                donor_days_after = (best_donor['on_hand'] - transfer_qty) / best_donor['daily_demand']
-                
-                # Generate rationale
-                rationale = (
-                    f"Receiver ({receiver['store_name']}) will stock out in {receiver['days_of_cover']:.1f} days. "
-                    f"Donor ({best_donor['store_name']}) has {best_donor['days_of_cover']:.1f} days excess. "
-                    f"Transfer {transfer_qty} units prevents stockout. "
-                    f"After transfer: receiver {receiver_days_after:.1f} days, donor {donor_days_after:.1f} days."
-                )
-                
-                # Get distance info
-                distance_record = db.query(StoreDistance).filter(
-                    StoreDistance.from_store_id == best_donor['store_id'],
-                    StoreDistance.to_store_id == receiver['store_id']
-                ).first()
-                
-                recommendations.append({
-                    'from_store_id': best_donor['store_id'],
-                    'from_store_name': best_donor['store_name'],
-                    'to_store_id': receiver['store_id'],
-                    'to_store_name': receiver['store_name'],
-                    'sku_id': sku.id,
-                    'sku_name': sku.name,
-                    'qty': transfer_qty,
-                    'urgency_score': receiver['urgency'],
-                    'rationale': rationale,
-                    'distance_km': distance_record.distance_km if distance_record else None,
-                    'transfer_cost': distance_record.transfer_cost if distance_record else None,
-                    'receiver_days_before': receiver['days_of_cover'],
-                    'receiver_days_after': round(receiver_days_after, 1),
-                    'donor_days_before': best_donor['days_of_cover'],
-                    'donor_days_after': round(donor_days_after, 1)
-                })
-                
-                # Update donor surplus
-                best_donor['surplus'] -= transfer_qty
-                best_donor['on_hand'] -= transfer_qty
-                receiver['need'] -= transfer_qty
+            # Get distance info
+            distance_km, transfer_cost = snapshot.lane(d, r)
+            
+            recommendations.append({
+                'from_store_id': int(snapshot.store_ids[d]),
+                'from_store_name': donor_name,
+                'to_store_id': int(snapshot.store_ids[r]),
+                'to_store_name': receiver_name,
+                'sku_id': int(snapshot.sku_ids[j]),
+                'sku_name': snapshot.sku_names[j],
+                'qty': transfer_qty,
+                'urgency_score': receiver['urgency'],
+                'rationale': rationale,
+                'distance_km': distance_km,
+                'transfer_cost': transfer_cost,
+                'receiver_days_before': receiver['days_of_cover'],
+                'receiver_days_after': round(receiver_days_after, 1),
+                'donor_days_before': donor_days_before,
+                'donor_days_after': round(donor_days_after, 1)
+            })
+            
+            stock[d] -= transfer_qty
+            stock[r] += transfer_qty
+    
+    return recommendations
+
+
+# Network snapshot handed to each planning pool process once, at start-up
+_worker_snapshot: Optional[NetworkSnapshot] = None
+
+
+def _init_planning_worker(snapshot: NetworkSnapshot) -> None:
+    """Keep the read-only network snapshot for this pool process"""
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def _plan_chunk(
+    sku_columns: np.ndarray,
+    need: np.ndarray,
+    surplus: np.ndarray,
+    min_urgency: float,
+    solver: str
+) -> List[Dict]:
+    """Plan one chunk of SKU columns in a pool process"""
+    return _plan_sku_columns(_worker_snapshot, sku_columns, need, surplus, min_urgency, solver)
+
+
+@timed_job("transfer_planning")
+def generate_transfer_recommendations(
+    db: Session,
+    target_cover_days: int = 10,
+    safety_buffer_days: int = 2,
+    min_urgency: float = 0.5,
+    ctx: Optional[AnalyticsContext] = None,
+    snapshot: Optional[NetworkSnapshot] = None,
+    solver: str = "greedy",
+    workers: int = 1
+) -> List[Dict]:
+    """
+    Generate transfer recommendations to prevent stockouts
+    Prioritizes nearby stores and high-urgency receivers
+    solver="greedy" matches receivers one at a time in urgency order;
+    solver="flow" plans each SKU as a min-cost flow over all donors at once;
+    workers > 1 plans chunks of SKUs on a process pool
+    """
+    if solver not in TRANSFER_SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {TRANSFER_SOLVERS}")
+    
+    # Latest on-hand, demand and distances for the whole network, loaded once
+    if snapshot is None:
+        snapshot = load_network_snapshot(db, ctx=ctx)
+    
+    on_hand = snapshot.on_hand
+    daily_demand = snapshot.daily_demand
+    
+    # Skip items without a snapshot or with no demand
+    active = snapshot.has_snapshot & (daily_demand >= 0.1)
+    
+    # Calculate target and buffer
+    target_on_hand = daily_demand * target_cover_days
+    buffer_on_hand = daily_demand * safety_buffer_days
+    
+    # Calculate need and surplus for every store/SKU
+    need = np.where(active, np.maximum(0, target_on_hand - on_hand), 0)
+    surplus = np.where(active, np.maximum(0, on_hand - (target_on_hand + buffer_on_hand)), 0)
+    
+    # Only SKUs with both a store in need and a store with surplus can transfer
+    sku_columns = np.flatnonzero((need > 0).any(axis=0) & (surplus > 0).any(axis=0))
+    
+    if workers <= 1 or len(sku_columns) < 2:
+        recommendations = _plan_sku_columns(
+            snapshot, sku_columns, need[:, sku_columns], surplus[:, sku_columns], min_urgency, solver
+        )
+    else:
+        # SKUs are independent: plan chunks in parallel and merge them in
+        # column order, so the result matches a serial run
+        chunks = [chunk for chunk in np.array_split(sku_columns, workers * 4) if len(chunk)]
+        
+        recommendations = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_planning_worker,
+            initargs=(snapshot,)
+        ) as pool:
+            for chunk_recommendations in pool.map(
+                _plan_chunk,
+                chunks,
+                [need[:, chunk] for chunk in chunks],
+                [surplus[:, chunk] for chunk in chunks],
+                [min_urgency] * len(chunks),
+                [solver] * len(chunks)
+            ):
+                recommendations.extend(chunk_recommendations)
     
     # Sort by urgency (highest first)
     recommendations.sort(key=lambda x: x['urgency_score'], reverse=True)
@@ -230,36 +341,180 @@ def generate_transfer_recommendations(
     return recommendations
 
 
-def save_transfer_recommendations(
+def get_transfer_plan(
+    db: Session,
+    target_cover_days: int = 10,
+    safety_buffer_days: int = 2,
+    min_urgency: float = 0.5,
+    solver: str = "greedy",
+    ctx: Optional[AnalyticsContext] = None
+) -> List[Dict]:
+    """
+    Transfer recommendations served from the plan cache
+    A cached plan is reused until inventory, sales or transfers change
+    (data version bump), the day rolls over, or TRANSFER_PLAN_CACHE_TTL passes
+    """
+    key = (target_cover_days, safety_buffer_days, min_urgency, solver, datetime.now().date())
+    version = get_data_version()
+    
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+        if cached is not None:
+            cached_version, cached_at, plan = cached
+            age = (datetime.now() - cached_at).total_seconds()
+            if cached_version == version and age < settings.TRANSFER_PLAN_CACHE_TTL:
+                _plan_cache_stats["hits"] += 1
+                return list(plan)
+        
+        _plan_cache_stats["misses"] += 1
+    
+    # Planned outside the lock; concurrent misses may both plan
+    plan = generate_transfer_recommendations(
+        db,
+        target_cover_days=target_cover_days,
+        safety_buffer_days=safety_buffer_days,
+        min_urgency=min_urgency,
+        ctx=ctx,
+        solver=solver
+    )
+    
+    with _plan_cache_lock:
+        # Plans from older data versions can never be served again
+        for stale_key in [k for k, (v, _, _) in _plan_cache.items() if v != version]:
+            del _plan_cache[stale_key]
+        
+        _plan_cache[key] = (version, datetime.now(), plan)
+    
+    return list(plan)
+
+
+def get_plan_cache_stats() -> Dict:
+    """Hit rate and age of the cached transfer plans"""
+    with _plan_cache_lock:
+        hits, misses = _plan_cache_stats["hits"], _plan_cache_stats["misses"]
+        cached_ats = [cached_at for _, cached_at, _ in _plan_cache.values()]
+    
+    lookups = hits + misses
+    now = datetime.now()
+    ages = [(now - cached_at).total_seconds() for cached_at in cached_ats]
+    
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "entries": len(cached_ats),
+        "oldest_age_seconds": round(max(ages), 1) if ages else None,
+        "newest_age_seconds": round(min(ages), 1) if ages else None,
+        "data_version": get_data_version(),
+        "ttl_seconds": settings.TRANSFER_PLAN_CACHE_TTL
+    }
+
+
+def sync_transfer_recommendations(
     db: Session,
     recommendations: List[Dict]
-) -> int:
+) -> Dict:
     """
-    Save transfer recommendations to database
+    Reconcile pending recommendations with a new plan in one transaction
+    Rows are matched on (from_store, to_store, sku): matches keep their id
+    and are updated only when qty, urgency or rationale changed, new lanes
+    are bulk-inserted and pending rows missing from the plan are expired
     """
-    # Clear old pending recommendations
-    db.query(TransferRecommendation).filter(
+    planned = {}
+    for rec in recommendations:
+        key = (rec['from_store_id'], rec['to_store_id'], rec['sku_id'])
+        if key in planned:
+            # Same lane planned twice: ship it as one recommendation
+            merged = dict(planned[key])
+            merged['qty'] += rec['qty']
+            merged['urgency_score'] = max(merged['urgency_score'], rec['urgency_score'])
+            planned[key] = merged
+        else:
+            planned[key] = rec
+    
+    existing = db.query(
+        TransferRecommendation.id,
+        TransferRecommendation.from_store_id,
+        TransferRecommendation.to_store_id,
+        TransferRecommendation.sku_id,
+        TransferRecommendation.qty,
+        TransferRecommendation.urgency_score,
+        TransferRecommendation.rationale
+    ).filter(
         TransferRecommendation.status == 'pending'
-    ).delete()
+    ).order_by(TransferRecommendation.id).all()
     
-    saved_count = 0
+    updates = []
+    expired_ids = []
+    matched = set()
+    unchanged = 0
     
-    for rec in recommendations:
-        transfer_rec = TransferRecommendation(
-            from_store_id=rec['from_store_id'],
-            to_store_id=rec['to_store_id'],
-            sku_id=rec['sku_id'],
-            qty=rec['qty'],
-            urgency_score=rec['urgency_score'],
-            rationale=rec['rationale'],
-            status='pending'
+    for row in existing:
+        key = (row.from_store_id, row.to_store_id, row.sku_id)
+        rec = planned.get(key)
+        
+        # Lanes no longer planned (or duplicate pending rows) are expired
+        if rec is None or key in matched:
+            expired_ids.append(row.id)
+            continue
+        
+        matched.add(key)
+        
+        if (row.qty, row.urgency_score, row.rationale) == (rec['qty'], rec['urgency_score'], rec['rationale']):
+            unchanged += 1
+        else:
+            updates.append({
+                "id": row.id,
+                "qty": rec['qty'],
+                "urgency_score": rec['urgency_score'],
+                "rationale": rec['rationale']
+            })
+    
+    inserts = [
+        {
+            "from_store_id": rec['from_store_id'],
+            "to_store_id": rec['to_store_id'],
+            "sku_id": rec['sku_id'],
+            "qty": rec['qty'],
+            "urgency_score": rec['urgency_score'],
+            "rationale": rec['rationale'],
+            "status": 'pending'
+        }
+        for key, rec in planned.items()
+        if key not in matched
+    ]
+    
+    # Bulk statements: executemany INSERT, and UPDATE by primary key
+    if inserts:
+        db.execute(insert(TransferRecommendation), inserts)
+    if updates:
+        db.execute(update(TransferRecommendation), updates)
+    if expired_ids:
+        db.execute(
+            update(TransferRecommendation),
+            [{"id": rec_id, "status": 'expired'} for rec_id in expired_ids]
         )
-        db.add(transfer_rec)
-        saved_count += 1
     
     db.commit()
     
-    return saved_count
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "unchanged": unchanged,
+        "expired": len(expired_ids),
+        "pending": len(planned)
+    }
+
+
+def save_transfer_recommendations(
+    db: Session,
+    recommendations: List[Dict]
+) -> int:
+    """
+    Save transfer recommendations to database
+    Returns the number of pending recommendations after the save
+    """
+    return sync_transfer_recommendations(db, recommendations)["pending"]
 
 
 def create_transfer_from_recommendation(
@@ -296,11 +551,15 @@ def create_transfer_from_recommendation(
     return transfer.id
 
 
-def get_transfer_opportunities_summary(db: Session) -> Dict:
+def get_transfer_opportunities_summary(
+    db: Session,
+    ctx: Optional[AnalyticsContext] = None,
+    solver: str = "greedy"
+) -> Dict:
     """
     Get summary of transfer opportunities
     """
-    recommendations = generate_transfer_recommendations(db)
+    recommendations = get_transfer_plan(db, solver=solver, ctx=ctx)
     
     if not recommendations:
         return {
@@ -329,3 +588,29 @@ def get_transfer_opportunities_summary(db: Session) -> Dict:
         "total_units": total_units,
         "estimated_savings": estimated_savings
     }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from ..database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Plan transfer recommendations for the whole network")
+    parser.add_argument("--solver", choices=TRANSFER_SOLVERS, default="greedy")
+    parser.add_argument("--workers", type=int, default=1, help="parallel SKU planning processes")
+    parser.add_argument("--save", action="store_true", help="replace pending recommendations with the new plan")
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        recommendations = generate_transfer_recommendations(db, solver=args.solver, workers=args.workers)
+        print(f"✅ Planned {len(recommendations)} transfers in {time.perf_counter() - started:.1f}s")
+        
+        if args.save:
+            changes = sync_transfer_recommendations(db, recommendations)
+            print(f"✅ Saved {changes['pending']} transfer recommendations "
+                  f"({changes['inserted']} new, {changes['updated']} updated, {changes['expired']} expired)")
+    finally:
+        db.close()
@@ -0,0 +1,27 @@
+"""
+Shared fixtures: a fresh in-memory database per test
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models  # noqa: F401 - registers the tables on Base
+from app.database import Base
+
+
+@pytest.fixture
+def db():
+    """Session on an empty in-memory SQLite database with every table created"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
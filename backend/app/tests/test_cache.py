@@ -0,0 +1,194 @@
+"""
+Tests for the bounded LRU + TTL cache
+"""
+import threading
+
+import pytest
+
+from app.services import cache as cache_module
+from app.services.cache import BoundedCache, get_cache, get_cache_stats
+
+
+class FakeClock:
+    """Stands in for time.monotonic so expiry can be stepped through"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", fake)
+    return fake
+
+
+class TestLRUEviction:
+    def test_evicts_least_recently_set_when_full(self):
+        cache = BoundedCache("test", max_entries=2)
+        cache.set("ns", 1, "a")
+        cache.set("ns", 2, "b")
+        cache.set("ns", 3, "c")
+        
+        assert cache.get("ns", 1) is None
+        assert cache.get("ns", 2) == "b"
+        assert cache.get("ns", 3) == "c"
+        assert cache.evictions == 1
+    
+    def test_get_makes_an_entry_most_recently_used(self):
+        cache = BoundedCache("test", max_entries=2)
+        cache.set("ns", 1, "a")
+        cache.set("ns", 2, "b")
+        cache.get("ns", 1)
+        cache.set("ns", 3, "c")
+        
+        assert cache.get("ns", 1) == "a"
+        assert cache.get("ns", 2) is None
+    
+    def test_overwriting_does_not_evict(self):
+        cache = BoundedCache("test", max_entries=2)
+        cache.set("ns", 1, "a")
+        cache.set("ns", 2, "b")
+        cache.set("ns", 1, "a2")
+        
+        assert cache.get("ns", 1) == "a2"
+        assert cache.get("ns", 2) == "b"
+        assert cache.evictions == 0
+        assert cache.stats()["entries"] == 2
+    
+    def test_size_stays_bounded(self):
+        cache = BoundedCache("test", max_entries=50)
+        for key in range(1000):
+            cache.set(f"ns{key % 3}", key, key)
+        
+        stats = cache.stats()
+        assert stats["entries"] == 50
+        assert stats["evictions"] == 950
+        assert sum(stats["namespaces"].values()) == 50
+        # The newest entries survive
+        assert all(cache.get(f"ns{key % 3}", key) == key for key in range(950, 1000))
+
+
+class TestTTLExpiry:
+    def test_entry_expires_after_ttl(self, clock):
+        cache = BoundedCache("test", ttl_seconds=60)
+        cache.set("ns", "key", "value")
+        
+        clock.now += 59.9
+        assert cache.get("ns", "key") == "value"
+        
+        clock.now += 0.1
+        assert cache.get("ns", "key") is None
+        assert cache.expirations == 1
+        assert cache.stats()["entries"] == 0
+    
+    def test_per_entry_ttl_overrides_the_default(self, clock):
+        cache = BoundedCache("test", ttl_seconds=60)
+        cache.set("ns", "short", 1, ttl_seconds=5)
+        cache.set("ns", "default", 2)
+        
+        clock.now += 10
+        assert cache.get("ns", "short") is None
+        assert cache.get("ns", "default") == 2
+    
+    def test_reading_does_not_extend_the_ttl(self, clock):
+        cache = BoundedCache("test", ttl_seconds=60)
+        cache.set("ns", "key", "value")
+        
+        clock.now += 50
+        assert cache.get("ns", "key") == "value"
+        clock.now += 20
+        assert cache.get("ns", "key") is None
+    
+    def test_setting_again_restarts_the_ttl(self, clock):
+        cache = BoundedCache("test", ttl_seconds=60)
+        cache.set("ns", "key", "old")
+        clock.now += 50
+        cache.set("ns", "key", "new")
+        clock.now += 50
+        
+        assert cache.get("ns", "key") == "new"
+    
+    def test_expired_entry_is_recomputed(self, clock):
+        cache = BoundedCache("test", ttl_seconds=60)
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            return len(calls)
+        
+        assert cache.get_or_compute("ns", "key", compute) == 1
+        assert cache.get_or_compute("ns", "key", compute) == 1
+        clock.now += 61
+        assert cache.get_or_compute("ns", "key", compute) == 2
+
+
+class TestBookkeeping:
+    def test_cached_none_is_a_hit(self):
+        cache = BoundedCache("test")
+        cache.set("ns", "key", None)
+        missing = object()
+        
+        assert cache.get("ns", "key", missing) is None
+        assert (cache.hits, cache.misses) == (1, 0)
+    
+    def test_invalidate_one_namespace(self):
+        cache = BoundedCache("test")
+        cache.set("a", 1, 1)
+        cache.set("a", 2, 2)
+        cache.set("b", 1, 1)
+        
+        assert cache.invalidate("a") == 2
+        assert cache.get("a", 1) is None
+        assert cache.get("b", 1) == 1
+        assert cache.stats()["namespaces"] == {"b": 1}
+    
+    def test_invalidate_everything(self):
+        cache = BoundedCache("test")
+        cache.set("a", 1, 1)
+        cache.set("b", 1, 1)
+        
+        assert cache.invalidate() == 2
+        assert cache.stats()["entries"] == 0
+    
+    def test_hit_rate(self):
+        cache = BoundedCache("test")
+        cache.set("ns", 1, 1)
+        cache.get("ns", 1)
+        cache.get("ns", 1)
+        cache.get("ns", 2)
+        
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 1, 0.667)
+    
+    def test_named_caches_are_shared_and_reported(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "_registry", {})
+        
+        first = get_cache("plans", max_entries=10, ttl_seconds=5)
+        again = get_cache("plans", max_entries=999)
+        
+        assert again is first
+        assert again.max_entries == 10
+        assert list(get_cache_stats()) == ["plans"]
+    
+    def test_concurrent_use_keeps_counts_consistent(self):
+        cache = BoundedCache("test", max_entries=100)
+        
+        def worker(offset):
+            for key in range(2000):
+                cache.set("ns", (offset, key % 150), key)
+                cache.get("ns", (offset, (key * 7) % 150))
+        
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = cache.stats()
+        assert stats["entries"] == 100
+        assert stats["hits"] + stats["misses"] == 8 * 2000
+        assert sum(stats["namespaces"].values()) == 100
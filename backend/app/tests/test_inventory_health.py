@@ -0,0 +1,143 @@
+"""
+Tests for the inventory_health keyset cursor and refresh scheduling
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import Store, SKU, InventoryHealthItem, InventoryHealthRefresh
+from app.services import inventory_health
+from app.services.inventory_health import (
+    RISK_LEVELS, _decode_cursor, _encode_cursor, ensure_inventory_health, query_inventory_health
+)
+
+AS_OF = date(2024, 3, 1)
+
+
+def _item(store_id: int, sku_id: int, risk_rank: int, days_of_cover: float, confidence: float = 80.0):
+    return InventoryHealthItem(
+        store_id=store_id,
+        sku_id=sku_id,
+        as_of=AS_OF,
+        on_hand=10,
+        daily_demand=1.0,
+        days_of_cover=days_of_cover,
+        stockout_date=None,
+        confidence_score=confidence,
+        confidence_grade="B",
+        risk_rank=risk_rank,
+        risk_level=RISK_LEVELS[risk_rank],
+        suggested_action="Monitor closely"
+    )
+
+
+@pytest.fixture
+def health_items(db):
+    """Three stores x six SKUs with ties on risk_rank and days_of_cover"""
+    db.add_all(Store(id=store_id, name=f"Store {store_id}") for store_id in (1, 2, 3))
+    db.add_all(SKU(id=sku_id, name=f"SKU {sku_id}", category="Snacks") for sku_id in range(1, 7))
+    
+    items = []
+    for store_id in (1, 2, 3):
+        for sku_id in range(1, 7):
+            # Few distinct sort values, so pages split inside runs of equal keys
+            risk_rank = (store_id + sku_id) % 4
+            days_of_cover = [0.1 + 0.2, 2.5, 999.0][sku_id % 3]
+            items.append(_item(store_id, sku_id, risk_rank, days_of_cover, confidence=50.0 + 5 * sku_id))
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def _all_pages(db, limit: int, **filters) -> list:
+    keys = []
+    cursor = None
+    while True:
+        page, cursor = query_inventory_health(db, limit=limit, cursor=cursor, **filters)
+        assert len(page) <= limit
+        keys.extend((item["store_id"], item["sku_id"]) for item in page)
+        if cursor is None:
+            return keys
+
+
+def _sort_key(item: InventoryHealthItem) -> tuple:
+    return (item.risk_rank, item.days_of_cover, item.store_id, item.sku_id)
+
+
+class TestCursor:
+    def test_round_trip(self):
+        item = _item(12, 345, 2, 0.1 + 0.2)
+        assert _decode_cursor(_encode_cursor(item)) == (2, 0.1 + 0.2, 12, 345)
+    
+    def test_round_trip_keeps_float_precision(self):
+        # repr() keeps every digit, so the cursor sits exactly after the item
+        days_of_cover = 1 / 3
+        item = _item(1, 1, 0, days_of_cover)
+        assert _decode_cursor(_encode_cursor(item))[1] == days_of_cover
+    
+    @pytest.mark.parametrize("cursor", ["", "1:2.0:3", "1:2.0:3:4:5", "a:2.0:3:4", "1:x:3:4", "1:2.0:3:4.5"])
+    def test_malformed_cursor_raises_value_error(self, cursor):
+        with pytest.raises(ValueError):
+            _decode_cursor(cursor)
+
+
+class TestKeysetPagination:
+    @pytest.mark.parametrize("limit", [1, 4, 5, 17, 18, 100])
+    def test_pages_cover_every_item_once_in_order(self, db, health_items, limit):
+        expected = [(i.store_id, i.sku_id) for i in sorted(health_items, key=_sort_key)]
+        assert _all_pages(db, limit) == expected
+    
+    def test_last_page_has_no_cursor(self, db, health_items):
+        page, cursor = query_inventory_health(db, limit=len(health_items))
+        assert len(page) == len(health_items)
+        assert cursor is None
+    
+    def test_cursor_continues_after_its_item(self, db, health_items):
+        first, cursor = query_inventory_health(db, limit=3)
+        second, _ = query_inventory_health(db, limit=3, cursor=cursor)
+        
+        ordered = sorted(health_items, key=_sort_key)
+        assert [(i["store_id"], i["sku_id"]) for i in first + second] == [
+            (i.store_id, i.sku_id) for i in ordered[:6]
+        ]
+    
+    def test_filters_apply_on_every_page(self, db, health_items):
+        expected = [
+            (i.store_id, i.sku_id) for i in sorted(health_items, key=_sort_key)
+            if i.store_id == 2 and i.risk_rank <= 1 and i.confidence_score >= 60
+        ]
+        assert expected
+        assert _all_pages(db, 2, store_id=2, risk_only=True, min_confidence=60) == expected
+
+
+class TestEnsureInventoryHealth:
+    @pytest.fixture(autouse=True)
+    def no_rebuild_thread(self, monkeypatch):
+        """Record background rebuild requests instead of starting a thread"""
+        started = []
+        monkeypatch.setattr(inventory_health, "start_inventory_health_rebuild", lambda: started.append(1) or True)
+        monkeypatch.setattr(inventory_health, "_pending_pairs", set())
+        monkeypatch.setattr(inventory_health, "_pending_full", False)
+        return started
+    
+    def test_stale_table_is_rebuilt_in_the_background(self, db, health_items, no_rebuild_thread):
+        db.add(InventoryHealthRefresh(id=1, as_of=date.today() - timedelta(days=2), items=len(health_items)))
+        db.commit()
+        
+        assert ensure_inventory_health(db) is None
+        assert no_rebuild_thread == [1]
+        
+        # The previous table is still served
+        page, _ = query_inventory_health(db, limit=1000)
+        assert len(page) == len(health_items)
+    
+    def test_missing_table_is_rebuilt_in_the_background(self, db, no_rebuild_thread):
+        assert ensure_inventory_health(db) is None
+        assert no_rebuild_thread == [1]
+    
+    def test_current_table_is_left_alone(self, db, health_items, no_rebuild_thread):
+        db.add(InventoryHealthRefresh(id=1, as_of=date.today() - timedelta(days=1), items=len(health_items)))
+        db.commit()
+        
+        assert ensure_inventory_health(db) is None
+        assert no_rebuild_thread == []
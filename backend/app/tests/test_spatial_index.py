@@ -0,0 +1,102 @@
+"""
+Tests for the store spatial index against brute-force haversine search
+"""
+import math
+
+import numpy as np
+import pytest
+
+from app.services.spatial_index import EARTH_RADIUS_KM, StoreSpatialIndex, haversine_km
+from app.utils.demo_data import calculate_distance
+
+
+def _brute_force(latitude, longitude, lat, lon, radius_km):
+    """Every located store within radius_km, nearest first (ties by position)"""
+    distances = haversine_km(lat, lon, latitude, longitude)
+    within = np.flatnonzero(~np.isnan(distances) & (distances <= radius_km))
+    order = np.lexsort((within, distances[within]))
+    return within[order], distances[within][order]
+
+
+def _random_stores(rng, num_stores, lat_range, lon_range):
+    latitude = rng.uniform(*lat_range, num_stores)
+    longitude = rng.uniform(*lon_range, num_stores)
+    return latitude, longitude
+
+
+class TestHaversine:
+    def test_one_degree_along_the_equator(self):
+        assert haversine_km(0.0, 0.0, 0.0, 1.0) == pytest.approx(2 * math.pi * EARTH_RADIUS_KM / 360)
+    
+    def test_matches_scalar_distance(self):
+        rng = np.random.default_rng(0)
+        lat1, lon1, lat2, lon2 = rng.uniform(-60, 60, 4)
+        assert haversine_km(lat1, lon1, lat2, lon2) == pytest.approx(calculate_distance(lat1, lon1, lat2, lon2))
+    
+    def test_broadcasts_and_is_symmetric(self):
+        latitude = np.array([40.7, 34.1, 41.9])
+        longitude = np.array([-74.0, -118.2, -87.6])
+        distances = haversine_km(latitude[:, None], longitude[:, None], latitude[None, :], longitude[None, :])
+        
+        assert distances.shape == (3, 3)
+        np.testing.assert_allclose(distances, distances.T)
+        np.testing.assert_allclose(np.diag(distances), 0.0, atol=1e-9)
+
+
+class TestQueryRadius:
+    @pytest.mark.parametrize("lat_range, lon_range", [
+        ((30.0, 45.0), (-120.0, -75.0)),    # mid latitudes
+        ((75.0, 89.9), (-180.0, 180.0)),    # near the pole, where longitude cells shrink
+        ((-10.0, 10.0), (170.0, 180.0)),    # up to the antimeridian
+    ])
+    @pytest.mark.parametrize("radius_km", [10.0, 100.0, 300.0, 1500.0])
+    @pytest.mark.parametrize("cell_km", [25.0, 50.0, 200.0])
+    def test_matches_brute_force(self, lat_range, lon_range, radius_km, cell_km):
+        rng = np.random.default_rng(int(radius_km + cell_km))
+        latitude, longitude = _random_stores(rng, 400, lat_range, lon_range)
+        index = StoreSpatialIndex(latitude, longitude, cell_km=cell_km)
+        
+        for k in rng.choice(len(latitude), 10, replace=False):
+            stores, distances = index.query_radius(latitude[k], longitude[k], radius_km)
+            expected_stores, expected_distances = _brute_force(latitude, longitude, latitude[k], longitude[k], radius_km)
+            
+            np.testing.assert_array_equal(stores, expected_stores)
+            np.testing.assert_allclose(distances, expected_distances)
+    
+    def test_finds_stores_across_the_antimeridian(self):
+        latitude = np.array([0.0, 0.0, 0.0])
+        longitude = np.array([179.9, -179.9, 0.0])
+        index = StoreSpatialIndex(latitude, longitude)
+        
+        stores, distances = index.query_radius(0.0, 179.95, 50.0)
+        
+        assert sorted(stores.tolist()) == [0, 1]
+        assert (distances <= 50.0).all()
+    
+    def test_nearest_first_with_ties_by_position(self):
+        latitude = np.array([0.0, 0.0, 0.0, 0.0])
+        longitude = np.array([0.5, -0.2, 0.2, 0.0])
+        index = StoreSpatialIndex(latitude, longitude)
+        
+        stores, distances = index.query_radius(0.0, 0.0, 100.0)
+        
+        assert stores.tolist() == [3, 1, 2, 0]
+        assert (np.diff(distances) >= 0).all()
+    
+    def test_stores_without_coordinates_are_never_returned(self):
+        latitude = np.array([10.0, np.nan, 10.01, 10.0])
+        longitude = np.array([20.0, 20.0, 20.0, np.nan])
+        index = StoreSpatialIndex(latitude, longitude)
+        
+        stores, _ = index.query_radius(10.0, 20.0, 500.0)
+        
+        assert index.size == 2
+        assert stores.tolist() == [0, 2]
+    
+    def test_missing_query_point_or_empty_index(self):
+        index = StoreSpatialIndex(np.array([1.0]), np.array([1.0]))
+        assert len(index.query_radius(math.nan, 1.0, 100.0)[0]) == 0
+        
+        empty = StoreSpatialIndex(np.zeros(0), np.zeros(0))
+        stores, distances = empty.query_radius(1.0, 1.0, 100.0)
+        assert len(stores) == 0 and len(distances) == 0
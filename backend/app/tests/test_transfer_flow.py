@@ -0,0 +1,196 @@
+"""
+Tests for the min-cost-flow transfer solver and its parity with the greedy matcher
+"""
+import itertools
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.services.network_snapshot import NetworkSnapshot
+from app.services.transfer_flow import solve_transportation
+from app.services.transfer_optimizer import _match_greedy, _match_min_cost_flow
+
+
+def _objective(flow: np.ndarray, value: np.ndarray, cost: np.ndarray) -> float:
+    return float((flow.sum(axis=0) * value).sum() - (flow * cost).sum())
+
+
+def _brute_force_best(supply, capacity, value, cost) -> float:
+    """Best objective over every integer flow within supply and capacity"""
+    num_donors, num_receivers = cost.shape
+    limits = [min(supply[d], capacity[r]) for d in range(num_donors) for r in range(num_receivers)]
+    
+    best = 0.0
+    for units in itertools.product(*(range(limit + 1) for limit in limits)):
+        flow = np.array(units).reshape(num_donors, num_receivers)
+        if (flow.sum(axis=1) <= supply).all() and (flow.sum(axis=0) <= capacity).all():
+            best = max(best, _objective(flow, value, cost))
+    return best
+
+
+def _snapshot(distance_km: np.ndarray) -> NetworkSnapshot:
+    """Distance-table snapshot; the matchers only read its lanes"""
+    num_stores = len(distance_km)
+    empty = np.zeros((num_stores, 1))
+    return NetworkSnapshot(
+        as_of=date(2024, 3, 1),
+        store_ids=np.arange(1, num_stores + 1),
+        store_names=[f"Store {i}" for i in range(num_stores)],
+        sku_ids=np.array([1]),
+        sku_names=["SKU 1"],
+        on_hand=empty.copy(),
+        has_snapshot=np.ones((num_stores, 1), dtype=bool),
+        daily_demand=empty.copy(),
+        latitude=np.zeros(num_stores),
+        longitude=np.zeros(num_stores),
+        distance_km=distance_km,
+        transfer_cost=np.full((num_stores, num_stores), np.nan)
+    )
+
+
+def _random_network(rng: np.random.Generator, num_stores: int = 8):
+    """Symmetric distances, half the stores donating and half receiving"""
+    points = rng.uniform(0, 500, size=(num_stores, 2))
+    distance_km = np.sqrt(((points[:, None] - points[None, :]) ** 2).sum(axis=-1))
+    
+    surplus = np.zeros(num_stores)
+    donors = rng.choice(num_stores, num_stores // 2, replace=False)
+    surplus[donors] = rng.integers(0, 40, len(donors))
+    
+    receivers = [
+        {
+            "store_index": int(i),
+            "need": float(rng.integers(1, 30)),
+            "urgency": float(rng.choice([0.5, 0.7, 0.9, 1.0])),
+            "daily_demand": float(rng.uniform(0.5, 5))
+        }
+        for i in range(num_stores) if i not in donors
+    ]
+    receivers.sort(key=lambda receiver: receiver["urgency"], reverse=True)
+    
+    return _snapshot(distance_km), receivers, surplus
+
+
+def _plan_objective(snapshot: NetworkSnapshot, receivers: list, surplus: np.ndarray, shipments) -> float:
+    """Scaled urgency delivered minus unit-km shipped, as _match_min_cost_flow maximizes it"""
+    donors = np.flatnonzero(surplus >= 1)
+    stores = np.array([receiver["store_index"] for receiver in receivers])
+    max_cost = float(snapshot.lane_distances(donors, stores).max(initial=0.0))
+    scale = 10 * (len(donors) + len(receivers)) * (max_cost + 1)
+    
+    return sum(
+        qty * (receiver["urgency"] * scale - snapshot.distance_km[d, receiver["store_index"]])
+        for receiver, d, qty in shipments
+    )
+
+
+def _shipments_by_receiver(shipments) -> dict:
+    totals = {}
+    for receiver, _, qty in shipments:
+        totals[receiver["store_index"]] = totals.get(receiver["store_index"], 0) + qty
+    return totals
+
+
+class TestSolveTransportation:
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_brute_force_optimum(self, seed):
+        rng = np.random.default_rng(seed)
+        num_donors, num_receivers = rng.integers(1, 3, endpoint=True, size=2)
+        supply = rng.integers(0, 3, num_donors, endpoint=True)
+        capacity = rng.integers(0, 3, num_receivers, endpoint=True)
+        value = rng.uniform(0, 10, num_receivers)
+        cost = rng.uniform(0, 10, (num_donors, num_receivers))
+        
+        flow = solve_transportation(supply, capacity, value, cost)
+        
+        assert _objective(flow, value, cost) == pytest.approx(_brute_force_best(supply, capacity, value, cost))
+    
+    @pytest.mark.parametrize("seed", range(10))
+    def test_flow_is_feasible(self, seed):
+        rng = np.random.default_rng(seed)
+        supply = rng.integers(0, 50, 6)
+        capacity = rng.integers(0, 50, 9)
+        value = rng.uniform(0, 100, 9)
+        cost = rng.uniform(0, 100, (6, 9))
+        
+        flow = solve_transportation(supply, capacity, value, cost)
+        
+        assert flow.dtype.kind == "i"
+        assert (flow >= 0).all()
+        assert (flow.sum(axis=1) <= supply).all()
+        assert (flow.sum(axis=0) <= capacity).all()
+    
+    def test_nothing_ships_at_a_loss(self):
+        flow = solve_transportation(np.array([5]), np.array([5]), np.array([1.0]), np.array([[2.0]]))
+        assert not flow.any()
+    
+    def test_empty_problem(self):
+        flow = solve_transportation(np.zeros(0, dtype=np.int64), np.array([3]), np.array([1.0]), np.zeros((0, 1)))
+        assert flow.shape == (0, 1)
+
+
+class TestGreedyParity:
+    @pytest.mark.parametrize("seed", range(25))
+    def test_flow_plan_scores_at_least_the_greedy_plan(self, seed):
+        """Greedy shipments are one feasible flow, so the optimum can't do worse"""
+        snapshot, receivers, surplus = _random_network(np.random.default_rng(seed))
+        
+        greedy = _match_greedy(snapshot, receivers, surplus)
+        flow = _match_min_cost_flow(snapshot, receivers, surplus)
+        
+        assert _plan_objective(snapshot, receivers, surplus, flow) >= \
+            _plan_objective(snapshot, receivers, surplus, greedy) - 1e-6
+    
+    @pytest.mark.parametrize("seed", range(25))
+    def test_plans_respect_the_same_limits(self, seed):
+        snapshot, receivers, surplus = _random_network(np.random.default_rng(seed))
+        
+        for shipments in (_match_greedy(snapshot, receivers, surplus), _match_min_cost_flow(snapshot, receivers, surplus)):
+            shipped = np.zeros(len(surplus))
+            for _, d, qty in shipments:
+                assert qty >= 1
+                shipped[d] += qty
+            assert (shipped <= surplus).all()
+            
+            for store_index, qty in _shipments_by_receiver(shipments).items():
+                receiver = next(r for r in receivers if r["store_index"] == store_index)
+                assert qty <= min(receiver["need"], receiver["daily_demand"] * 7)
+    
+    def test_same_units_when_supply_is_plentiful(self):
+        """Without contention both matchers fill every receiver to its cap"""
+        distance_km = np.array([
+            [0.0, 40.0, 90.0, 120.0],
+            [40.0, 0.0, 60.0, 30.0],
+            [90.0, 60.0, 0.0, 80.0],
+            [120.0, 30.0, 80.0, 0.0]
+        ])
+        snapshot = _snapshot(distance_km)
+        surplus = np.array([500.0, 500.0, 0.0, 0.0])
+        receivers = [
+            {"store_index": 2, "need": 12.0, "urgency": 1.0, "daily_demand": 3.0},
+            {"store_index": 3, "need": 40.0, "urgency": 0.7, "daily_demand": 2.5}
+        ]
+        
+        greedy = _shipments_by_receiver(_match_greedy(snapshot, receivers, surplus))
+        flow = _shipments_by_receiver(_match_min_cost_flow(snapshot, receivers, surplus))
+        
+        assert greedy == flow == {2: 12, 3: 17}
+    
+    def test_scarce_supply_goes_to_the_most_urgent_receiver(self):
+        distance_km = np.array([
+            [0.0, 200.0, 10.0],
+            [200.0, 0.0, 50.0],
+            [10.0, 50.0, 0.0]
+        ])
+        snapshot = _snapshot(distance_km)
+        surplus = np.array([10.0, 0.0, 0.0])
+        receivers = [
+            {"store_index": 1, "need": 10.0, "urgency": 1.0, "daily_demand": 5.0},
+            {"store_index": 2, "need": 10.0, "urgency": 0.5, "daily_demand": 5.0}
+        ]
+        
+        greedy = _shipments_by_receiver(_match_greedy(snapshot, receivers, surplus))
+        flow = _shipments_by_receiver(_match_min_cost_flow(snapshot, receivers, surplus))
+        
+        assert greedy == flow == {1: 10}
@@ -7,9 +7,14 @@ from sqlalchemy.orm import Session
 from ..models import (
     Store, SKU, InventorySnapshot, SalesDaily, ReceiptsDaily,
     Transfer, CycleCount, Supplier, SKUSupplier, AnomalyEvent,
-    TransferRecommendation, StoreDistance, SalesHourly, Telemetry
+    TransferRecommendation, StoreDistance, SalesHourly, Telemetry,
+    ForecastState, HourlyDemandProfile, InventoryHealthItem
 )
-from ..database import SessionLocal, engine, Base
+from ..services.forecast_state import catch_up_forecast_state
+from ..services.hourly_profile import refresh_hourly_profiles
+from ..services.inventory_health import refresh_inventory_health
+from ..services.metrics import timed_job
+from ..database import SessionLocal, engine, Base, long_write
 import math
 
 
@@ -28,6 +33,8 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+@long_write
+@timed_job("demo_data_generation")
 def generate_demo_data(
     num_stores: int = 5,
     num_skus: int = 200,
@@ -51,6 +58,9 @@ def generate_demo_data(
         db.query(CycleCount).delete()
         db.query(Transfer).delete()
         db.query(ReceiptsDaily).delete()
+        db.query(ForecastState).delete()
+        db.query(HourlyDemandProfile).delete()
+        db.query(InventoryHealthItem).delete()
         db.query(SalesDaily).delete()
         db.query(SalesHourly).delete()
         db.query(Telemetry).delete()
@@ -302,10 +312,16 @@ def generate_demo_data(
                         on_hand=max(0, inventory_tracker[(store.id, sku.id)])
                     )
                     db.add(snapshot)
+            
+            # A transaction per store, so concurrent writes (telemetry) wait
+            # for one store's history rather than the whole network's
+            db.commit()
         
-        db.commit()
         print("✅ Sales history generated")
         
+        # Seed the incremental forecast state from the generated history
+        catch_up_forecast_state(db)
+        
         # 5. Inject anomalies
         print("⚠️  Injecting anomalies...")
         anomaly_count = 0
@@ -334,6 +350,15 @@ def generate_demo_data(
                 
                 explanation = f"Unexplained inventory drop of {abs(residual)} units. Possible shrink or unrecorded transaction."
                 
+                # Take the units out of the snapshots too, so anomaly scans find the same drop
+                later_snapshots = db.query(InventorySnapshot).filter(
+                    InventorySnapshot.store_id == store_id,
+                    InventorySnapshot.sku_id == sku_id,
+                    InventorySnapshot.ts_date >= anomaly_date
+                ).all()
+                for later_snapshot in later_snapshots:
+                    later_snapshot.on_hand = max(0, later_snapshot.on_hand + residual)
+                
                 anomaly = AnomalyEvent(
                     store_id=store_id,
                     sku_id=sku_id,
@@ -513,10 +538,14 @@ def generate_demo_data(
                                 is_peak_hour=is_peak
                             )
                             db.add(sales_hour)
+            
+            db.commit()
         
-        db.commit()
         print("✅ Hourly sales data generated")
         
+        # Roll the new hourly sales up into the hourly_profile table
+        refresh_hourly_profiles(db, rebuild=True)
+        
         # 10. Generate IoT Telemetry Data
         print("📡 Generating IoT telemetry data...")
         
@@ -563,6 +592,9 @@ def generate_demo_data(
         db.commit()
         print("✅ IoT telemetry data generated")
         
+        # Materialize the overview's inventory health for the new data
+        refresh_inventory_health(db)
+        
         # Summary
         stats = {
             "stores": len(stores),
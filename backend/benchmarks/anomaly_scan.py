@@ -0,0 +1,58 @@
+"""
+Anomaly scan scaling benchmark: full rescan with 1..N store-sharded workers
+
+    python -m benchmarks.anomaly_scan --stores 16 --skus 2000 --days 14 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from .seed import use_database, seed_network
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stores", type=int, default=16)
+    parser.add_argument("--skus", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=14, help="days of history to seed")
+    parser.add_argument("--days-back", type=int, default=7, help="scan window")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "optimus_bench_anomaly.db"))
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an existing --db")
+    args = parser.parse_args()
+    
+    use_database(args.db)
+    
+    from app.database import SessionLocal
+    from app.models import AnomalyEvent
+    from app.services.anomaly_detector import scan_for_anomalies
+    
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed_network(args.stores, args.skus, args.days, with_distances=False)
+        print(f"Seeded {args.stores} stores x {args.skus} SKUs x {args.days} days "
+              f"in {time.perf_counter() - started:.1f}s")
+    
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'anomalies':>10}")
+    
+    baseline = None
+    for workers in args.workers:
+        db = SessionLocal()
+        try:
+            # Start every run from an empty event table so each writes the same rows
+            db.query(AnomalyEvent).delete()
+            db.commit()
+            
+            started = time.perf_counter()
+            detected = scan_for_anomalies(db, days_back=args.days_back, full_rescan=True, workers=workers)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+        
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {len(detected):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Event-loop concurrency benchmark: telemetry POST latency while heavy overview requests run
+
+Requests share one event loop (as on a uvicorn worker). Route handlers run
+either on the bounded DB pools or inline on the loop, the way blocking ORM
+calls in async handlers used to. A write phase posts telemetry while full
+inventory_health rebuilds hold SQLite's write lock; POSTs failing with
+"database is locked" show up as failures.
+
+    python -m benchmarks.concurrency --stores 50 --skus 2000 --heavy-clients 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from typing import Optional
+
+import numpy as np
+
+from .seed import use_database, seed_network
+
+HEAVY_URLS = [
+    "/api/overview?limit=1000",
+    "/api/overview?min_confidence=70&limit=1000",
+    "/api/alerts"
+]
+
+
+class InlineExecutor(Executor):
+    """Runs submitted calls immediately on the calling (event loop) thread"""
+    
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+async def post_telemetry(client, count: int, interval: float, until: Optional[asyncio.Event] = None) -> tuple:
+    """
+    Latencies and failure count of telemetry POSTs, interval seconds apart
+    At least count POSTs; more until the until event is set, if given
+    """
+    latencies = []
+    failures = 0
+    i = 0
+    while i < count or (until is not None and not until.is_set()):
+        started = time.perf_counter()
+        response = await client.post("/api/telemetry", json={
+            "store_id": 1,
+            "sensor": "cooler_temp_c",
+            "value": 3.0 + (i % 10) / 10,
+            "unit": "celsius"
+        })
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            failures += 1
+        i += 1
+        await asyncio.sleep(interval)
+    return latencies, failures
+
+
+async def heavy_client(client, stop: asyncio.Event, offset: int, completed: list) -> None:
+    """Issue heavy overview requests back to back until stopped"""
+    i = offset
+    while not stop.is_set():
+        response = await client.get(HEAVY_URLS[i % len(HEAVY_URLS)])
+        response.raise_for_status()
+        completed.append(1)
+        i += 1
+
+
+def rebuild_inventory_health() -> None:
+    """One full inventory_health rebuild, the longest write transaction the app runs"""
+    from app.database import SessionLocal
+    from app.services.inventory_health import refresh_inventory_health
+    
+    db = SessionLocal()
+    try:
+        refresh_inventory_health(db)
+    finally:
+        db.close()
+
+
+async def rebuild_writer(rebuilds: int, done: asyncio.Event) -> None:
+    """Run rebuilds back to back on the analytics pool, then set done"""
+    from app.database import run_in_db_pool
+    
+    try:
+        for _ in range(rebuilds):
+            await run_in_db_pool(rebuild_inventory_health)
+    finally:
+        done.set()
+
+
+async def run_phase(app, heavy_clients: int, posts: int, interval: float, rebuilds: int = 0) -> dict:
+    """
+    Telemetry latencies with heavy_clients overview loops running alongside
+    With rebuilds, telemetry keeps posting until that many rebuilds finish
+    """
+    import httpx
+    
+    # Server errors come back as 500s, counted as failures, rather than raising
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        stop = asyncio.Event()
+        completed = []
+        heavy = [
+            asyncio.create_task(heavy_client(client, stop, offset, completed))
+            for offset in range(heavy_clients)
+        ]
+        rebuilt = asyncio.Event() if rebuilds else None
+        writer = asyncio.create_task(rebuild_writer(rebuilds, rebuilt)) if rebuilds else None
+        
+        # Let the heavy requests get going first
+        await asyncio.sleep(0.5 if heavy_clients else 0)
+        started = time.perf_counter()
+        latencies, failures = await post_telemetry(client, posts, interval, until=rebuilt)
+        elapsed = time.perf_counter() - started
+        
+        stop.set()
+        await asyncio.gather(*heavy)
+        if writer is not None:
+            await writer
+    
+    return {
+        "latencies_ms": np.array(latencies) * 1000,
+        "failures": failures,
+        "heavy_per_second": len(completed) / elapsed
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=35, help="days of history to seed")
+    parser.add_argument("--heavy-clients", type=int, default=8, help="concurrent overview request loops")
+    parser.add_argument("--posts", type=int, default=100, help="telemetry POSTs per phase")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between telemetry POSTs")
+    parser.add_argument("--rebuilds", type=int, default=1, help="full inventory_health rebuilds in the write phase")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "optimus_bench_concurrency.db"))
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an existing --db")
+    args = parser.parse_args()
+    
+    use_database(args.db)
+    
+    from app import database
+    from app.database import SessionLocal, init_db
+    from app.main import app
+    from app.services.inventory_health import refresh_inventory_health
+    from app.services.transfer_optimizer import get_transfer_plan
+    
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed_network(args.stores, args.skus, args.days)
+        print(f"Seeded {args.stores} stores x {args.skus} SKUs x {args.days} days "
+              f"in {time.perf_counter() - started:.1f}s")
+    
+    # Tables added since the --db was seeded
+    init_db()
+    
+    # Build the overview's inventory_health table and transfer plan up front
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        refresh_inventory_health(db)
+        get_transfer_plan(db)
+        print(f"Warmed inventory health and transfer plan in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+    
+    pools = dict(database.DB_POOLS)
+    inline = {name: InlineExecutor() for name in pools}
+    
+    phases = [
+        ("idle", pools, 0, 0),
+        ("offloaded + heavy", pools, args.heavy_clients, 0),
+        ("offloaded + rebuild", pools, 0, args.rebuilds),
+        ("inline + heavy", inline, args.heavy_clients, 0)
+    ]
+    
+    print(f"{'phase':<20} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'failed':>7} {'heavy req/s':>12}")
+    for name, executors, heavy_clients, rebuilds in phases:
+        database.DB_POOLS.update(executors)
+        try:
+            result = asyncio.run(run_phase(app, heavy_clients, args.posts, args.interval, rebuilds))
+        finally:
+            database.DB_POOLS.update(pools)
+        
+        samples = result["latencies_ms"]
+        print(f"{name:<20} {np.percentile(samples, 50):>8.1f} {np.percentile(samples, 95):>8.1f} "
+              f"{samples.max():>8.1f} {result['failures']:>7} {result['heavy_per_second']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
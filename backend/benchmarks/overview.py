@@ -0,0 +1,105 @@
+"""
+Overview latency benchmark: inventory_health table rebuild, incremental refresh of changed
+store/SKUs, then GET /api/overview percentiles for first and deep (cursor) pages
+
+    python -m benchmarks.overview --stores 50 --skus 2000 --requests 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .seed import use_database, seed_network
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=35, help="days of history to seed")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--changed", type=int, default=200, help="snapshots updated before the incremental refresh")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "optimus_bench_overview.db"))
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an existing --db")
+    args = parser.parse_args()
+    
+    use_database(args.db)
+    
+    from datetime import datetime, timedelta
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    from app.database import SessionLocal, init_db
+    from app.main import app
+    from app.models import InventorySnapshot
+    from app.services.inventory_health import ensure_inventory_health, refresh_inventory_health
+    from app.services.transfer_optimizer import get_transfer_plan
+    
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed_network(args.stores, args.skus, args.days)
+        print(f"Seeded {args.stores} stores x {args.skus} SKUs x {args.days} days "
+              f"in {time.perf_counter() - started:.1f}s")
+    
+    # Tables added since the --db was seeded
+    init_db()
+    
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        stats = refresh_inventory_health(db)
+        print(f"Full inventory_health rebuild of {stats['items_written']} items in {time.perf_counter() - started:.2f}s")
+        
+        # Committed ORM changes queue their store/SKUs for the next read
+        yesterday = datetime.now().date() - timedelta(days=1)
+        snapshots = db.scalars(
+            select(InventorySnapshot).where(InventorySnapshot.ts_date == yesterday).order_by(func.random()).limit(args.changed)
+        ).all()
+        for snapshot in snapshots:
+            snapshot.on_hand = max(snapshot.on_hand - 5, 0)
+        db.commit()
+        
+        started = time.perf_counter()
+        stats = ensure_inventory_health(db)
+        print(f"Incremental refresh of {stats['pairs_refreshed']} changed items in {time.perf_counter() - started:.2f}s")
+        
+        # The overview also reports transfer opportunities; plan once up front
+        started = time.perf_counter()
+        get_transfer_plan(db)
+        print(f"Transfer plan in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+    
+    client = TestClient(app)
+    
+    # A cursor some pages into the network-wide list
+    deep_cursor = None
+    for _ in range(10):
+        deep_cursor = client.get("/api/overview", params={"limit": 500, "cursor": deep_cursor}).json()["next_cursor"]
+    
+    variants = [
+        "/api/overview",
+        "/api/overview?risk_only=true",
+        "/api/overview?min_confidence=70&limit=500",
+        f"/api/overview?store_id={args.stores}"
+    ]
+    if deep_cursor:
+        variants.append(f"/api/overview?limit=500&cursor={deep_cursor}")
+    
+    latencies = {url: [] for url in variants}
+    for i in range(args.requests):
+        url = variants[i % len(variants)]
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies[url].append(time.perf_counter() - started)
+        response.raise_for_status()
+    
+    print(f"{'request':<60} {'p50 ms':>8} {'p95 ms':>8}")
+    for url, samples in latencies.items():
+        samples = np.array(samples) * 1000
+        print(f"{url[:60]:<60} {np.percentile(samples, 50):>8.1f} {np.percentile(samples, 95):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Synthetic network data for benchmarks
+
+Writes directly with bulk INSERTs so large networks (hundreds of stores,
+thousands of SKUs) seed in seconds, unlike utils.demo_data which is sized
+for the five-store demo.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+
+def use_database(path: str) -> None:
+    """Point the app at a benchmark SQLite file (call before importing app modules)"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(path)}"
+
+
+def seed_network(
+    num_stores: int,
+    num_skus: int,
+    days_history: int,
+    shrink_rate: float = 0.01,
+    with_distances: bool = True,
+    seed: int = 42
+) -> dict:
+    """
+    Recreate all tables and fill them with a random store/SKU network
+    Inventory follows sales and receipts exactly except for shrink_rate of
+    days, which lose unexplained units (anomaly scan hits)
+    """
+    from sqlalchemy import insert
+    from app.database import Base, engine, SessionLocal
+    from app.models import (
+        Store, SKU, InventorySnapshot, SalesDaily, ReceiptsDaily, StoreDistance
+    )
+    from app.utils.demo_data import calculate_distance
+    
+    rng = random.Random(seed)
+    
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    
+    db = SessionLocal()
+    try:
+        stores = [
+            {
+                "id": i,
+                "name": f"Store {i}",
+                "location": f"Region {i % 10}",
+                "latitude": 33.0 + rng.uniform(-2, 2),
+                "longitude": -84.0 + rng.uniform(-2, 2)
+            }
+            for i in range(1, num_stores + 1)
+        ]
+        db.execute(insert(Store), stores)
+        
+        categories = ["Proteins", "Produce", "Dairy", "Salsas & Sauces", "Beverages", "Packaging"]
+        db.execute(insert(SKU), [
+            {
+                "id": i,
+                "name": f"SKU {i}",
+                "category": categories[i % len(categories)],
+                "unit": "each",
+                "cost": round(rng.uniform(1, 20), 2),
+                "price": round(rng.uniform(2, 40), 2),
+                "is_perishable": categories[i % len(categories)] in ("Proteins", "Produce", "Dairy")
+            }
+            for i in range(1, num_skus + 1)
+        ])
+        
+        if with_distances:
+            distances = []
+            for a in stores:
+                for b in stores:
+                    if a["id"] != b["id"]:
+                        km = calculate_distance(a["latitude"], a["longitude"], b["latitude"], b["longitude"])
+                        distances.append({
+                            "from_store_id": a["id"],
+                            "to_store_id": b["id"],
+                            "distance_km": round(km, 2),
+                            "transfer_cost": round(km / 1.60934 * 0.5, 2)
+                        })
+            db.execute(insert(StoreDistance), distances)
+        
+        start_date = datetime.now().date() - timedelta(days=days_history)
+        snapshots, sales, receipts = [], [], []
+        
+        def flush() -> None:
+            if snapshots:
+                db.execute(insert(InventorySnapshot), snapshots)
+            if sales:
+                db.execute(insert(SalesDaily), sales)
+            if receipts:
+                db.execute(insert(ReceiptsDaily), receipts)
+            snapshots.clear()
+            sales.clear()
+            receipts.clear()
+        
+        for store in stores:
+            for sku_id in range(1, num_skus + 1):
+                base_demand = rng.uniform(1, 12)
+                on_hand = rng.randint(20, 150)
+                
+                for day in range(days_history):
+                    ts_date = start_date + timedelta(days=day)
+                    sold = min(on_hand, int(base_demand * rng.uniform(0.5, 1.5)))
+                    on_hand -= sold
+                    if sold:
+                        sales.append({"store_id": store["id"], "sku_id": sku_id, "ts_date": ts_date, "qty_sold": sold})
+                    
+                    if rng.random() < 0.2:
+                        received = int(base_demand * rng.uniform(5, 10))
+                        on_hand += received
+                        receipts.append({"store_id": store["id"], "sku_id": sku_id, "ts_date": ts_date, "qty_received": received})
+                    
+                    if rng.random() < shrink_rate:
+                        on_hand = max(0, on_hand - rng.randint(6, 25))
+                    
+                    snapshots.append({"store_id": store["id"], "sku_id": sku_id, "ts_date": ts_date, "on_hand": on_hand})
+            
+            flush()
+        
+        db.commit()
+    finally:
+        db.close()
+    
+    return {"stores": num_stores, "skus": num_skus, "days_history": days_history}
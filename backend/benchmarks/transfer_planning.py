@@ -0,0 +1,60 @@
+"""
+Transfer planning scaling benchmark: one network snapshot, 1..N SKU-chunk workers
+
+    python -m benchmarks.transfer_planning --stores 50 --skus 2000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from .seed import use_database, seed_network
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=35, help="days of history to seed")
+    parser.add_argument("--solver", default="flow")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "optimus_bench_planning.db"))
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an existing --db")
+    args = parser.parse_args()
+    
+    use_database(args.db)
+    
+    from app.database import SessionLocal
+    from app.services.network_snapshot import load_network_snapshot
+    from app.services.transfer_optimizer import generate_transfer_recommendations
+    
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed_network(args.stores, args.skus, args.days)
+        print(f"Seeded {args.stores} stores x {args.skus} SKUs x {args.days} days "
+              f"in {time.perf_counter() - started:.1f}s")
+    
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        snapshot = load_network_snapshot(db)
+        print(f"Loaded network snapshot in {time.perf_counter() - started:.2f}s")
+        
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'transfers':>10}")
+        
+        baseline = None
+        for workers in args.workers:
+            started = time.perf_counter()
+            plan = generate_transfer_recommendations(
+                db, snapshot=snapshot, solver=args.solver, workers=workers
+            )
+            elapsed = time.perf_counter() - started
+            
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {len(plan):>10}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()